@@ -0,0 +1,255 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse
+
+import metricas
+import sessao
+
+# ==========================================================
+# Controle de admissão (proteção contra sobrecarga)
+# Antes de chegar às rotas, cada requisição passa por:
+#   1) balde de fichas por cliente (usuário da sessão, que
+#      identifica a loja/tablet, ou o IP sem sessão): quem
+#      passa da taxa recebe 429 + Retry-After na hora;
+#   2) limite de concorrência por classe de rota (leitura =
+#      GET/HEAD, escrita = o resto) com uma fila curta: fila
+#      cheia ou espera longa demais -> 503 + Retry-After.
+# Sob pico a app recusa rápido o excedente em vez de ficar
+# lenta para todo mundo. Roda no event loop, sem locks.
+# ==========================================================
+
+ATIVO = os.getenv("ADMISSAO", "1") == "1"
+
+# Requisições simultâneas por classe (0 = sem limite) e quantas podem esperar a vez (0 = sem fila)
+LEITURA_MAX = int(os.getenv("ADMISSAO_LEITURA_MAX", "16"))
+LEITURA_FILA = int(os.getenv("ADMISSAO_LEITURA_FILA", "32"))
+ESCRITA_MAX = int(os.getenv("ADMISSAO_ESCRITA_MAX", "8"))
+ESCRITA_FILA = int(os.getenv("ADMISSAO_ESCRITA_FILA", "16"))
+# Tempo máximo na fila (s) antes de desistir com 503
+ESPERA_MAX = float(os.getenv("ADMISSAO_ESPERA_MAX", "1"))
+# Retry-After das respostas 503 (s)
+RETRY_AFTER = int(os.getenv("ADMISSAO_RETRY_AFTER", "2"))
+
+# Fichas por segundo e rajada por cliente e classe (taxa 0 = sem limite)
+TAXA_LEITURA = float(os.getenv("ADMISSAO_TAXA_LEITURA", "5"))
+RAJADA_LEITURA = int(os.getenv("ADMISSAO_RAJADA_LEITURA", "30"))
+TAXA_ESCRITA = float(os.getenv("ADMISSAO_TAXA_ESCRITA", "1"))
+RAJADA_ESCRITA = int(os.getenv("ADMISSAO_RAJADA_ESCRITA", "10"))
+# Clientes lembrados por balde (LRU)
+CLIENTES_MAX = int(os.getenv("ADMISSAO_CLIENTES_MAX", "10000"))
+# Proxies confiáveis na frente da app (o router do Heroku = 1). Cada um acrescenta ao
+# X-Forwarded-For o IP de quem se conectou a ele; o que vem antes o cliente pode forjar.
+PROXIES = int(os.getenv("ADMISSAO_PROXIES", "1"))
+
+# Monitoramento e arquivos que o navegador guarda (nome/URL imutável) ficam de fora
+ISENTAS = {"/health", "/health/db", "/metrics", "/sw.js"}
+PREFIXOS_ISENTOS = ("/static/", "/anexos/")
+# Conexões longas (SSE): só o balde, senão ocupariam as vagas por horas
+SO_TAXA = {"/eventos/chamados"}
+
+LEITURA = ("GET", "HEAD")
+
+
+class Limitador:
+    """Semáforo com fila FIFO limitada e espera máxima"""
+
+    def __init__(self, classe: str, limite: int, fila_max: int, espera_max: float):
+        self.classe = classe
+        self.limite = limite
+        self.fila_max = fila_max
+        self.espera_max = espera_max
+        self.ativos = 0
+        self._fila = deque()
+        self.admitidas = 0
+        self.enfileiradas = 0
+        self.recusadas_fila_cheia = 0
+        self.recusadas_espera = 0
+
+    async def entrar(self) -> bool:
+        """True com a vaga garantida (chamar sair() depois); False se recusada"""
+        if self.ativos < self.limite and not self._fila:
+            self.ativos += 1
+            self.admitidas += 1
+            return True
+        if len(self._fila) >= self.fila_max:
+            self.recusadas_fila_cheia += 1
+            metricas.ADMISSAO_RECUSADAS.inc(self.classe, "fila_cheia")
+            return False
+
+        vez = asyncio.get_running_loop().create_future()
+        self._fila.append(vez)
+        self.enfileiradas += 1
+        inicio = time.perf_counter()
+        try:
+            await asyncio.wait_for(vez, self.espera_max)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Cliente desistiu; se a vaga já tinha sido passada para ele, devolve
+            if vez.done() and not vez.cancelled():
+                self.sair()
+            elif vez in self._fila:
+                self._fila.remove(vez)
+            raise
+        finally:
+            metricas.ADMISSAO_ESPERA.observar(time.perf_counter() - inicio, self.classe)
+
+        # O timeout pode coincidir com a vaga chegando: nesse caso ela vale
+        if vez.done() and not vez.cancelled():
+            self.admitidas += 1
+            return True
+        if vez in self._fila:
+            self._fila.remove(vez)
+        self.recusadas_espera += 1
+        metricas.ADMISSAO_RECUSADAS.inc(self.classe, "espera")
+        return False
+
+    def sair(self):
+        """Libera a vaga, passando-a direto para o primeiro da fila"""
+        while self._fila:
+            vez = self._fila.popleft()
+            if not vez.done():
+                vez.set_result(None)
+                return
+        self.ativos -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limite": self.limite,
+            "fila_max": self.fila_max,
+            "ativos": self.ativos,
+            "fila": len(self._fila),
+            "admitidas": self.admitidas,
+            "enfileiradas": self.enfileiradas,
+            "recusadas_fila_cheia": self.recusadas_fila_cheia,
+            "recusadas_espera": self.recusadas_espera,
+        }
+
+
+class BaldeDeFichas:
+    """Token bucket por cliente: `taxa` fichas/s, acumulando até `rajada`"""
+
+    def __init__(self, classe: str, taxa: float, rajada: int, max_clientes: int = CLIENTES_MAX):
+        self.classe = classe
+        self.taxa = taxa
+        self.rajada = rajada
+        self.max_clientes = max_clientes
+        # cliente -> [fichas, instante da última recarga]
+        self._clientes = OrderedDict()
+        self.recusadas = 0
+
+    def consumir(self, cliente: str) -> float:
+        """0 se pode seguir; senão, segundos até a próxima ficha"""
+        agora = time.monotonic()
+        balde = self._clientes.get(cliente)
+        if balde is None:
+            balde = self._clientes[cliente] = [float(self.rajada), agora]
+            if len(self._clientes) > self.max_clientes:
+                self._clientes.popitem(last=False)
+        else:
+            self._clientes.move_to_end(cliente)
+            balde[0] = min(self.rajada, balde[0] + (agora - balde[1]) * self.taxa)
+            balde[1] = agora
+        if balde[0] >= 1:
+            balde[0] -= 1
+            return 0.0
+        self.recusadas += 1
+        metricas.ADMISSAO_RECUSADAS.inc(self.classe, "taxa")
+        return (1 - balde[0]) / self.taxa
+
+    def stats(self) -> dict:
+        return {"taxa": self.taxa, "rajada": self.rajada, "clientes": len(self._clientes), "recusadas_taxa": self.recusadas}
+
+
+limitadores = {
+    "leitura": Limitador("leitura", LEITURA_MAX, LEITURA_FILA, ESPERA_MAX) if LEITURA_MAX else None,
+    "escrita": Limitador("escrita", ESCRITA_MAX, ESCRITA_FILA, ESPERA_MAX) if ESCRITA_MAX else None,
+}
+baldes = {
+    "leitura": BaldeDeFichas("leitura", TAXA_LEITURA, RAJADA_LEITURA) if TAXA_LEITURA else None,
+    "escrita": BaldeDeFichas("escrita", TAXA_ESCRITA, RAJADA_ESCRITA) if TAXA_ESCRITA else None,
+}
+
+
+def stats() -> dict:
+    """Números planos para o /metrics (infracheck_admissao_<classe>_<nome>)"""
+    saida = {}
+    for classe in ("leitura", "escrita"):
+        for grupo in (limitadores[classe], baldes[classe]):
+            if grupo is not None:
+                saida.update({f"{classe}_{nome}": valor for nome, valor in grupo.stats().items()})
+    return saida
+
+
+def ip(request: Request) -> str:
+    """IP real do cliente: a entrada do X-Forwarded-For gravada pelo proxy mais externo
+    em que confiamos. Sem isso, atrás do router todos teriam o IP do router."""
+    if PROXIES:
+        encaminhado = [
+            item.strip() for valor in request.headers.getlist("x-forwarded-for")
+            for item in valor.split(",") if item.strip()
+        ]
+        if len(encaminhado) >= PROXIES:
+            return encaminhado[-PROXIES]
+    return request.client.host if request.client else "?"
+
+
+def cliente(request: Request) -> str:
+    """Usuário da sessão (token válido) ou, sem sessão, o IP"""
+    payload = sessao.sessao_opcional(request)
+    if payload and payload.get("sub"):
+        return f"usuario:{payload['sub']}"
+    return f"ip:{ip(request)}"
+
+
+def recusar(request: Request, status: int, retry_after: int):
+    mensagem = (
+        "Muitas requisições seguidas, aguarde um instante" if status == 429
+        else "Servidor ocupado, tente novamente"
+    )
+    cabecalhos = {"Retry-After": str(retry_after)}
+    if "text/html" in request.headers.get("accept", ""):
+        return HTMLResponse(
+            f'<!DOCTYPE html><meta charset="utf-8"><p>{mensagem} ⏳</p>'
+            '<p><a href="javascript:location.reload()">Tentar de novo</a></p>',
+            status_code=status, headers=cabecalhos,
+        )
+    return JSONResponse({"detail": mensagem}, status_code=status, headers=cabecalhos)
+
+
+class MiddlewareAdmissao:
+    """Middleware ASGI puro: balde por cliente e depois a vaga da classe da rota"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        caminho = scope.get("path", "")
+        if (
+            not ATIVO or scope["type"] != "http"
+            or caminho in ISENTAS or caminho.startswith(PREFIXOS_ISENTOS)
+        ):
+            return await self.app(scope, receive, send)
+
+        classe = "leitura" if scope["method"] in LEITURA else "escrita"
+        balde = baldes[classe]
+        if balde is not None:
+            request = Request(scope)
+            espera = balde.consumir(cliente(request))
+            if espera:
+                return await recusar(request, 429, math.ceil(espera))(scope, receive, send)
+
+        limitador = None if caminho in SO_TAXA else limitadores[classe]
+        if limitador is None:
+            return await self.app(scope, receive, send)
+        if not await limitador.entrar():
+            return await recusar(Request(scope), 503, RETRY_AFTER)(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limitador.sair()
@@ -0,0 +1,427 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageOps
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+# ==========================================================
+# Fotos anexadas aos chamados
+# O corpo multipart é lido em pedaços direto da requisição e cada
+# arquivo vai para o armazenamento conforme chega (nunca inteiro em
+# memória), com limite de tamanho e de quantidade. Ficam na pasta
+# temporária até o chamado ser salvo: só então são publicados (e,
+# se algo falhar antes, apagados). O nome final é o sha256 do
+# conteúdo: a URL nunca muda de conteúdo, então originais e
+# miniaturas podem ser cacheados por um ano. Miniaturas saem de um
+# pool de processos (Pillow é CPU pesado) ao salvar o chamado, ou
+# na primeira vez que alguém pedir, se ainda não existirem.
+# ==========================================================
+
+DIRETORIO = Path(os.getenv("ANEXOS_DIR", Path(__file__).parent / "anexos"))
+
+ANEXO_MAX_BYTES = int(os.getenv("ANEXO_MAX_MB", "8")) * 1024 * 1024
+ANEXOS_MAX_POR_CHAMADO = int(os.getenv("ANEXOS_MAX_POR_CHAMADO", "4"))
+
+# Campos de texto do formulário são pequenos; o corpo inteiro tem teto antes de ler
+CAMPO_MAX_BYTES = 64 * 1024
+REQUISICAO_MAX_BYTES = ANEXOS_MAX_POR_CHAMADO * ANEXO_MAX_BYTES + 1024 * 1024
+
+# Lado maior da miniatura (px) e processos dedicados a gerá-las
+MINIATURA_LADO = int(os.getenv("MINIATURA_LADO", "320"))
+MINIATURA_PROCESSOS = int(os.getenv("MINIATURA_PROCESSOS", "1"))
+# Fotos maiores que isso (pixels) não são decodificadas: um PNG pequeno em bytes
+# pode declarar dimensões que ocupariam gigabytes e derrubar o processo do pool
+MINIATURA_MAX_PIXELS = int(os.getenv("MINIATURA_MAX_MEGAPIXELS", "50")) * 1_000_000
+# Tentativas por foto antes de desistir (derrubar o pool conta uma; erro de decodificação, todas)
+MINIATURA_TENTATIVAS = 2
+# Fotos sem miniatura lembradas (LRU)
+MINIATURA_FALHAS_MAX = 1024
+
+# Conteúdo endereçado pelo hash: a mesma URL sempre devolve os mesmos bytes
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# Tipo reconhecido pelos primeiros bytes (não confiamos no Content-Type do navegador)
+ASSINATURAS = (
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"RIFF", "webp", "image/webp"),  # + "WEBP" no byte 8, conferido em _tipo()
+)
+TIPOS = {extensao: tipo for _, extensao, tipo in ASSINATURAS}
+CHAVE = re.compile(r"[0-9a-f]{64}\.(?:jpg|png|webp)")
+
+
+class AnexoInvalido(Exception):
+    """Upload recusado; `status` é o código HTTP da resposta"""
+
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+class Arquivo(NamedTuple):
+    chave: str  # "<sha256>.<extensão>", usada na URL e no banco
+    tipo: str
+    tamanho: int
+    nome_original: str
+
+
+class Formulario(NamedTuple):
+    campos: dict
+    arquivos: list
+
+
+def _tipo(inicio: bytes) -> Optional[str]:
+    for assinatura, extensao, _ in ASSINATURAS:
+        if inicio.startswith(assinatura) and (extensao != "webp" or inicio[8:12] == b"WEBP"):
+            return extensao
+    return None
+
+
+# ==========================================================
+# Armazenamento
+# ==========================================================
+
+class ArmazenamentoLocal:
+    """Objetos por chave ("originais/ab/abcd...jpg") numa pasta local.
+
+    Mesmo contrato de um bucket (gravar por chave, existe, caminho): um backend
+    de object storage só precisa implementar estes métodos."""
+
+    def __init__(self, raiz: Path):
+        self.raiz = Path(raiz)
+
+    def caminho(self, chave: str) -> Path:
+        return self.raiz / chave
+
+    def existe(self, chave: str) -> bool:
+        return self.caminho(chave).is_file()
+
+    def temporario(self) -> Path:
+        """Arquivo parcial na mesma partição, para a publicação ser um rename atômico"""
+        pasta = self.raiz / "tmp"
+        pasta.mkdir(parents=True, exist_ok=True)
+        return pasta / f"{uuid.uuid4().hex}.parcial"
+
+    def publicar(self, temporario: Path, chave: str):
+        destino = self.caminho(chave)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temporario, destino)
+
+
+def chave_original(chave: str) -> str:
+    return f"originais/{chave[:2]}/{chave}"
+
+
+def chave_miniatura(chave: str) -> str:
+    return f"miniaturas/{chave[:2]}/{chave.rsplit('.', 1)[0]}.jpg"
+
+
+armazenamento = ArmazenamentoLocal(DIRETORIO)
+
+
+# ==========================================================
+# Recebimento em streaming (multipart/form-data)
+# ==========================================================
+
+class _Parte:
+    def __init__(self, nome: str, nome_arquivo: Optional[str]):
+        self.nome = nome
+        self.nome_arquivo = nome_arquivo
+        self.dados = bytearray()  # campos de texto
+        self.inicio = b""  # primeiros bytes do arquivo, para reconhecer o tipo
+        self.tamanho = 0
+        self.hash = hashlib.sha256()
+        self.temporario = None
+        self.arquivo = None
+
+
+class _Recebimento:
+    """Callbacks do parser do python-multipart. Só acumulam pedidos; a escrita
+    em disco acontece depois de cada pedaço, fora do event loop."""
+
+    def __init__(self, campo_arquivos: str):
+        self.campo_arquivos = campo_arquivos
+        self.campos = {}
+        self.arquivos = []
+        self.temporarios = []
+        self._prontos = []  # (temporário, chave) validados, ainda não publicados
+        self._abertos = []
+        self._parte = None
+        self._cabecalhos = {}
+        self._campo, self._valor = b"", b""
+        self._escritas = []
+        self._fechadas = []
+
+    # --- callbacks (síncronos) ---
+    def on_part_begin(self):
+        self._cabecalhos = {}
+
+    def on_header_field(self, dados: bytes, inicio: int, fim: int):
+        self._campo += dados[inicio:fim]
+
+    def on_header_value(self, dados: bytes, inicio: int, fim: int):
+        self._valor += dados[inicio:fim]
+
+    def on_header_end(self):
+        self._cabecalhos[self._campo.lower()] = self._valor
+        self._campo, self._valor = b"", b""
+
+    def on_headers_finished(self):
+        _, opcoes = parse_options_header(self._cabecalhos.get(b"content-disposition", b""))
+        nome = opcoes.get(b"name", b"").decode("utf-8", "replace")
+        nome_arquivo = opcoes.get(b"filename")
+        self._parte = _Parte(nome, None if nome_arquivo is None else nome_arquivo.decode("utf-8", "replace"))
+
+    def on_part_data(self, dados: bytes, inicio: int, fim: int):
+        parte, pedaco = self._parte, dados[inicio:fim]
+        if parte.nome_arquivo is None:
+            if len(parte.dados) + len(pedaco) > CAMPO_MAX_BYTES:
+                raise AnexoInvalido(413, f"Campo {parte.nome} grande demais")
+            parte.dados += pedaco
+            return
+        if parte.nome != self.campo_arquivos:
+            raise AnexoInvalido(400, f"Arquivo inesperado no campo {parte.nome}")
+        parte.tamanho += len(pedaco)
+        if parte.tamanho > ANEXO_MAX_BYTES:
+            raise AnexoInvalido(413, f"Cada foto pode ter no máximo {ANEXO_MAX_BYTES // 2**20} MB")
+        if len(parte.inicio) < 12:
+            parte.inicio += pedaco[:12 - len(parte.inicio)]
+        parte.hash.update(pedaco)
+        self._escritas.append((parte, pedaco))
+
+    def on_part_end(self):
+        parte, self._parte = self._parte, None
+        if parte.nome_arquivo is None:
+            self.campos[parte.nome] = parte.dados.decode("utf-8", "replace")
+        elif parte.tamanho:
+            # <input type="file"> vazio chega como parte sem bytes: ignorada
+            self._fechadas.append(parte)
+
+    def on_end(self):
+        pass
+
+    # --- disco (em thread) ---
+    def _gravar_pendentes(self):
+        for parte, pedaco in self._escritas:
+            if parte.arquivo is None:
+                if len(self.temporarios) >= ANEXOS_MAX_POR_CHAMADO:
+                    raise AnexoInvalido(413, f"No máximo {ANEXOS_MAX_POR_CHAMADO} fotos por chamado")
+                parte.temporario = armazenamento.temporario()
+                self.temporarios.append(parte.temporario)
+                parte.arquivo = open(parte.temporario, "wb")
+                self._abertos.append(parte.arquivo)
+            parte.arquivo.write(pedaco)
+        self._escritas.clear()
+        for parte in self._fechadas:
+            parte.arquivo.close()
+            extensao = _tipo(parte.inicio)
+            if extensao is None:
+                raise AnexoInvalido(415, f"{parte.nome_arquivo}: envie fotos JPEG, PNG ou WebP")
+            chave = f"{parte.hash.hexdigest()}.{extensao}"
+            self._prontos.append((parte.temporario, chave))
+            self.arquivos.append(Arquivo(chave, TIPOS[extensao], parte.tamanho, parte.nome_arquivo[:255]))
+        self._fechadas.clear()
+
+    def _publicar(self):
+        for temporario, chave in self._prontos:
+            armazenamento.publicar(temporario, chave_original(chave))
+
+    def _descartar(self):
+        """Apaga o que não foi publicado (os publicados já saíram da pasta temporária)"""
+        for arquivo in self._abertos:
+            arquivo.close()
+        for temporario in self.temporarios:
+            temporario.unlink(missing_ok=True)
+
+
+@asynccontextmanager
+async def receber(request: Request, campo_arquivos: str = "fotos"):
+    """Lê o formulário da requisição gravando os arquivos de `campo_arquivos` na pasta
+    temporária à medida que chegam, e entrega os campos de texto e os Arquivo recebidos.
+
+    Os arquivos só são publicados se o bloco `async with` terminar sem erro (ex.: o
+    chamado foi salvo); se ele falhar, ou o próprio envio for recusado, são apagados."""
+    tipo, opcoes = parse_options_header(request.headers.get("content-type", ""))
+    if tipo != b"multipart/form-data":
+        # Formulário sem arquivos (ex.: enviado sem o enctype multipart)
+        yield Formulario(dict(await request.form()), [])
+        return
+    if int(request.headers.get("content-length") or 0) > REQUISICAO_MAX_BYTES:
+        raise AnexoInvalido(413, "Envio grande demais")
+    if b"boundary" not in opcoes:
+        raise AnexoInvalido(400, "Formulário multipart sem boundary")
+
+    recebimento = _Recebimento(campo_arquivos)
+    callbacks = {
+        nome: getattr(recebimento, nome)
+        for nome in (
+            "on_part_begin", "on_part_data", "on_part_end", "on_header_field",
+            "on_header_value", "on_header_end", "on_headers_finished", "on_end",
+        )
+    }
+    parser = MultipartParser(opcoes[b"boundary"], callbacks)
+    recebidos = 0
+    try:
+        try:
+            async for pedaco in request.stream():
+                recebidos += len(pedaco)
+                if recebidos > REQUISICAO_MAX_BYTES:
+                    raise AnexoInvalido(413, "Envio grande demais")
+                parser.write(pedaco)
+                if recebimento._escritas or recebimento._fechadas:
+                    await run_in_threadpool(recebimento._gravar_pendentes)
+            parser.finalize()
+        except MultipartParseError as e:
+            raise AnexoInvalido(400, f"Formulário inválido: {e}")
+        yield Formulario(recebimento.campos, recebimento.arquivos)
+        await run_in_threadpool(recebimento._publicar)
+    finally:
+        await run_in_threadpool(recebimento._descartar)
+
+
+# ==========================================================
+# Miniaturas (pool de processos)
+# ==========================================================
+
+def gerar_miniatura(origem: str, destino: str, lado: int = MINIATURA_LADO):
+    """Reduz a foto para caber em lado x lado (respeitando a orientação EXIF) e grava JPEG.
+    Roda num processo do pool; também serve para chamar direto (benchmark)."""
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    parcial = f"{destino}.{os.getpid()}.parcial"
+    with Image.open(origem) as imagem:
+        # Só o cabeçalho foi lido até aqui: recusa antes de decodificar
+        largura, altura = imagem.size
+        if largura * altura > MINIATURA_MAX_PIXELS:
+            raise ValueError(f"imagem grande demais ({largura}x{altura})")
+        # JPEG: decodifica já reduzido por 1/2, 1/4 ou 1/8 (bem menos CPU e memória)
+        imagem.draft("RGB", (lado * 2, lado * 2))
+        imagem = ImageOps.exif_transpose(imagem)
+        imagem.thumbnail((lado, lado))
+        imagem.convert("RGB").save(parcial, "JPEG", quality=80, optimize=True)
+    os.replace(parcial, destino)
+
+
+class Miniaturas:
+    """Gera miniaturas fora do event loop, uma vez por chave mesmo com pedidos simultâneos.
+    Fotos que não geram miniatura são lembradas, para não tentar de novo a cada pedido."""
+
+    def __init__(self, processos: int = MINIATURA_PROCESSOS, lado: int = MINIATURA_LADO):
+        self.processos = processos
+        self.lado = lado
+        self._pool = None
+        self._em_andamento = {}
+        # chave -> tentativas que falharam
+        self._falhas = OrderedDict()
+        self.geradas = 0
+        self.falhas = 0
+        self.reinicios = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: o processo da app tem threads (pool do banco, bcrypt) e fork com threads é frágil
+            self._pool = ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _reiniciar(self, pool: ProcessPoolExecutor):
+        """Um processo morreu (ex.: sem memória) e o pool quebrou: o próximo pedido cria outro"""
+        if self._pool is pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self.reinicios += 1
+            logging.warning("⚠️ Pool de miniaturas quebrou; será recriado")
+
+    def _falhou(self, chave: str, tentativas: int):
+        self._falhas[chave] = self._falhas.get(chave, 0) + tentativas
+        self._falhas.move_to_end(chave)
+        if len(self._falhas) > MINIATURA_FALHAS_MAX:
+            self._falhas.popitem(last=False)
+
+    def _concluida(self, chave: str, pool: ProcessPoolExecutor, tarefa: asyncio.Future):
+        self._em_andamento.pop(chave, None)
+        if tarefa.cancelled():
+            return
+        erro = tarefa.exception()
+        if erro is None:
+            self.geradas += 1
+            return
+        self.falhas += 1
+        if isinstance(erro, BrokenProcessPool):
+            # Pode não ter sido culpa desta foto: conta só uma tentativa
+            self._reiniciar(pool)
+            self._falhou(chave, 1)
+        else:
+            self._falhou(chave, MINIATURA_TENTATIVAS)
+        logging.warning(f"⚠️ Miniatura de {chave} falhou: {erro!r}")
+
+    def _iniciar(self, chave: str) -> asyncio.Future:
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            argumentos = (
+                gerar_miniatura,
+                str(armazenamento.caminho(chave_original(chave))),
+                str(armazenamento.caminho(chave_miniatura(chave))),
+                self.lado,
+            )
+            pool = self._executor()
+            try:
+                tarefa = asyncio.get_running_loop().run_in_executor(pool, *argumentos)
+            except BrokenProcessPool:
+                self._reiniciar(pool)
+                pool = self._executor()
+                tarefa = asyncio.get_running_loop().run_in_executor(pool, *argumentos)
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._concluida(chave, pool, t))
+        return tarefa
+
+    def indisponivel(self, chave: str) -> bool:
+        return self._falhas.get(chave, 0) >= MINIATURA_TENTATIVAS
+
+    def agendar(self, arquivos: list):
+        """Começa a gerar em segundo plano (chamado depois de salvar o chamado)"""
+        for arquivo in arquivos:
+            if not armazenamento.existe(chave_miniatura(arquivo.chave)) and not self.indisponivel(arquivo.chave):
+                self._iniciar(arquivo.chave)
+
+    async def obter(self, chave: str) -> Optional[Path]:
+        """Caminho da miniatura, gerando agora se ainda não existir; None se não dá para gerar"""
+        caminho = armazenamento.caminho(chave_miniatura(chave))
+        if caminho.is_file():
+            return caminho
+        if self.indisponivel(chave):
+            return None
+        try:
+            await asyncio.shield(self._iniciar(chave))
+        except Exception:
+            # Já contada e registrada em _concluida
+            return None
+        return caminho
+
+    def stats(self) -> dict:
+        return {
+            "em_andamento": len(self._em_andamento), "geradas": self.geradas, "falhas": self.falhas,
+            "indisponiveis": sum(1 for chave in self._falhas if self.indisponivel(chave)),
+            "reinicios_pool": self.reinicios,
+        }
+
+    def encerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+miniaturas = Miniaturas()
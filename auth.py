@@ -1,29 +1,66 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
-from passlib.context import CryptContext
+import asyncio
+import bcrypt
 import jwt
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # Carrega variáveis do .env
 load_dotenv()
 
 # Configurações
-SECRET_KEY = os.getenv("JWT_SECRET", "chave_super_secreta")  # definida no .env
+# Sem valor padrão: um segredo conhecido permitiria forjar sessões de qualquer papel
+SECRET_KEY = os.getenv("JWT_SECRET")  # definida no .env / config vars do Heroku
+if not SECRET_KEY:
+    raise RuntimeError("❌ JWT_SECRET não definida: configure no .env ou nas variáveis de ambiente")
+# O .env versionado traz um segredo de desenvolvimento: num dyno do Heroku ele não vale
+SECRET_KEY_DEV = "dev-somente-local-nao-usar-em-producao"
+if SECRET_KEY == SECRET_KEY_DEV and os.getenv("DYNO"):
+    raise RuntimeError("❌ JWT_SECRET de desenvolvimento em produção: heroku config:set JWT_SECRET=...")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60  # 1 hora
 
-# Configuração do bcrypt
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt gasta dezenas de ms de CPU: roda num pool próprio e limitado,
+# fora do event loop e sem disputar o threadpool usado pelo banco
+BCRYPT_THREADS = int(os.getenv("AUTH_BCRYPT_THREADS", str(min(4, os.cpu_count() or 1))))
+_pool_bcrypt = ThreadPoolExecutor(max_workers=BCRYPT_THREADS, thread_name_prefix="bcrypt")
+
+# Tokens já decodificados (LRU), cada um válido só até o próprio exp
+CACHE_TOKENS = int(os.getenv("AUTH_CACHE_TOKENS", "1024"))
 
 # --- Funções para senha ---
+def _bytes(senha: str) -> bytes:
+    # bcrypt só considera 72 bytes; versões novas recusam senhas maiores
+    return senha.encode("utf-8")[:72]
+
 def gerar_hash(senha: str) -> str:
     """Gera o hash da senha para salvar no banco"""
-    return pwd_context.hash(senha)
+    return bcrypt.hashpw(_bytes(senha), bcrypt.gensalt()).decode()
 
 def verificar_senha(senha: str, hash_armazenado: str) -> bool:
     """Compara senha digitada com o hash do banco"""
-    return pwd_context.verify(senha, hash_armazenado)
+    try:
+        return bcrypt.checkpw(_bytes(senha), hash_armazenado.encode())
+    except ValueError:
+        return False  # hash malformado
+
+# Usado quando o usuário não existe, para o login levar o mesmo tempo
+HASH_FICTICIO = gerar_hash("usuario-inexistente")
+
+async def gerar_hash_async(senha: str) -> str:
+    """gerar_hash no pool do bcrypt"""
+    return await asyncio.get_running_loop().run_in_executor(_pool_bcrypt, gerar_hash, senha)
+
+async def verificar_senha_async(senha: str, hash_armazenado: Optional[str]) -> bool:
+    """verificar_senha no pool do bcrypt (sem hash, compara com um fictício e devolve False)"""
+    loop = asyncio.get_running_loop()
+    ok = await loop.run_in_executor(_pool_bcrypt, verificar_senha, senha, hash_armazenado or HASH_FICTICIO)
+    return ok and hash_armazenado is not None
 
 # --- Funções para JWT ---
 def criar_token(dados: dict, expira_em: Optional[int] = None):
@@ -36,8 +73,7 @@ def criar_token(dados: dict, expira_em: Optional[int] = None):
     to_encode.update({"exp": exp})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def validar_token(token: str):
-    """Valida e decodifica um token JWT"""
+def _decodificar_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -45,3 +81,54 @@ def validar_token(token: str):
         return None  # Token expirado
     except jwt.PyJWTError:
         return None  # Token inválido
+
+
+class CacheTokens:
+    """LRU de tokens válidos -> payload; uma entrada nunca sobrevive ao exp do token"""
+
+    def __init__(self, max_itens: int):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, token: str):
+        with self._lock:
+            item = self._itens.get(token)
+            if item is not None:
+                exp, payload = item
+                if exp > time.time():
+                    self._itens.move_to_end(token)
+                    self.acertos += 1
+                    return payload
+                del self._itens[token]
+            self.falhas += 1
+        return None
+
+    def gravar(self, token: str, payload: dict):
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)):
+            return  # sem exp não há como limitar a validade em cache
+        with self._lock:
+            self._itens[token] = (exp, payload)
+            self._itens.move_to_end(token)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"itens": len(self._itens), "max_itens": self.max_itens, "acertos": self.acertos, "falhas": self.falhas}
+
+
+tokens = CacheTokens(CACHE_TOKENS)
+
+def validar_token(token: str):
+    """Valida e decodifica um token JWT (tokens válidos ficam em cache até expirar)"""
+    payload = tokens.obter(token)
+    if payload is not None:
+        return payload
+    payload = _decodificar_token(token)
+    if payload is not None:
+        tokens.gravar(token, payload)
+    return payload
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.environ.setdefault("ANEXOS_DIR", tempfile.mkdtemp(prefix="infracheck-anexos-"))
+
+import httpx  # noqa: E402
+from PIL import Image  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.responses import PlainTextResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+import anexos  # noqa: E402
+
+# ==========================================================
+# Upload e miniaturas das fotos dos chamados
+# 1) Pico de memória Python ao receber um upload grande:
+#    request.form() + UploadFile.read() (o jeito ingênuo) vs
+#    anexos.receber (grava em disco conforme chega).
+# 2) Miniaturas de N fotos de celular (4000x3000): Pillow inline
+#    no handler vs o pool de processos, medindo o maior
+#    travamento do event loop (tarefa que acorda a cada 5 ms).
+# Não usa banco; os arquivos vão para uma pasta temporária.
+#
+#   python benchmarks/anexos.py [--mb 8] [--fotos 8]
+# ==========================================================
+
+INTERVALO_TICK = 0.005
+FRONTEIRA = "----infracheck-benchmark"
+
+
+async def _ingenuo(request):
+    formulario = await request.form()
+    dados = await formulario["fotos"].read()
+    destino = anexos.armazenamento.temporario()
+    destino.write_bytes(dados)
+    destino.unlink()
+    return PlainTextResponse(str(len(dados)))
+
+
+async def _streaming(request):
+    async with anexos.receber(request) as formulario:
+        return PlainTextResponse(str(sum(a.tamanho for a in formulario.arquivos)))
+
+
+app = Starlette(routes=[Route("/ingenuo", _ingenuo, methods=["POST"]), Route("/streaming", _streaming, methods=["POST"])])
+
+
+async def _corpo(conteudo: bytes):
+    # Envia o corpo em pedaços, como o navegador, para o cliente não entrar na conta
+    yield (
+        f'--{FRONTEIRA}\r\nContent-Disposition: form-data; name="descricao"\r\n\r\nfoto\r\n'
+        f'--{FRONTEIRA}\r\nContent-Disposition: form-data; name="fotos"; filename="foto.jpg"\r\n'
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode()
+    for inicio in range(0, len(conteudo), 64 * 1024):
+        yield conteudo[inicio:inicio + 64 * 1024]
+    yield f"\r\n--{FRONTEIRA}--\r\n".encode()
+
+
+async def medir_upload(rota: str, conteudo: bytes) -> tuple:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        resposta = await cliente.post(
+            rota, content=_corpo(conteudo), headers={"Content-Type": f"multipart/form-data; boundary={FRONTEIRA}"}
+        )
+        duracao = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    assert resposta.status_code == 200 and int(resposta.text) == len(conteudo), resposta.text
+    return duracao, pico
+
+
+def gerar_fotos(quantidade: int) -> list:
+    fotos = []
+    base = Image.linear_gradient("L").resize((4000, 3000)).convert("RGB")
+    for i in range(quantidade):
+        saida = io.BytesIO()
+        base.rotate(i * 7).save(saida, "JPEG", quality=90)
+        origem = anexos.armazenamento.temporario()
+        origem.write_bytes(saida.getvalue())
+        fotos.append(origem)
+    return fotos
+
+
+async def _monitorar(parar: asyncio.Event, travamentos: list):
+    anterior = time.perf_counter()
+    while not parar.is_set():
+        await asyncio.sleep(INTERVALO_TICK)
+        agora = time.perf_counter()
+        travamentos.append(agora - anterior - INTERVALO_TICK)
+        anterior = agora
+
+
+async def medir_miniaturas(fotos: list, no_pool: bool) -> dict:
+    parar, travamentos = asyncio.Event(), []
+    monitor = asyncio.ensure_future(_monitorar(parar, travamentos))
+    await asyncio.sleep(INTERVALO_TICK * 2)
+    inicio = time.perf_counter()
+    if no_pool:
+        laco = asyncio.get_running_loop()
+        executor = anexos.miniaturas._executor()
+        await asyncio.gather(*(
+            laco.run_in_executor(executor, anexos.gerar_miniatura, str(f), f"{f}.pool.jpg") for f in fotos
+        ))
+    else:
+        # O que um handler `async def` faria chamando o Pillow direto
+        for f in fotos:
+            anexos.gerar_miniatura(str(f), f"{f}.inline.jpg")
+            await asyncio.sleep(0)
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await monitor
+    return {
+        "fotos_s": len(fotos) / duracao,
+        "maior_travamento_ms": max(travamentos, default=0) * 1000,
+        "travamento_mediano_ms": statistics.median(travamentos or [0]) * 1000,
+    }
+
+
+async def executar(mb: int, quantidade: int):
+    conteudo = b"\xff\xd8\xff" + os.urandom(mb * 2**20 - 3)
+    print(f"Upload de uma foto de {mb} MB (limite ANEXO_MAX_MB={anexos.ANEXO_MAX_BYTES // 2**20}):")
+    for nome, rota in (("form() + read()", "/ingenuo"), ("anexos.receber", "/streaming")):
+        duracao, pico = await medir_upload(rota, conteudo)
+        print(f"  {nome:<17}{duracao * 1000:>8.0f} ms | pico de memória Python {pico / 2**20:>6.1f} MiB")
+
+    fotos = gerar_fotos(quantidade)
+    # Sobe os processos antes de medir (o spawn custa ~0,5 s só na primeira vez)
+    await asyncio.get_running_loop().run_in_executor(anexos.miniaturas._executor(), os.getpid)
+    print(f"Miniaturas de {quantidade} fotos 4000x3000 ({anexos.miniaturas.processos} processo(s) no pool):")
+    for nome, no_pool in (("inline no loop", False), ("pool de processos", True)):
+        r = await medir_miniaturas(fotos, no_pool)
+        print(
+            f"  {nome:<19}{r['fotos_s']:>6.1f} fotos/s | loop travado até {r['maior_travamento_ms']:>6.1f} ms"
+            f" (mediana {r['travamento_mediano_ms']:.1f} ms)"
+        )
+    anexos.miniaturas.encerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória do upload de fotos e miniaturas fora do event loop")
+    parser.add_argument("--mb", type=int, default=8)
+    parser.add_argument("--fotos", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(executar(args.mb, args.fotos))
+
+
+if __name__ == "__main__":
+    main()
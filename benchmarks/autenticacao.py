@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import os
+import secrets
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Segredo só deste processo: os tokens são gerados aqui mesmo
+os.environ.setdefault("JWT_SECRET", secrets.token_hex(32))
+
+import auth  # noqa: E402
+
+# ==========================================================
+# Vazão da autenticação sob logins concorrentes
+# Dispara N logins ao mesmo tempo (bcrypt do auth.py) e mede
+# logins/s e o maior travamento do event loop, visto por uma
+# tarefa que acorda a cada 5 ms. Compara o bcrypt inline no
+# handler com o pool dedicado. Depois mede a validação de JWT
+# com e sem o cache de tokens.
+#
+#   python benchmarks/autenticacao.py [--logins 64] [--validacoes 50000]
+# ==========================================================
+
+INTERVALO_TICK = 0.005
+SENHA = "senha-de-teste"
+
+
+async def _monitorar(parar: asyncio.Event, travamentos: list):
+    anterior = time.perf_counter()
+    while not parar.is_set():
+        await asyncio.sleep(INTERVALO_TICK)
+        agora = time.perf_counter()
+        travamentos.append(agora - anterior - INTERVALO_TICK)
+        anterior = agora
+
+
+async def _login_inline(hash_senha: str) -> bool:
+    # O que um `async def` faria chamando verificar_senha direto
+    return auth.verificar_senha(SENHA, hash_senha)
+
+
+async def _login_pool(hash_senha: str) -> bool:
+    return await auth.verificar_senha_async(SENHA, hash_senha)
+
+
+async def medir_logins(login, quantidade: int, hash_senha: str) -> dict:
+    parar, travamentos = asyncio.Event(), []
+    monitor = asyncio.ensure_future(_monitorar(parar, travamentos))
+    await asyncio.sleep(INTERVALO_TICK * 2)
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(login(hash_senha) for _ in range(quantidade)))
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await monitor
+    assert all(resultados)
+    return {
+        "logins_s": quantidade / duracao,
+        "total_ms": duracao * 1000,
+        "maior_travamento_ms": max(travamentos, default=0) * 1000,
+    }
+
+
+def medir_validacao(validar, tokens: list, quantidade: int) -> float:
+    inicio = time.perf_counter()
+    for i in range(quantidade):
+        assert validar(tokens[i % len(tokens)]) is not None
+    return quantidade / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de login (bcrypt) e validação de JWT")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--validacoes", type=int, default=50000)
+    parser.add_argument("--sessoes", type=int, default=200, help="tokens distintos em circulação")
+    args = parser.parse_args()
+
+    hash_senha = auth.gerar_hash(SENHA)
+    print(f"bcrypt: {auth.BCRYPT_THREADS} threads no pool, {args.logins} logins simultâneos")
+    for nome, login in (("inline no loop", _login_inline), ("pool do bcrypt", _login_pool)):
+        r = asyncio.run(medir_logins(login, args.logins, hash_senha))
+        print(
+            f"  {nome:<15} {r['logins_s']:>7.1f} logins/s | {r['total_ms']:>7.0f} ms no total | "
+            f"loop travado até {r['maior_travamento_ms']:>6.1f} ms"
+        )
+
+    tokens = [auth.criar_token({"sub": f"u{i}", "papel": "fiscal"}) for i in range(args.sessoes)]
+    sem_cache = medir_validacao(auth._decodificar_token, tokens, args.validacoes)
+    auth.tokens = auth.CacheTokens(auth.CACHE_TOKENS)
+    com_cache = medir_validacao(auth.validar_token, tokens, args.validacoes)
+    print(f"JWT: {args.sessoes} sessões, {args.validacoes} validações")
+    print(f"  sem cache       {sem_cache:>10.0f} validações/s")
+    print(f"  com cache       {com_cache:>10.0f} validações/s ({com_cache / sem_cache:.1f}x) | {auth.tokens.stats()}")
+
+
+if __name__ == "__main__":
+    main()
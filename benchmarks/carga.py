@@ -0,0 +1,349 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import secrets
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+# Segredo só deste processo: os tokens são gerados aqui mesmo
+os.environ.setdefault("JWT_SECRET", secrets.token_hex(32))
+
+import httpx  # noqa: E402
+import psycopg2  # noqa: E402
+
+from auth import criar_token  # noqa: E402
+from db import DB_CONFIG  # noqa: E402
+from init_db import migrar  # noqa: E402
+from lojas import LOJAS_FIXAS  # noqa: E402
+
+# ==========================================================
+# Teste de carga reprodutível
+# Sobe um PostgreSQL descartável (initdb + pg_ctl numa pasta
+# temporária), aplica as migrações, popula N chamados nas
+# LOJAS_FIXAS e dispara clientes concorrentes contra a app ASGI
+# real (com lifespan: pool, cache, SSE). Salva vazão e p50/p95/p99
+# por cenário em JSON; com --comparar, aponta regressões.
+#
+# --varredura 1,5,10,20 mede cada nível de concorrência. Com
+# --pausa (tempo entre requisições de cada cliente, como um usuário
+# real) a carga oferecida cresce com os clientes: com o banco fora
+# do event loop (db.assincrono) o p99 fica estável e a vazão sobe,
+# até a app saturar. Sem pausa cada cliente já satura sozinho e o
+# p99 só mede o tamanho da fila.
+#
+#   python benchmarks/carga.py [--linhas 100000] [--clientes 20] [--duracao 20]
+#                              [--varredura 1,5,10,20 --pausa 0.1]
+#                              [--pg-bin /usr/lib/postgresql/16/bin]
+#                              [--saida resultado.json] [--comparar base.json]
+#
+# O initdb não roda como root: use um usuário comum.
+# ==========================================================
+
+RESULTADOS_DIR = Path(__file__).parent / "resultados"
+
+# Cenário -> peso no sorteio de cada cliente (proporção aproximada do uso real)
+CENARIOS = {
+    "abrir_chamado": 2,
+    "lista_gerente": 4,
+    "lista_fiscal": 4,
+    "fiscal_visualizar": 2,
+    "fiscal_concluir": 1,
+    "admin_editar": 1,
+}
+
+# Piora tolerada antes de acusar regressão
+LIMIAR_REGRESSAO = 0.10
+
+
+# ==========================================================
+# PostgreSQL descartável
+# ==========================================================
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _binario(pg_bin, nome: str) -> str:
+    caminho = Path(pg_bin) / nome if pg_bin else shutil.which(nome)
+    if not caminho or not Path(caminho).exists():
+        raise SystemExit(f"❌ {nome} não encontrado; informe --pg-bin ou PG_BIN")
+    return str(caminho)
+
+
+@contextmanager
+def postgres_descartavel(pg_bin=None):
+    """Cluster novo numa pasta temporária; devolve a config de conexão e apaga tudo no fim"""
+    pasta = Path(tempfile.mkdtemp(prefix="infracheck-pg-"))
+    dados = pasta / "dados"
+    porta = _porta_livre()
+    senha = "carga"
+    (pasta / "senha").write_text(senha)
+    subprocess.run(
+        [_binario(pg_bin, "initdb"), "-D", str(dados), "-U", "postgres", "-A", "md5",
+         f"--pwfile={pasta / 'senha'}", "-E", "UTF8", "--no-sync"],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    pg_ctl = _binario(pg_bin, "pg_ctl")
+    subprocess.run(
+        [pg_ctl, "-D", str(dados), "-l", str(pasta / "log"), "-w", "start",
+         "-o", f"-p {porta} -k {pasta} -c fsync=off -c listen_addresses=127.0.0.1"],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    try:
+        config = {"host": "127.0.0.1", "port": porta, "user": "postgres", "password": senha, "dbname": "postgres"}
+        conn = psycopg2.connect(**config)
+        conn.autocommit = True
+        conn.cursor().execute("CREATE DATABASE infra_manutencao;")
+        conn.close()
+        yield dict(config, dbname="infra_manutencao")
+    finally:
+        subprocess.run([pg_ctl, "-D", str(dados), "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def popular(config: dict, linhas: int):
+    """Migra e insere `linhas` chamados distribuídos entre as LOJAS_FIXAS"""
+    conn = psycopg2.connect(**config)
+    try:
+        migrar(conn)
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO chamados (loja_id, descricao, prioridade, solicitado_por, status, criado_em, atualizado_em)
+            SELECT
+                (%s::int[])[1 + i %% cardinality(%s::int[])],
+                (ARRAY['Vazamento na copa', 'Ar condicionado não gela', 'Lâmpada queimada', 'Porta emperrada'])[1 + i %% 4]
+                    || ' #' || i,
+                (ARRAY['alta', 'média', 'baixa'])[1 + i %% 3],
+                'carga',
+                (ARRAY['aberto', 'visualizado', 'concluído', 'concluído', 'concluído'])[1 + i %% 5],
+                NOW() - (i || ' minutes')::interval,
+                NOW() - (i || ' minutes')::interval + ((i %% 97) || ' hours')::interval
+            FROM generate_series(1, %s) AS i;
+        """, ([l["id"] for l in LOJAS_FIXAS], [l["id"] for l in LOJAS_FIXAS], linhas))
+        cur.execute("ANALYZE;")
+        conn.commit()
+        cur.execute("SELECT min(id), max(id) FROM chamados;")
+        return cur.fetchone()
+    finally:
+        conn.close()
+
+
+# ==========================================================
+# Cenários
+# ==========================================================
+
+async def abrir_chamado(cliente, ids, rng):
+    return await cliente.post("/chamados/gerente", json={
+        "loja_id": rng.choice(LOJAS_FIXAS)["id"],
+        "descricao": "Chamado do teste de carga",
+        "prioridade": rng.choice(["alta", "média", "baixa"]),
+        "solicitado_por": "carga",
+    })
+
+
+async def lista_gerente(cliente, ids, rng):
+    params = {"loja_id": rng.choice(LOJAS_FIXAS)["id"]} if rng.random() < 0.5 else {}
+    return await cliente.get("/gerente/listar-chamados", params=params)
+
+
+async def lista_fiscal(cliente, ids, rng):
+    params = {"status": "aberto"} if rng.random() < 0.5 else {}
+    return await cliente.get("/fiscal/listar-chamados", params=params)
+
+
+async def fiscal_visualizar(cliente, ids, rng):
+    return await cliente.post(f"/fiscal/visualizar/{rng.randint(*ids)}", headers={"Accept": "application/json"})
+
+
+async def fiscal_concluir(cliente, ids, rng):
+    return await cliente.post(f"/fiscal/concluir/{rng.randint(*ids)}", headers={"Accept": "application/json"})
+
+
+async def admin_editar(cliente, ids, rng):
+    return await cliente.post(f"/admin/editar/{rng.randint(*ids)}", data={
+        "descricao": "Editado no teste de carga",
+        "prioridade": rng.choice(["alta", "média", "baixa"]),
+        "status": rng.choice(["aberto", "visualizado", "concluído"]),
+    })
+
+
+FUNCOES = {nome: globals()[nome] for nome in CENARIOS}
+
+
+def percentil(valores: list, p: float) -> float:
+    """Nearest-rank sobre a lista já ordenada"""
+    if not valores:
+        return 0.0
+    return valores[min(len(valores), max(1, math.ceil(p * len(valores)))) - 1]
+
+
+async def _cliente(app, ids, ate: float, amostras: dict, erros: dict, semente: int, pausa: float = 0.0):
+    rng = random.Random(semente)
+    nomes, pesos = list(CENARIOS), list(CENARIOS.values())
+    transporte = httpx.ASGITransport(app=app)
+    # Sessão de admin já pronta: o bcrypt do login fica fora da medição (ver benchmarks/autenticacao.py)
+    cookies = {"sessao": criar_token({"sub": f"carga-{semente}", "papel": "admin"})}
+    async with httpx.AsyncClient(
+        transport=transporte, base_url="http://carga", follow_redirects=False, cookies=cookies
+    ) as cliente:
+        while time.perf_counter() < ate:
+            nome = rng.choices(nomes, pesos)[0]
+            inicio = time.perf_counter()
+            resposta = await FUNCOES[nome](cliente, ids, rng)
+            duracao = time.perf_counter() - inicio
+            # Redirects (302) são a resposta normal das ações de formulário; 409 é a
+            # máquina de estados recusando, por exemplo, visualizar um chamado concluído
+            if resposta.status_code >= 400 and resposta.status_code != 409:
+                erros[nome] = erros.get(nome, 0) + 1
+            else:
+                amostras[nome].append(duracao)
+            if pausa:
+                # Tempo de "pensar" do usuário: carga oferecida fixa por cliente
+                await asyncio.sleep(rng.uniform(0.5, 1.5) * pausa)
+
+
+async def _medir(app, ids, clientes: int, duracao: float, aquecimento: float, pausa: float) -> dict:
+    descarte = {nome: [] for nome in CENARIOS}
+    fim = time.perf_counter() + aquecimento
+    await asyncio.gather(*(_cliente(app, ids, fim, descarte, {}, i, pausa) for i in range(clientes)))
+
+    amostras, erros = {nome: [] for nome in CENARIOS}, {}
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*(_cliente(app, ids, fim, amostras, erros, 1000 + i, pausa) for i in range(clientes)))
+    decorrido = time.perf_counter() - inicio
+
+    cenarios = {}
+    for nome, tempos in amostras.items():
+        tempos.sort()
+        cenarios[nome] = {
+            "requisicoes": len(tempos),
+            "erros": erros.get(nome, 0),
+            "vazao_rps": round(len(tempos) / decorrido, 1),
+            "p50_ms": round(percentil(tempos, 0.50) * 1000, 2),
+            "p95_ms": round(percentil(tempos, 0.95) * 1000, 2),
+            "p99_ms": round(percentil(tempos, 0.99) * 1000, 2),
+        }
+    todos = sorted(t for tempos in amostras.values() for t in tempos)
+    return {
+        "clientes": clientes,
+        "vazao_total_rps": round(len(todos) / decorrido, 1),
+        "erros": sum(erros.values()),
+        "p50_ms": round(percentil(todos, 0.50) * 1000, 2),
+        "p99_ms": round(percentil(todos, 0.99) * 1000, 2),
+        "cenarios": cenarios,
+    }
+
+
+async def executar(ids, niveis: list, duracao: float, aquecimento: float, pausa: float = 0.0) -> list:
+    """Um resultado por nível de concorrência, todos com a mesma app (uma vez o lifespan)"""
+    # Importado só depois de DB_CONFIG apontar para o banco descartável; templates e
+    # estáticos são caminhos relativos à raiz do projeto
+    os.chdir(RAIZ)
+    # Os clientes do teste disparam sem pausa: sem o balde por cliente, que os recusaria com 429
+    os.environ.setdefault("ADMISSAO_TAXA_LEITURA", "0")
+    os.environ.setdefault("ADMISSAO_TAXA_ESCRITA", "0")
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        return [await _medir(app, ids, clientes, duracao, aquecimento, pausa) for clientes in niveis]
+
+
+def comparar(atual: dict, base: dict, limiar: float = LIMIAR_REGRESSAO) -> list:
+    """Regressões de p95 ou vazão acima do limiar, por cenário"""
+    regressoes = []
+    for nome, dados in atual["cenarios"].items():
+        anterior = base.get("cenarios", {}).get(nome)
+        if not anterior or not anterior["requisicoes"]:
+            continue
+        if dados["p95_ms"] > anterior["p95_ms"] * (1 + limiar):
+            regressoes.append(f"{nome}: p95 {anterior['p95_ms']} -> {dados['p95_ms']} ms")
+        if dados["vazao_rps"] < anterior["vazao_rps"] * (1 - limiar):
+            regressoes.append(f"{nome}: vazão {anterior['vazao_rps']} -> {dados['vazao_rps']} req/s")
+    return regressoes
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do InfraCheck+")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--clientes", type=int, default=20)
+    parser.add_argument("--varredura", help="níveis de clientes separados por vírgula, ex.: 1,5,10,20")
+    parser.add_argument("--pausa", type=float, default=0.0, help="segundos (média) entre requisições de cada cliente")
+    parser.add_argument("--duracao", type=float, default=20.0, help="segundos medidos (por nível)")
+    parser.add_argument("--aquecimento", type=float, default=3.0, help="segundos descartados (por nível)")
+    parser.add_argument("--pg-bin", default=os.getenv("PG_BIN"), help="pasta com initdb e pg_ctl")
+    parser.add_argument("--saida", type=Path)
+    parser.add_argument("--comparar", type=Path, help="resultado anterior para detectar regressões")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_REGRESSAO)
+    args = parser.parse_args()
+    niveis = [int(n) for n in args.varredura.split(",")] if args.varredura else [args.clientes]
+
+    with postgres_descartavel(args.pg_bin) as config:
+        ids = popular(config, args.linhas)
+        # O mesmo dict é usado por db, cache e eventos: atualizar no lugar redireciona todos
+        DB_CONFIG.clear()
+        DB_CONFIG.update(config)
+        medicoes = asyncio.run(executar(ids, niveis, args.duracao, args.aquecimento, args.pausa))
+
+    parametros = {
+        "linhas": args.linhas, "clientes": niveis if args.varredura else args.clientes,
+        "duracao": args.duracao, "pausa": args.pausa,
+    }
+    resultado = {"commit": _commit(), "data": datetime.now().isoformat(timespec="seconds"), "parametros": parametros}
+
+    if args.varredura:
+        resultado["varredura"] = medicoes
+        base = medicoes[0]["p99_ms"] or 1
+        print(f"{'clientes':>8} {'req/s':>8} {'erros':>6} {'p50 ms':>8} {'p99 ms':>8} {'p99/base':>9}")
+        for m in medicoes:
+            print(f"{m['clientes']:>8} {m['vazao_total_rps']:>8} {m['erros']:>6} "
+                  f"{m['p50_ms']:>8} {m['p99_ms']:>8} {m['p99_ms'] / base:>8.2f}x")
+    else:
+        resultado.update(vazao_total_rps=medicoes[0]["vazao_total_rps"], cenarios=medicoes[0]["cenarios"])
+        print(f"{'cenário':<18} {'req':>7} {'erros':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for nome, c in resultado["cenarios"].items():
+            print(f"{nome:<18} {c['requisicoes']:>7} {c['erros']:>6} {c['vazao_rps']:>8} "
+                  f"{c['p50_ms']:>8} {c['p95_ms']:>8} {c['p99_ms']:>8}")
+        print(f"total: {resultado['vazao_total_rps']} req/s")
+
+    prefixo = "varredura" if args.varredura else "carga"
+    saida = args.saida or RESULTADOS_DIR / f"{prefixo}-{resultado['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(f"💾 {saida}")
+
+    if args.comparar and not args.varredura:
+        regressoes = comparar(resultado, json.loads(args.comparar.read_text()), args.limiar)
+        for r in regressoes:
+            print(f"❌ regressão: {r}")
+        if regressoes:
+            return 1
+        print("✅ sem regressões")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
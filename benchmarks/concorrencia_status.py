@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+# Segredo só deste processo: os tokens são gerados aqui mesmo
+os.environ.setdefault("JWT_SECRET", secrets.token_hex(32))
+
+import httpx  # noqa: E402
+import psycopg2  # noqa: E402
+
+import chamados_repo  # noqa: E402
+from auth import criar_token  # noqa: E402
+from db import DB_CONFIG  # noqa: E402
+from main import app  # noqa: E402
+
+# ==========================================================
+# Concorrência na máquina de estados do chamado
+# Para cada rodada cria um chamado aberto e dispara N clientes
+# ao mesmo tempo contra ELE, sorteando entre as rotas que mudam
+# status (PUT /chamados/{id}/..., /fiscal/..., /gerente/concluir,
+# /admin/concluir). Verifica, por rodada:
+#   - toda resposta é 200/302 ou 409 (nunca 404/500)
+#   - no máximo uma transição aplicada para cada destino
+#   - se algum concluir rodou, o chamado termina concluído
+#     (um visualizar atrasado não o faz "voltar")
+#   - um 409 sempre traz o status que de fato impediu a transição
+# Usa o banco de DB_CONFIG; os chamados criados são apagados no fim.
+#
+#   python benchmarks/concorrencia_status.py [--clientes 50] [--rodadas 20]
+# ==========================================================
+
+ACOES = {
+    "PUT visualizar": ("PUT", "/chamados/{id}/visualizar", "visualizado"),
+    "PUT concluir": ("PUT", "/chamados/{id}/concluir", "concluído"),
+    "fiscal visualizar": ("POST", "/fiscal/visualizar/{id}", "visualizado"),
+    "fiscal concluir": ("POST", "/fiscal/concluir/{id}", "concluído"),
+    "gerente concluir": ("POST", "/gerente/concluir/{id}", "concluído"),
+    "admin concluir": ("POST", "/admin/concluir/{id}", "concluído"),
+}
+
+# Transições aplicadas de verdade, por (chamado, destino), e conflitos que trouxeram
+# um status de onde a transição seria permitida (linha lida antes da concorrente)
+aplicadas = Counter()
+conflitos_desatualizados = []
+_transicionar = chamados_repo._transicionar
+
+
+def _observar(cur, chamado_id, destino, *args, **kwargs):
+    transicao = _transicionar(cur, chamado_id, destino, *args, **kwargs)
+    if transicao and transicao.resultado == "aplicada":
+        aplicadas[chamado_id, destino] += 1
+    elif transicao and transicao.resultado == "conflito" and transicao.chamado.status in chamados_repo.origens(destino):
+        conflitos_desatualizados.append(f"#{chamado_id}: conflito para {destino} com status {transicao.chamado.status}")
+    return transicao
+
+
+chamados_repo._transicionar = _observar
+
+
+def criar_chamados(quantidade: int) -> list:
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO chamados (loja_id, descricao, prioridade, solicitado_por, status, criado_em, atualizado_em)
+            SELECT 1, 'Teste de concorrência de status', 'média', 'benchmark', 'aberto', NOW(), NOW()
+            FROM generate_series(1, %s)
+            RETURNING id;
+        """, (quantidade,))
+        return [i for (i,) in cur.fetchall()]
+
+
+def status_finais(ids: list) -> dict:
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT id, status FROM chamados WHERE id = ANY(%s);", (ids,))
+        return dict(cur.fetchall())
+
+
+def apagar(ids: list):
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        conn.cursor().execute("DELETE FROM chamados WHERE id = ANY(%s);", (ids,))
+
+
+async def rodada(clientes: list, chamado_id: int, rng: random.Random) -> tuple:
+    sorteadas = [rng.choice(list(ACOES)) for _ in clientes]
+
+    async def disparar(cliente, nome):
+        metodo, rota, _ = ACOES[nome]
+        inicio = time.perf_counter()
+        resposta = await cliente.request(
+            metodo, rota.format(id=chamado_id), headers={"Accept": "application/json"}
+        )
+        return nome, resposta.status_code, time.perf_counter() - inicio
+
+    return sorteadas, await asyncio.gather(*(disparar(c, n) for c, n in zip(clientes, sorteadas)))
+
+
+async def executar(quantidade_clientes: int, rodadas: int, semente: int) -> list:
+    rng = random.Random(semente)
+    ids = criar_chamados(rodadas)
+    cookies = {"sessao": criar_token({"sub": "concorrencia", "papel": "admin"})}
+    falhas, codigos, tempos = [], Counter(), []
+    try:
+        async with app.router.lifespan_context(app):
+            clientes = [
+                httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://concorrencia", cookies=cookies)
+                for _ in range(quantidade_clientes)
+            ]
+            inicio = time.perf_counter()
+            for chamado_id in ids:
+                sorteadas, respostas = await rodada(clientes, chamado_id, rng)
+                for nome, codigo, duracao in respostas:
+                    codigos[codigo] += 1
+                    tempos.append(duracao)
+                    if codigo not in (200, 302, 409):
+                        falhas.append(f"#{chamado_id}: {nome} respondeu {codigo}")
+                for destino in ("visualizado", "concluído"):
+                    if aplicadas[chamado_id, destino] > 1:
+                        falhas.append(f"#{chamado_id}: {aplicadas[chamado_id, destino]} transições para {destino}")
+                pediu_concluir = any(ACOES[n][2] == "concluído" for n in sorteadas)
+                final = status_finais([chamado_id])[chamado_id]
+                if pediu_concluir and final != "concluído":
+                    falhas.append(f"#{chamado_id}: terminou {final} depois de concluído")
+            decorrido = time.perf_counter() - inicio
+            for cliente in clientes:
+                await cliente.aclose()
+    finally:
+        apagar(ids)
+
+    falhas.extend(conflitos_desatualizados)
+    tempos.sort()
+    total = len(tempos)
+    print(f"{rodadas} chamados x {quantidade_clientes} clientes simultâneos ({total} requisições)")
+    print(f"  {total / decorrido:.0f} req/s | p50 {tempos[total // 2] * 1000:.1f} ms | "
+          f"p99 {tempos[int(total * 0.99) - 1] * 1000:.1f} ms")
+    print(f"  respostas: {dict(sorted(codigos.items()))}")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vários clientes mudando o status do mesmo chamado ao mesmo tempo")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--rodadas", type=int, default=20)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    falhas = asyncio.run(executar(args.clientes, args.rodadas, args.semente))
+    for falha in falhas:
+        print(f"  ❌ {falha}")
+    if falhas:
+        raise SystemExit(1)
+    print("  ✅ nenhuma transição duplicada ou regressão de status")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+
+import httpx  # noqa: E402
+from starlette.applications import Starlette  # noqa: E402
+from starlette.routing import Mount  # noqa: E402
+
+import estaticos  # noqa: E402
+
+# ==========================================================
+# Bytes dos arquivos de /static por visita
+# Primeira visita: baixa todo o precache do service worker.
+# Revisita sem ?v= (como era antes): uma requisição condicional
+# por arquivo (304). Com ?v= e immutable: o navegador nem pergunta.
+# Compara sem compressão, gzip e brotli (variantes pré-geradas
+# por `python estaticos.py`). Não usa banco.
+#
+#   python benchmarks/estaticos.py [--repeticoes 200]
+# ==========================================================
+
+app = Starlette(routes=[Mount("/static", estaticos.ArquivosEstaticos(directory="static"))])
+
+
+async def primeira_visita(cliente, urls: list, codificacao: str) -> int:
+    total = 0
+    for url in urls:
+        resposta = await cliente.get(url, headers={"Accept-Encoding": codificacao})
+        assert resposta.status_code == 200, url
+        total += int(resposta.headers["content-length"])
+    return total
+
+
+async def servir(cliente, url: str, codificacao: str, repeticoes: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        await cliente.get(url, headers={"Accept-Encoding": codificacao})
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+async def executar(repeticoes: int):
+    estaticos.registro.preparar()
+    urls = estaticos.registro.precache()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as cliente:
+        print(f"Primeira visita ({len(urls)} arquivos do precache):")
+        base = None
+        for nome, codificacao in (("sem compressão", "identity"), ("gzip", "gzip"), ("brotli", "br, gzip")):
+            total = await primeira_visita(cliente, urls, codificacao)
+            base = base or total
+            print(f"  {nome:<16}{total / 1024:>8.1f} KiB ({total / base:>5.1%})")
+
+        css = estaticos.registro.url("vendor/bootstrap-5.3.2/bootstrap.min.css")
+        print(f"Servir {css} (média de {repeticoes}):")
+        for nome, codificacao in (("sem compressão", "identity"), ("brotli pronto", "br")):
+            duracao = await servir(cliente, css, codificacao, repeticoes)
+            print(f"  {nome:<16}{duracao * 1000:>8.2f} ms")
+
+        # Revisita: sem impressão digital o navegador revalida cada arquivo
+        resposta = await cliente.get(css.split("?")[0])
+        print("Revisita:")
+        print(f"  sem ?v=          {len(urls)} requisições condicionais (Cache-Control: {resposta.headers['cache-control']})")
+        resposta = await cliente.get(css)
+        print(f"  com ?v=          0 requisições (Cache-Control: {resposta.headers['cache-control']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes e tempo dos estáticos com e sem pré-compressão")
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(executar(args.repeticoes))
+
+
+if __name__ == "__main__":
+    main()
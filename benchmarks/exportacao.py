@@ -0,0 +1,73 @@
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import psycopg2  # noqa: E402
+
+import exportacao  # noqa: E402
+from chamados_repo import Filtros, iterar_exportacao  # noqa: E402
+from db import DB_CONFIG  # noqa: E402
+from init_db import migrar  # noqa: E402
+from verificar_indices import popular  # noqa: E402
+
+# ==========================================================
+# Memória da exportação em streaming
+# Popula `chamados` com 1 milhão de linhas DENTRO de uma transação
+# (nada é gravado), exporta faixas crescentes pelo mesmo caminho
+# da rota /chamados/exportar e mede o pico de memória Python.
+# O pico deve ficar estável: só um lote vive em memória por vez.
+#
+#   python benchmarks/exportacao.py [linhas] [csv|ndjson]
+# ==========================================================
+
+# Linhas de carga têm criado_em = agora - i minutos: dias de histórico por faixa
+FAIXAS_DIAS = [7, 70, 700]
+
+
+def medir(conn, formato: str, filtros: Filtros):
+    bytes_enviados = 0
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    for pedaco in exportacao.gerar(formato, iterar_exportacao(conn, filtros)):
+        bytes_enviados += len(pedaco)
+    duracao = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    cur = conn.cursor()
+    condicoes, params = filtros.condicoes()
+    cur.execute(f"SELECT count(*) FROM chamados WHERE {' AND '.join(condicoes)};", params)
+    linhas = cur.fetchone()[0]
+    return linhas, bytes_enviados, pico, duracao
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    formato = sys.argv[2] if len(sys.argv) > 2 else "csv"
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        migrar(conn)
+        popular(conn.cursor(), total)
+        print(f"{total} linhas de carga, formato {formato}")
+        picos = []
+        for dias in FAIXAS_DIAS:
+            filtros = Filtros(desde=date.today() - timedelta(days=dias))
+            linhas, enviados, pico, duracao = medir(conn, formato, filtros)
+            picos.append(pico)
+            print(
+                f"  últimos {dias:4d} dias: {linhas:9d} linhas  {enviados / 2**20:8.1f} MiB enviados"
+                f"  pico {pico / 2**20:6.2f} MiB  {duracao:6.1f} s"
+            )
+        # 100x mais linhas não pode custar muito mais memória
+        assert max(picos) < 2 * min(picos) + 2**20, "pico de memória cresce com o número de linhas"
+        print("✅ memória constante")
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
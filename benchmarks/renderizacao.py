@@ -0,0 +1,118 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)  # o loader dos templates usa o caminho relativo "templates"
+
+import renderizacao  # noqa: E402
+from chamados_repo import Filtros  # noqa: E402
+
+# ==========================================================
+# Renderização de uma lista grande (5 mil chamados por padrão)
+# Compara, para cada tela de listagem:
+#   sem cache     -> cada linha renderizada do zero (cache de fragmentos desligado)
+#   frio          -> primeira página com o cache vazio (renderiza e guarda)
+#   quente        -> mesma lista de novo, tudo vindo do cache
+#   1% alterado   -> a cada render, 1% dos chamados com atualizado_em novo
+# e o tempo de carregar todos os templates compilando vs do bytecode.
+# Não usa banco: as linhas são geradas em memória.
+#
+#   python benchmarks/renderizacao.py [--linhas 5000] [--repeticoes 10]
+# ==========================================================
+
+TELAS = {
+    "fiscal_list.html": {"com_busca": True},
+    "admin_list.html": {},
+    "chamado_list.html": {},
+}
+
+
+def gerar_chamados(quantidade: int) -> list:
+    base = datetime(2025, 1, 1)
+    return [
+        {
+            "id": i,
+            "loja": f"LOJA {1 + i % 8:02d}",
+            "descricao": f"Ar condicionado não gela no setor {i % 40} <depósito>",
+            "prioridade": ("alta", "média", "baixa")[i % 3],
+            "cor": ("vermelho", "amarelo", "verde")[i % 3],
+            "status": ("aberto", "visualizado", "concluído")[i % 3],
+            "solicitado_por": f"Gerente {i % 25}",
+            "criado_em": base + timedelta(minutes=i),
+            "atualizado_em": base + timedelta(minutes=i),
+        }
+        for i in range(quantidade)
+    ]
+
+
+def _contexto(chamados: list, extra: dict) -> dict:
+    return {"request": None, "chamados": chamados, "lojas": [], "filtros": Filtros(), "proxima_pagina": None, **extra}
+
+
+def _tempo(funcao) -> float:
+    inicio = time.perf_counter()
+    funcao()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def medir_tela(nome: str, extra: dict, chamados: list, repeticoes: int) -> dict:
+    sem_cache = renderizacao.criar_ambiente(max_fragmentos=0, diretorio_bytecode=None)
+    com_cache = renderizacao.criar_ambiente(max_fragmentos=len(chamados) * 4, diretorio_bytecode=None)
+    t_sem, t_com = sem_cache.get_template(nome), com_cache.get_template(nome)
+    contexto = _contexto(chamados, extra)
+
+    referencia = t_sem.render(contexto)
+    frio = _tempo(lambda: t_com.render(contexto))
+    assert t_com.render(contexto) == referencia, f"{nome}: HTML do cache difere do renderizado"
+
+    alterados = max(1, len(chamados) // 100)
+
+    def com_alteracoes():
+        for c in chamados[:alterados]:
+            c["atualizado_em"] += timedelta(seconds=1)
+        t_com.render(contexto)
+
+    return {
+        "sem cache": statistics.median(_tempo(lambda: t_sem.render(contexto)) for _ in range(repeticoes)),
+        "frio": frio,
+        "quente": statistics.median(_tempo(lambda: t_com.render(contexto)) for _ in range(repeticoes)),
+        "1% alterado": statistics.median(_tempo(com_alteracoes) for _ in range(repeticoes)),
+        "kib": len(referencia.encode()) / 1024,
+    }
+
+
+def medir_carga_templates() -> dict:
+    with tempfile.TemporaryDirectory() as diretorio:
+        compilando = _tempo(lambda: renderizacao.precompilar(renderizacao.criar_ambiente(diretorio_bytecode=diretorio)))
+        do_bytecode = _tempo(lambda: renderizacao.precompilar(renderizacao.criar_ambiente(diretorio_bytecode=diretorio)))
+    return {"compilando": compilando, "do bytecode": do_bytecode}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renderização de listas grandes com e sem cache de fragmentos")
+    parser.add_argument("--linhas", type=int, default=5000)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    args = parser.parse_args()
+
+    carga = medir_carga_templates()
+    print(f"Templates: {carga['compilando']:.0f} ms compilando, {carga['do bytecode']:.0f} ms do bytecode em disco")
+
+    print(f"Render de {args.linhas} chamados (mediana de {args.repeticoes}, ms):")
+    print(f"  {'tela':<20}{'sem cache':>11}{'frio':>9}{'quente':>9}{'1% alterado':>13}{'KiB':>8}")
+    for nome, extra in TELAS.items():
+        r = medir_tela(nome, extra, gerar_chamados(args.linhas), args.repeticoes)
+        print(
+            f"  {nome:<20}{r['sem cache']:>11.1f}{r['frio']:>9.1f}{r['quente']:>9.1f}"
+            f"{r['1% alterado']:>13.1f}{r['kib']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+# Segredo só deste processo: os tokens são gerados aqui mesmo
+os.environ.setdefault("JWT_SECRET", secrets.token_hex(32))
+
+import httpx  # noqa: E402
+import psycopg2  # noqa: E402
+
+import db  # noqa: E402
+from auth import criar_token  # noqa: E402
+from carga import _binario, _porta_livre, popular, postgres_descartavel  # noqa: E402
+
+# ==========================================================
+# Réplica de leitura: roteamento, read-your-writes e fallback
+# Sobe um primário e uma réplica descartáveis (initdb, depois
+# pg_basebackup -R = streaming replication), aponta db.py para
+# eles e verifica contra a app ASGI real:
+#   1) as listagens são lidas na réplica;
+#   2) com o replay da réplica pausado, quem escreveu vê a própria
+#      escrita (cookie -> primário), os outros leem da réplica e
+#      essa leitura velha não entra no cache;
+#   3) réplica atrasada além de DB_REPLICA_ATRASO_MAX -> primário;
+#   4) réplica parada -> primário; ela volta a ser usada ao subir.
+#
+#   python benchmarks/replicacao.py [--pg-bin /usr/lib/postgresql/16/bin]
+#
+# O initdb não roda como root: use um usuário comum.
+# ==========================================================
+
+ATRASO_MAX = 1.0
+INTERVALO = 0.2
+
+
+@contextmanager
+def replica_descartavel(primario: dict, pg_bin=None):
+    """Réplica em streaming do `primario`; devolve a config de conexão e o pg_ctl para pará-la"""
+    pasta = Path(tempfile.mkdtemp(prefix="infracheck-replica-"))
+    dados = pasta / "dados"
+    porta = _porta_livre()
+    subprocess.run(
+        [_binario(pg_bin, "pg_basebackup"), "-h", primario["host"], "-p", str(primario["port"]),
+         "-U", primario["user"], "-D", str(dados), "-R", "-X", "stream"],
+        check=True, env=dict(os.environ, PGPASSWORD=primario["password"]),
+    )
+    pg_ctl = _binario(pg_bin, "pg_ctl")
+    comando = [
+        pg_ctl, "-D", str(dados), "-l", str(pasta / "log"), "-w",
+        "-o", f"-p {porta} -k {pasta} -c fsync=off -c listen_addresses=127.0.0.1",
+    ]
+    subprocess.run([*comando, "start"], check=True, stdout=subprocess.DEVNULL)
+    try:
+        yield dict(primario, port=porta), comando
+    finally:
+        subprocess.run([pg_ctl, "-D", str(dados), "-m", "fast", "-w", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def _executar_sql(config: dict, sql: str):
+    conn = psycopg2.connect(**config)
+    conn.autocommit = True
+    try:
+        conn.cursor().execute(sql)
+    finally:
+        conn.close()
+
+
+async def _esperar(condicao, limite: float = 10.0) -> bool:
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        if condicao():
+            return True
+        await asyncio.sleep(INTERVALO / 2)
+    return False
+
+
+def _desvios() -> dict:
+    return dict(db.replicacao_stats())
+
+
+async def verificar(replica: dict, comando_replica: list) -> list:
+    from main import app
+
+    falhas = []
+
+    def checar(ok: bool, descricao: str):
+        print(f"  {'✅' if ok else '❌'} {descricao}")
+        if not ok:
+            falhas.append(descricao)
+
+    transporte = httpx.ASGITransport(app=app)
+
+    def cliente(sub: str):
+        cookies = {"sessao": criar_token({"sub": sub, "papel": "admin"})}
+        return httpx.AsyncClient(transport=transporte, base_url="http://replicacao", cookies=cookies)
+
+    async def encontrados(c, termo: str, limite: int) -> list:
+        resposta = await c.get("/chamados/busca", params={"q": termo, "limite": limite})
+        assert resposta.status_code == 200, resposta.text
+        return [ch["id"] for ch in resposta.json()["chamados"]]
+
+    async with app.router.lifespan_context(app), cliente("escreveu") as autor, cliente("outro") as outro:
+        await _esperar(lambda: _desvios().get("replica0_no_ar") == 1)
+
+        print("1) Leituras vão para a réplica")
+        antes = _desvios()
+        await outro.get("/chamados/fiscal")
+        depois = _desvios()
+        checar(depois["leituras_replica"] > antes["leituras_replica"], "listagem lida na réplica")
+        checar(depois["leituras_primario"] == antes["leituras_primario"], "nenhuma leitura desviada para o primário")
+
+        print("2) Read-your-writes com o replay pausado")
+        _executar_sql(replica, "SELECT pg_wal_replay_pause();")
+        resposta = await autor.post("/chamados/gerente", json={
+            "loja_id": 1, "descricao": "Vazamento replicacaoteste", "prioridade": "alta", "solicitado_por": "replicação",
+        })
+        novo = resposta.json()["chamado"]["id"]
+        checar(db.COOKIE_ESCRITA in resposta.cookies, "escrita devolve o cookie com o LSN")
+        checar(novo in await encontrados(autor, "replicacaoteste", 10), "quem escreveu vê o chamado novo")
+        checar(novo not in await encontrados(outro, "replicacaoteste", 11), "outra sessão lê da réplica (sem o chamado)")
+        checar(novo in await encontrados(autor, "replicacaoteste", 11), "a leitura velha da réplica não ficou no cache")
+
+        print("3) Réplica atrasada -> primário")
+        atrasou = await _esperar(lambda: _desvios()["replica0_atraso_segundos"] > ATRASO_MAX)
+        checar(atrasou, f"atraso medido passa de {ATRASO_MAX}s com o replay pausado")
+        antes = _desvios()
+        checar(novo in await encontrados(outro, "replicacaoteste", 12), "outra sessão passa a ler do primário")
+        checar(_desvios()["desvios_atraso"] > antes["desvios_atraso"], "desvio contado como atraso")
+        _executar_sql(replica, "SELECT pg_wal_replay_resume();")
+        alcancou = await _esperar(lambda: _desvios()["replica0_atraso_segundos"] == 0)
+        checar(alcancou, "réplica alcança o primário depois de retomar o replay")
+        antes = _desvios()
+        checar(novo in await encontrados(autor, "replicacaoteste", 13), "autor volta para a réplica, já em dia")
+        checar(_desvios()["leituras_replica"] > antes["leituras_replica"], "leitura do autor contada na réplica")
+
+        print("4) Réplica fora do ar -> primário")
+        subprocess.run([*comando_replica, "-m", "fast", "stop"], check=True, stdout=subprocess.DEVNULL)
+        caiu = await _esperar(lambda: _desvios()["replica0_no_ar"] == 0)
+        checar(caiu, "monitor marca a réplica fora do ar")
+        codigos = [(await outro.get("/chamados/fiscal", params={"limite": 20 + i})).status_code for i in range(5)]
+        checar(codigos == [200] * 5, f"leituras seguem pelo primário ({codigos})")
+        subprocess.run([*comando_replica, "start"], check=True, stdout=subprocess.DEVNULL)
+        voltou = await _esperar(lambda: _desvios()["replica0_no_ar"] == 1, limite=30)
+        checar(voltou, "réplica volta a ser usada quando sobe")
+        antes = _desvios()
+        resposta = await outro.get("/chamados/fiscal", params={"limite": 30})
+        checar(
+            resposta.status_code == 200 and _desvios()["leituras_replica"] > antes["leituras_replica"],
+            "conexões antigas do pool da réplica foram revalidadas",
+        )
+        print(f"  números: {db.replicacao_stats()}")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roteamento de leituras para uma réplica em streaming")
+    parser.add_argument("--pg-bin", default=os.getenv("PG_BIN"), help="pasta com initdb, pg_ctl e pg_basebackup")
+    args = parser.parse_args()
+
+    with postgres_descartavel(args.pg_bin) as primario:
+        popular(primario, 1000)
+        with replica_descartavel(primario, args.pg_bin) as (replica, comando):
+            # O mesmo dict é usado por db, cache e eventos: atualizar no lugar redireciona todos
+            db.DB_CONFIG.clear()
+            db.DB_CONFIG.update(primario)
+            db.REPLICA_URLS = [psycopg2.extensions.make_dsn(**replica)]
+            db.REPLICA_ATRASO_MAX = ATRASO_MAX
+            db.REPLICA_CHECK_INTERVALO = INTERVALO
+            falhas = asyncio.run(verificar(replica, comando))
+
+    if falhas:
+        raise SystemExit(1)
+    print("✅ leituras na réplica, read-your-writes e fallback para o primário")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import gc
+import os
+import secrets
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.chdir(RAIZ)
+# Segredo só deste processo: os tokens são gerados aqui mesmo
+os.environ.setdefault("JWT_SECRET", secrets.token_hex(32))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import exportacao  # noqa: E402
+from chamados_repo import LOTE_EXPORTACAO  # noqa: E402
+from main import pagina_json  # noqa: E402
+from modelos import Chamado, PaginaChamados, serializar  # noqa: E402
+
+# ==========================================================
+# Serialização JSON de listas grandes de chamados
+# Compara o caminho antigo (jsonable_encoder + json da stdlib),
+# o response_model do FastAPI (valida e serializa via pydantic),
+# o orjson direto (pagina_json, usado nas rotas /chamados/*) e o
+# array em streaming (exportacao.gerar_json, lotes do cursor).
+# Mede tempo e pico de memória Python (tracemalloc, em outra
+# passada para não distorcer o tempo). Não usa banco.
+#
+#   python benchmarks/serializacao.py [--tamanhos 10000 100000]
+# ==========================================================
+
+_pagina = TypeAdapter(PaginaChamados)
+
+
+def gerar_chamados(quantidade: int) -> list:
+    base = datetime(2025, 1, 1, 8, 30, 15, 123456)
+    return [
+        Chamado(
+            i, 1 + i % 8, f"Ar condicionado não gela no setor {i % 40}", ("alta", "média", "baixa")[i % 3],
+            ("aberto", "visualizado", "concluído")[i % 3], f"Gerente {i % 25}",
+            base + timedelta(minutes=i), base + timedelta(minutes=i, seconds=30),
+        )
+        for i in range(quantidade)
+    ]
+
+
+def stdlib(chamados: list) -> int:
+    conteudo = {"chamados": [serializar(c) for c in chamados], "proximo_cursor": None}
+    return len(JSONResponse(jsonable_encoder(conteudo)).body)
+
+
+def response_model(chamados: list) -> int:
+    conteudo = {"chamados": [serializar(c) for c in chamados], "proximo_cursor": None}
+    validado = _pagina.validate_python(conteudo)
+    return len(JSONResponse(_pagina.dump_python(validado, mode="json")).body)
+
+
+def orjson_direto(chamados: list) -> int:
+    return len(pagina_json(chamados, None).body)
+
+
+def fluxo(chamados: list) -> int:
+    lotes = (chamados[i:i + LOTE_EXPORTACAO] for i in range(0, len(chamados), LOTE_EXPORTACAO))
+    return sum(len(pedaco) for pedaco in exportacao.gerar_json(lotes))
+
+
+CAMINHOS = {
+    "jsonable_encoder + json": stdlib,
+    "response_model (pydantic)": response_model,
+    "orjson (pagina_json)": orjson_direto,
+    "orjson em streaming": fluxo,
+}
+
+
+def medir(funcao, chamados: list, repeticoes: int) -> tuple:
+    gc.collect()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        tamanho = funcao(chamados)
+        tempos.append(time.perf_counter() - inicio)
+    gc.collect()
+    tracemalloc.start()
+    funcao(chamados)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(tempos), pico, tamanho
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo e memória da serialização JSON de chamados")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    for quantidade in args.tamanhos:
+        chamados = gerar_chamados(quantidade)
+        print(f"{quantidade} chamados (melhor de {args.repeticoes}):")
+        base = None
+        for nome, funcao in CAMINHOS.items():
+            duracao, pico, tamanho = medir(funcao, chamados, args.repeticoes)
+            base = base or duracao
+            print(
+                f"  {nome:<27}{duracao * 1000:>9.1f} ms ({base / duracao:>4.1f}x)"
+                f"  pico {pico / 2**20:>7.1f} MiB  {tamanho / 2**20:>6.1f} MiB de JSON"
+            )
+
+
+if __name__ == "__main__":
+    main()
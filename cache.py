@@ -0,0 +1,175 @@
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.extensions
+
+import db
+from db import DB_CONFIG
+
+# ==========================================================
+# Cache das listagens de chamados
+# TTL + LRU em memória, invalidado por toda escrita. O backend
+# decide como a invalidação chega aos outros workers:
+#   local    -> só o próprio processo (um worker)
+#   postgres -> NOTIFY na transação de escrita + LISTEN em cada worker
+# Com réplicas, cada item guarda o LSN de onde foi lido: leitura
+# atrasada em relação às escritas conhecidas não entra no cache,
+# e uma sessão que acabou de escrever ignora itens anteriores.
+# ==========================================================
+
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+CACHE_MAX_ITENS = int(os.getenv("CACHE_MAX_ITENS", "256"))
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+
+CANAL_INVALIDACAO = "cache_chamados"
+
+_AUSENTE = object()
+
+
+class BackendLocal:
+    """Invalidação apenas no processo atual"""
+
+    def iniciar(self, ao_invalidar):
+        pass
+
+    def parar(self):
+        pass
+
+    def publicar(self, cur):
+        pass
+
+
+class BackendPostgres:
+    """Invalidação entre workers via LISTEN/NOTIFY"""
+
+    def __init__(self, canal: str = CANAL_INVALIDACAO):
+        self.canal = canal
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self, ao_invalidar):
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._escutar, args=(ao_invalidar,), name="cache-listen", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def publicar(self, cur):
+        # Entregue só no COMMIT da mesma transação, sem ida extra ao banco
+        cur.execute(f"NOTIFY {self.canal};")
+
+    def _escutar(self, ao_invalidar):
+        while not self._parar.is_set():
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                conn.cursor().execute(f"LISTEN {self.canal};")
+                # Podemos ter perdido avisos enquanto estávamos desconectados
+                ao_invalidar()
+                while not self._parar.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        # Escrita de outro worker: leituras anteriores a ela não podem mais entrar no cache
+                        db.registrar_escrita(conn)
+                        ao_invalidar()
+                conn.close()
+            except psycopg2.Error as e:
+                logging.warning(f"⚠️ LISTEN do cache caiu, reconectando: {e}")
+                self._parar.wait(2)
+
+
+class CacheListagens:
+    def __init__(self, ttl: float, max_itens: int, backend):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self.backend = backend
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self._geracao = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.invalidacoes = 0
+
+    def _ler(self, chave, minimo: int):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return _AUSENTE
+            expira_em, lsn, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                self.falhas += 1
+                return _AUSENTE
+            # Anterior à última escrita da sessão: vale para os outros, não para ela
+            if lsn is not None and lsn < minimo:
+                self.falhas += 1
+                return _AUSENTE
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def _gravar(self, chave, valor, geracao: int, lsn):
+        with self._lock:
+            # Uma escrita aconteceu durante a consulta (ou a réplica ainda não a tem): o resultado pode estar velho
+            if geracao != self._geracao or not db.em_dia(lsn):
+                return
+            self._itens[chave] = (time.monotonic() + self.ttl, lsn, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    async def obter(self, chave, carregar):
+        """Valor em cache ou o resultado de `await carregar()`"""
+        valor = self._ler(chave, db.lsn_minimo())
+        if valor is not _AUSENTE:
+            return valor
+        geracao = self._geracao
+        with db.rastrear_leitura() as leitura:
+            valor = await carregar()
+        self._gravar(chave, valor, geracao, leitura.lsn)
+        return valor
+
+    def invalidar(self):
+        with self._lock:
+            self._geracao += 1
+            self._itens.clear()
+            self.invalidacoes += 1
+
+    def publicar(self, cur):
+        """Avisa os outros workers (chamado dentro da transação de escrita)"""
+        self.backend.publicar(cur)
+
+    def iniciar(self):
+        self.backend.iniciar(self.invalidar)
+
+    def parar(self):
+        self.backend.parar()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "ttl": self.ttl,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "invalidacoes": self.invalidacoes,
+            }
+
+
+BACKENDS = {"local": BackendLocal, "postgres": BackendPostgres}
+
+listagens = CacheListagens(CACHE_TTL, CACHE_MAX_ITENS, BACKENDS[CACHE_BACKEND]())
@@ -0,0 +1,667 @@
+import asyncio
+import base64
+import json
+import logging
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterator, NamedTuple, Optional
+
+import psycopg2
+from psycopg2.extras import Json
+
+import cache
+import usuarios
+from db import get_connection, assincrono, registrar_escrita, PoolEsgotado
+from etag import Versao
+from modelos import Chamado
+
+# ==========================================================
+# Repositório de chamados
+# Todo acesso à tabela `chamados` passa por aqui. As funções
+# usam psycopg2 (bloqueante) e rodam no threadpool via
+# @assincrono, então as rotas só precisam dar `await`.
+# ==========================================================
+
+COLUNAS = "id, loja_id, descricao, prioridade, status, solicitado_por, criado_em, atualizado_em"
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+# Exportação: linhas trazidas do cursor nomeado por ida ao banco
+LOTE_EXPORTACAO = 2000
+
+# Fila offline: tamanho máximo de um lote e por quanto tempo as chaves são lembradas
+LOTE_MAXIMO = 100
+RETENCAO_CHAVES = "30 days"
+
+# Espelha a coluna gerada chamados.prioridade_rank (migrations/0002), usada no cursor
+RANK_PRIORIDADE = {"alta": 1, "média": 2, "baixa": 3}
+
+ORDEM_DATA = "criado_em DESC, id DESC"
+ORDEM_PRIORIDADE = "prioridade_rank, criado_em DESC, id DESC"
+
+# Configuração de busca textual criada na migração 0009 (português + unaccent)
+CONFIG_BUSCA = "portugues_busca"
+
+# Arquivamento (migração 0011): concluídos há mais de N dias saem de `chamados`
+# para `chamados_arquivo`. 0 desliga o job.
+ARQUIVAR_APOS_DIAS = int(os.getenv("ARQUIVAR_APOS_DIAS", "90"))
+INTERVALO_ARQUIVAMENTO = float(os.getenv("ARQUIVAMENTO_INTERVALO_SEGUNDOS", "3600"))
+LOTE_ARQUIVAMENTO = 1000
+
+# Origem das leituras que pedem o histórico completo (quente + arquivo).
+# O Postgres achata o UNION ALL: filtros e ORDER BY ... LIMIT descem para
+# os índices de cada tabela (Merge Append), sem materializar a união.
+HISTORICO = f"""(
+    SELECT {COLUNAS}, prioridade_rank FROM chamados
+    UNION ALL
+    SELECT {COLUNAS}, prioridade_rank FROM chamados_arquivo
+) chamados"""
+
+
+class CursorInvalido(ValueError):
+    """Cursor de paginação malformado"""
+
+
+@dataclass(frozen=True)
+class Filtros:
+    """Filtros das listagens; campos None são ignorados"""
+    loja_id: Optional[int] = None
+    status: Optional[str] = None
+    prioridade: Optional[str] = None
+    desde: Optional[date] = None
+    ate: Optional[date] = None
+
+    def condicoes(self):
+        condicoes, params = [], []
+        if self.loja_id is not None:
+            condicoes.append("loja_id = %s")
+            params.append(self.loja_id)
+        if self.status:
+            condicoes.append("status = %s")
+            params.append(self.status)
+        if self.prioridade:
+            condicoes.append("prioridade = %s")
+            params.append(self.prioridade)
+        if self.desde:
+            condicoes.append("criado_em >= %s")
+            params.append(self.desde)
+        if self.ate:
+            condicoes.append("criado_em < %s")
+            params.append(self.ate + timedelta(days=1))
+        return condicoes, params
+
+
+def _codificar_cursor(valores: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+
+def _ler_cursor(cursor: str):
+    return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+
+def _decodificar_cursor(cursor: str, tamanho: int) -> list:
+    try:
+        valores = _ler_cursor(cursor)
+        if not isinstance(valores, list) or len(valores) != tamanho:
+            raise ValueError(cursor)
+        valores[-2] = datetime.fromisoformat(valores[-2])
+        valores[-1] = int(valores[-1])
+        return valores
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+@contextmanager
+def _escrita():
+    """Transação de escrita: avisa os outros workers e invalida o cache local após o COMMIT"""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        yield cur
+        cache.listagens.publicar(cur)
+        conn.commit()
+        registrar_escrita(conn)
+    cache.listagens.invalidar()
+
+
+def _inserir(cur, loja_id: int, descricao: str, prioridade: str, solicitado_por: str) -> Chamado:
+    cur.execute(f"""
+        INSERT INTO chamados (loja_id, descricao, prioridade, solicitado_por, status, criado_em, atualizado_em)
+        VALUES (%s, %s, %s, %s, 'aberto', NOW(), NOW())
+        RETURNING {COLUNAS};
+    """, (loja_id, descricao, prioridade, solicitado_por))
+    return Chamado._make(cur.fetchone())
+
+
+@assincrono
+def criar(loja_id: int, descricao: str, prioridade: str, solicitado_por: str, fotos: list = ()) -> Chamado:
+    """Insere um chamado aberto (com as fotos já gravadas pelo anexos.py) e devolve o registro criado"""
+    with _escrita() as cur:
+        chamado = _inserir(cur, loja_id, descricao, prioridade, solicitado_por)
+        if fotos:
+            cur.executemany("""
+                INSERT INTO anexos (chamado_id, chave, tipo, tamanho, nome_original)
+                VALUES (%s, %s, %s, %s, %s);
+            """, [(chamado.id, f.chave, f.tipo, f.tamanho, f.nome_original) for f in fotos])
+        return chamado
+
+
+def _where(condicoes: list) -> str:
+    return f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+
+def _origem(arquivo: bool) -> str:
+    return HISTORICO if arquivo else "chamados"
+
+
+def sql_listar_por_data(filtros: Filtros, cursor: Optional[str], limite: int, arquivo: bool = False):
+    """SQL e parâmetros da listagem por data (busca limite + 1 para saber se há próxima página).
+
+    Só lê `chamados_arquivo` se `arquivo` for True."""
+    condicoes, params = filtros.condicoes()
+    if cursor:
+        criado_em, chamado_id = _decodificar_cursor(cursor, 2)
+        condicoes.append("(criado_em, id) < (%s, %s)")
+        params += [criado_em, chamado_id]
+    sql = f"SELECT {COLUNAS} FROM {_origem(arquivo)} {_where(condicoes)} ORDER BY {ORDEM_DATA} LIMIT %s;"
+    return sql, (*params, limite + 1)
+
+
+def sql_listar_por_prioridade(filtros: Filtros, cursor: Optional[str], limite: int):
+    """SQL e parâmetros da listagem do fiscal.
+
+    A ordenação mistura ASC (rank) e DESC (data), o que impede comparar a tupla
+    inteira com o cursor. Por isso a página seguinte junta duas faixas contíguas
+    do índice: o resto do rank atual e os ranks seguintes."""
+    condicoes, params = filtros.condicoes()
+    if not cursor:
+        sql = f"SELECT {COLUNAS} FROM chamados {_where(condicoes)} ORDER BY {ORDEM_PRIORIDADE} LIMIT %s;"
+        return sql, (*params, limite + 1)
+
+    rank, criado_em, chamado_id = _decodificar_cursor(cursor, 3)
+    mesmo_rank = _where(condicoes + ["prioridade_rank = %s", "(criado_em, id) < (%s, %s)"])
+    ranks_seguintes = _where(condicoes + ["prioridade_rank > %s"])
+    sql = f"""
+        SELECT {COLUNAS} FROM (
+            (SELECT {COLUNAS}, prioridade_rank FROM chamados {mesmo_rank}
+             ORDER BY {ORDEM_DATA} LIMIT %s)
+            UNION ALL
+            (SELECT {COLUNAS}, prioridade_rank FROM chamados {ranks_seguintes}
+             ORDER BY {ORDEM_PRIORIDADE} LIMIT %s)
+        ) pagina
+        ORDER BY {ORDEM_PRIORIDADE} LIMIT %s;
+    """
+    return sql, (
+        *params, rank, criado_em, chamado_id, limite + 1,
+        *params, rank, limite + 1,
+        limite + 1,
+    )
+
+
+def _listar(sql: str, params: tuple) -> list:
+    with get_connection(leitura=True) as conn:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        return list(map(Chamado._make, cur.fetchall()))
+
+
+@assincrono
+def _listar_por_data(
+    filtros: Filtros = Filtros(), cursor: Optional[str] = None, limite: int = LIMITE_PADRAO, arquivo: bool = False
+):
+    """Chamados do mais recente para o mais antigo, paginados por (criado_em, id).
+
+    Devolve (linhas, próximo cursor ou None)."""
+    linhas = _listar(*sql_listar_por_data(filtros, cursor, limite, arquivo))
+    if len(linhas) <= limite:
+        return linhas, None
+    ultima = linhas[limite - 1]
+    return linhas[:limite], _codificar_cursor([ultima.criado_em.isoformat(), ultima.id])
+
+
+@assincrono
+def _listar_por_prioridade(filtros: Filtros = Filtros(), cursor: Optional[str] = None, limite: int = LIMITE_PADRAO):
+    """Chamados por prioridade (alta, média, baixa) e depois por data,
+    paginados por (rank da prioridade, criado_em, id).
+
+    Devolve (linhas, próximo cursor ou None)."""
+    linhas = _listar(*sql_listar_por_prioridade(filtros, cursor, limite))
+    if len(linhas) <= limite:
+        return linhas, None
+    ultima = linhas[limite - 1]
+    rank = RANK_PRIORIDADE.get(ultima.prioridade, 4)
+    return linhas[:limite], _codificar_cursor([rank, ultima.criado_em.isoformat(), ultima.id])
+
+
+def sql_pesquisar(termo: str, filtros: Filtros, cursor: Optional[str], limite: int):
+    """SQL e parâmetros da busca textual, por relevância e paginada por (rank, id).
+
+    O filtro `busca @@ consulta` usa o índice GIN; o rank só é calculado para os
+    chamados que casaram com o termo."""
+    condicoes, params = filtros.condicoes()
+    pagina = ""
+    params_pagina = []
+    if cursor:
+        try:
+            rank, chamado_id = _ler_cursor(cursor)
+            params_pagina = [float(rank), int(chamado_id)]
+        except (ValueError, TypeError) as e:
+            raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+        pagina = "WHERE (rank, id) < (%s::real, %s)"
+    sql = f"""
+        SELECT {COLUNAS}, rank FROM (
+            SELECT {COLUNAS}, ts_rank_cd(busca, consulta) AS rank
+            FROM chamados, websearch_to_tsquery('{CONFIG_BUSCA}', %s) AS consulta
+            {_where(["busca @@ consulta"] + condicoes)}
+        ) resultado
+        {pagina}
+        ORDER BY rank DESC, id DESC LIMIT %s;
+    """
+    return sql, (termo, *params, *params_pagina, limite + 1)
+
+
+@assincrono
+def _pesquisar(termo: str, filtros: Filtros, cursor: Optional[str], limite: int):
+    with get_connection(leitura=True) as conn:
+        cur = conn.cursor()
+        cur.execute(*sql_pesquisar(termo, filtros, cursor, limite))
+        linhas = cur.fetchall()
+    chamados = [Chamado._make(linha[:-1]) for linha in linhas[:limite]]
+    if len(linhas) <= limite:
+        return chamados, None
+    ultima = linhas[limite - 1]
+    return chamados, _codificar_cursor([ultima[-1], ultima[0]])
+
+
+async def pesquisar(termo: str, filtros: Filtros = Filtros(), cursor: Optional[str] = None, limite: int = LIMITE_PADRAO):
+    """Chamados cuja descrição ou solicitante casam com `termo` (sintaxe de busca web:
+    "frase exata", -exclusão, or), do mais relevante ao menos. Devolve (linhas, próximo cursor)."""
+    return await cache.listagens.obter(
+        ("busca", termo, filtros, cursor, limite),
+        lambda: _pesquisar(termo, filtros, cursor, limite),
+    )
+
+
+async def listar_por_data(
+    filtros: Filtros = Filtros(), cursor: Optional[str] = None, limite: int = LIMITE_PADRAO, arquivo: bool = False
+):
+    return await cache.listagens.obter(
+        ("data", filtros, cursor, limite, arquivo),
+        lambda: _listar_por_data(filtros, cursor, limite, arquivo),
+    )
+
+
+async def listar_por_prioridade(filtros: Filtros = Filtros(), cursor: Optional[str] = None, limite: int = LIMITE_PADRAO):
+    return await cache.listagens.obter(
+        ("prioridade", filtros, cursor, limite),
+        lambda: _listar_por_prioridade(filtros, cursor, limite),
+    )
+
+
+def iterar_exportacao(conn, filtros: Filtros = Filtros(), arquivo: bool = False) -> Iterator[list]:
+    """Lotes de Chamado em ordem cronológica, via cursor nomeado (server-side).
+
+    Só um lote fica em memória por vez, qualquer que seja o total de linhas.
+    Com `arquivo`, inclui os chamados de `chamados_arquivo`."""
+    condicoes, params = filtros.condicoes()
+    cur = conn.cursor(name="exportacao_chamados")
+    cur.itersize = LOTE_EXPORTACAO
+    try:
+        cur.execute(f"SELECT {COLUNAS} FROM {_origem(arquivo)} {_where(condicoes)} ORDER BY criado_em, id;", params)
+        while True:
+            lote = cur.fetchmany(LOTE_EXPORTACAO)
+            if not lote:
+                return
+            yield list(map(Chamado._make, lote))
+    finally:
+        cur.close()
+
+
+def exportar(filtros: Filtros = Filtros(), arquivo: bool = False) -> Iterator[list]:
+    """Como iterar_exportacao, com uma conexão do pool presa até o fim da exportação"""
+    with get_connection(leitura=True) as conn:
+        yield from iterar_exportacao(conn, filtros, arquivo)
+        conn.rollback()
+
+
+@assincrono
+def _versao() -> Versao:
+    with get_connection(leitura=True) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT versao, alterado_em FROM chamados_versao WHERE id;")
+        return Versao(*cur.fetchone())
+
+
+async def versao() -> Versao:
+    """Versão atual de `chamados` (muda a cada escrita), para ETag/Last-Modified"""
+    return await cache.listagens.obter(("versao",), _versao)
+
+
+@assincrono
+def buscar(chamado_id: int) -> Optional[Chamado]:
+    """Um chamado pelo id, ou None"""
+    with get_connection(leitura=True) as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT {COLUNAS} FROM chamados WHERE id = %s;", (chamado_id,))
+        linha = cur.fetchone()
+    return Chamado._make(linha) if linha else None
+
+
+# ==========================================================
+# Máquina de estados do chamado
+# aberto -> visualizado -> concluído. Toda transição é um único
+# UPDATE condicional (WHERE id AND status = ANY(origens)), então
+# duas ações concorrentes nunca fazem um concluído "voltar".
+# ==========================================================
+
+STATUS = ("aberto", "visualizado", "concluído")
+
+# Destino -> status de onde se pode chegar a ele. Concluído é final:
+# só a edição do admin (sobrescrever=True) reabre ou muda à vontade.
+TRANSICOES = {
+    "visualizado": ("aberto",),
+    "concluído": ("aberto", "visualizado"),
+}
+
+
+class Transicao(NamedTuple):
+    resultado: str  # "aplicada", "inalterada" (já estava no destino) ou "conflito"
+    chamado: Chamado  # como ficou, ou como está se não mudou
+
+
+def origens(destino: str, sobrescrever: bool = False) -> list:
+    """Status a partir dos quais o chamado pode ir para `destino`"""
+    if destino not in STATUS:
+        raise ValueError(f"Status inválido: {destino}")
+    return list(STATUS) if sobrescrever else list(TRANSICOES.get(destino, ()))
+
+
+def _transicionar(
+    cur, chamado_id: int, destino: str, sobrescrever: bool = False, atribuicoes: str = "", params: tuple = ()
+) -> Optional[Transicao]:
+    """Aplica a transição numa única ida ao banco; None se o chamado não existe.
+
+    Sem mudança, a linha atual é lida com FOR SHARE: se outra transação acabou
+    de alterá-la, o resultado traz o status que impediu a transição."""
+    cur.execute(f"""
+        WITH alterado AS (
+            UPDATE chamados
+            SET status = %s, atualizado_em = NOW(){atribuicoes}
+            WHERE id = %s AND status = ANY(%s)
+            RETURNING {COLUNAS}
+        ), atual AS (
+            SELECT {COLUNAS} FROM chamados
+            WHERE id = %s AND NOT EXISTS (SELECT 1 FROM alterado)
+            FOR SHARE
+        )
+        SELECT TRUE, * FROM alterado
+        UNION ALL
+        SELECT FALSE, * FROM atual;
+    """, (destino, *params, chamado_id, origens(destino, sobrescrever), chamado_id))
+    linha = cur.fetchone()
+    if linha is None:
+        return None
+    chamado = Chamado._make(linha[1:])
+    if linha[0]:
+        return Transicao("aplicada", chamado)
+    return Transicao("inalterada" if chamado.status == destino else "conflito", chamado)
+
+
+@assincrono
+def transicionar(chamado_id: int, destino: str, sobrescrever: bool = False) -> Optional[Transicao]:
+    """Leva o chamado para `destino` se a máquina de estados permitir (None se não existir)"""
+    with _escrita() as cur:
+        return _transicionar(cur, chamado_id, destino, sobrescrever)
+
+
+async def concluir(chamado_id: int) -> Optional[Transicao]:
+    return await transicionar(chamado_id, "concluído")
+
+
+async def visualizar(chamado_id: int) -> Optional[Transicao]:
+    return await transicionar(chamado_id, "visualizado")
+
+
+# Ações em massa que mudam status passam pela mesma tabela de transições
+ACOES_STATUS = {"concluir": "concluído", "visualizar": "visualizado"}
+ACOES_MASSA = (*ACOES_STATUS, "priorizar", "deletar")
+
+
+def _sql_massa(acao: str, alvo: str, params_alvo: list, prioridade: Optional[str]):
+    """Comando único (UPDATE/DELETE ... RETURNING id) da ação sobre as linhas de `alvo`"""
+    if acao == "deletar":
+        return f"DELETE FROM chamados WHERE {alvo} RETURNING id", list(params_alvo)
+    if acao == "priorizar":
+        return (
+            f"UPDATE chamados SET prioridade = %s, atualizado_em = NOW() "
+            f"WHERE {alvo} AND prioridade IS DISTINCT FROM %s RETURNING id",
+            [prioridade, *params_alvo, prioridade],
+        )
+    destino = ACOES_STATUS[acao]
+    return (
+        f"UPDATE chamados SET status = %s, atualizado_em = NOW() "
+        f"WHERE {alvo} AND status = ANY(%s) RETURNING id",
+        [destino, *params_alvo, origens(destino)],
+    )
+
+
+@assincrono
+def acao_em_massa(acao: str, ids: list = None, filtros: Filtros = None, prioridade: Optional[str] = None) -> list:
+    """Aplica a ação a vários chamados num único comando SQL.
+
+    Alvo: lista de ids (`id = ANY(...)`) ou filtros. Devolve [{"id", "resultado"}],
+    com resultado "aplicado", "inalterado" (já estava no estado pedido), "conflito"
+    (status não permite a transição) ou "nao_encontrado"; pelos filtros só vêm os aplicados."""
+    if acao not in ACOES_MASSA:
+        raise ValueError(f"Ação desconhecida: {acao}")
+    if acao == "priorizar" and prioridade not in RANK_PRIORIDADE:
+        raise ValueError(f"Prioridade inválida: {prioridade}")
+
+    if ids is None:
+        condicoes, params_filtro = filtros.condicoes()
+        if not condicoes:
+            raise ValueError("Ação em massa por filtro exige ao menos um filtro")
+        comando, params = _sql_massa(acao, " AND ".join(condicoes), params_filtro, prioridade)
+        with _escrita() as cur:
+            cur.execute(f"{comando};", params)
+            return [{"id": chamado_id, "resultado": "aplicado"} for (chamado_id,) in cur.fetchall()]
+
+    ids = list(dict.fromkeys(ids))
+    comando, params = _sql_massa(acao, "id = ANY(%s)", [ids], prioridade)
+    destino = ACOES_STATUS.get(acao)
+    with _escrita() as cur:
+        # O SELECT final enxerga a tabela de antes do comando: serve para saber quem existia
+        cur.execute(f"""
+            WITH alterados AS ({comando})
+            SELECT p.id,
+                   CASE WHEN a.id IS NOT NULL THEN 'aplicado'
+                        WHEN c.id IS NULL THEN 'nao_encontrado'
+                        WHEN %s::text IS NULL OR c.status = %s THEN 'inalterado'
+                        ELSE 'conflito' END
+            FROM unnest(%s::int[]) WITH ORDINALITY AS p(id, ordem)
+            LEFT JOIN alterados a ON a.id = p.id
+            LEFT JOIN chamados c ON c.id = p.id
+            ORDER BY p.ordem;
+        """, (*params, destino, destino, ids))
+        return [{"id": chamado_id, "resultado": resultado} for chamado_id, resultado in cur.fetchall()]
+
+
+@assincrono
+def editar(chamado_id: int, descricao: str, prioridade: str, status: str) -> Optional[Chamado]:
+    """Atualiza descrição, prioridade e status (edição do admin, ignora a máquina de estados)"""
+    with _escrita() as cur:
+        transicao = _transicionar(
+            cur, chamado_id, status, sobrescrever=True,
+            atribuicoes=", descricao = %s, prioridade = %s", params=(descricao, prioridade),
+        )
+    return transicao.chamado if transicao else None
+
+
+@assincrono
+def deletar(chamado_id: int):
+    """Remove o chamado"""
+    with _escrita() as cur:
+        cur.execute("DELETE FROM chamados WHERE id = %s;", (chamado_id,))
+
+
+# ==========================================================
+# Fotos (tabela `anexos`, migração 0012)
+# ==========================================================
+
+@assincrono
+def _fotos(ids: tuple) -> dict:
+    with get_connection(leitura=True) as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT chamado_id, array_agg(chave ORDER BY id)
+            FROM anexos
+            WHERE chamado_id = ANY(%s)
+            GROUP BY chamado_id;
+        """, (list(ids),))
+        return dict(cur.fetchall())
+
+
+async def fotos_por_chamado(ids: list) -> dict:
+    """{chamado_id: [chaves das fotos]} de uma página de chamados, numa consulta só.
+    As fotos entram junto com o chamado, então a invalidação das listagens vale aqui."""
+    if not ids:
+        return {}
+    ids = tuple(ids)
+    return await cache.listagens.obter(("fotos", ids), lambda: _fotos(ids))
+
+
+# ==========================================================
+# Lote da fila offline (service worker)
+# ==========================================================
+
+# Papéis que podem aplicar cada operação: os mesmos das rotas avulsas
+PAPEIS_LOTE = {
+    "criar": ("gerente", "admin"),
+    "concluir": ("gerente", "fiscal", "admin"),
+    "visualizar": ("fiscal", "admin"),
+}
+
+
+def _da_loja(cur, chamado_id: int, loja: int) -> bool:
+    cur.execute("SELECT loja_id FROM chamados WHERE id = %s;", (chamado_id,))
+    linha = cur.fetchone()
+    # Inexistente segue adiante e vira "não encontrado"
+    return linha is None or linha[0] == loja
+
+
+@assincrono
+def da_loja(chamado_id: int, loja: int) -> bool:
+    """O chamado é da `loja` (ou não existe)? Lido no primário, como a escrita que vem depois."""
+    with get_connection() as conn:
+        return _da_loja(conn.cursor(), chamado_id, loja)
+
+
+def _permitida(cur, operacao: dict, sessao: dict) -> bool:
+    """O papel da sessão pode aplicar a operação? Gerente com loja só mexe na própria loja."""
+    if sessao.get("papel") not in PAPEIS_LOTE.get(operacao.get("tipo"), ()):
+        return False
+    loja = usuarios.loja_restrita(sessao)
+    if loja is None:
+        return True
+    if operacao["tipo"] == "criar":
+        return operacao.get("loja_id") == loja
+    return _da_loja(cur, operacao.get("chamado_id"), loja)
+
+
+def _aplicar_operacao(cur, operacao: dict) -> dict:
+    tipo = operacao.get("tipo")
+    if tipo == "criar":
+        chamado = _inserir(
+            cur, operacao["loja_id"], operacao["descricao"], operacao["prioridade"], operacao["solicitado_por"]
+        )
+    elif tipo in ACOES_STATUS:
+        transicao = _transicionar(cur, operacao["chamado_id"], ACOES_STATUS[tipo])
+        if transicao is None:
+            return {"resultado": "nao_encontrado"}
+        chamado = transicao.chamado
+        if transicao.resultado == "conflito":
+            return {"resultado": "conflito", "chamado_id": chamado.id, "status": chamado.status}
+    else:
+        raise ValueError(f"Operação desconhecida: {tipo}")
+    return {"resultado": "aplicada", "chamado_id": chamado.id, "status": chamado.status}
+
+
+@assincrono
+def aplicar_lote(operacoes: list, sessao: dict) -> list:
+    """Aplica as operações da fila offline numa única transação.
+
+    Cada operação traz uma `chave` de idempotência: se já foi processada, devolve
+    o resultado guardado em vez de repetir. Uma operação inválida vira resultado
+    "erro" (via SAVEPOINT) sem desfazer as demais; uma que o papel da `sessao`
+    não pode fazer vira "recusada", sem gastar a chave."""
+    resultados = []
+    with _escrita() as cur:
+        for operacao in operacoes:
+            chave = operacao["chave"]
+            if not _permitida(cur, operacao, sessao):
+                resultados.append({"chave": chave, "resultado": "recusada"})
+                continue
+            cur.execute("SAVEPOINT operacao;")
+            cur.execute("""
+                INSERT INTO operacoes_idempotentes (chave) VALUES (%s)
+                ON CONFLICT (chave) DO NOTHING
+                RETURNING chave;
+            """, (chave,))
+            if cur.fetchone() is None:
+                # Já processada (ou sendo processada por outro lote, que o INSERT aguardou)
+                cur.execute("SELECT resultado FROM operacoes_idempotentes WHERE chave = %s;", (chave,))
+                resultado = dict(cur.fetchone()[0] or {}, duplicada=True)
+            else:
+                try:
+                    resultado = _aplicar_operacao(cur, operacao)
+                except (psycopg2.DataError, psycopg2.IntegrityError, KeyError, ValueError) as e:
+                    # Desfaz só esta operação; a chave também, para permitir correção
+                    cur.execute("ROLLBACK TO SAVEPOINT operacao;")
+                    detalhe = f"Campo obrigatório ausente: {e.args[0]}" if isinstance(e, KeyError) else str(e)
+                    resultados.append({"chave": chave, "resultado": "erro", "detalhe": detalhe})
+                    continue
+                cur.execute(
+                    "UPDATE operacoes_idempotentes SET resultado = %s WHERE chave = %s;",
+                    (Json(resultado), chave),
+                )
+            cur.execute("RELEASE SAVEPOINT operacao;")
+            resultados.append({"chave": chave, **resultado})
+        cur.execute(
+            "DELETE FROM operacoes_idempotentes WHERE processada_em < NOW() - %s::interval;",
+            (RETENCAO_CHAVES,),
+        )
+    return resultados
+
+
+# ==========================================================
+# Arquivamento (chamados concluídos antigos)
+# ==========================================================
+
+@assincrono
+def arquivar(dias: int = ARQUIVAR_APOS_DIAS, lote: int = LOTE_ARQUIVAMENTO) -> int:
+    """Move para `chamados_arquivo` os concluídos há mais de `dias` dias, em transações
+    curtas de até `lote` chamados. Devolve quantos foram movidos."""
+    total = 0
+    while True:
+        with _escrita() as cur:
+            cur.execute("SELECT arquivar_chamados(%s, %s);", (dias, lote))
+            movidos = cur.fetchone()[0]
+        total += movidos
+        if movidos < lote:
+            return total
+
+
+async def arquivar_periodicamente():
+    if ARQUIVAR_APOS_DIAS <= 0:
+        return
+    while True:
+        await asyncio.sleep(INTERVALO_ARQUIVAMENTO)
+        try:
+            movidos = await arquivar()
+        except (psycopg2.Error, PoolEsgotado) as e:
+            logging.warning(f"⚠️ Arquivamento de chamados falhou: {e}")
+            continue
+        if movidos:
+            logging.info(f"🗄️ {movidos} chamados concluídos movidos para o arquivo")
@@ -0,0 +1,47 @@
+import getpass
+import logging
+import sys
+
+import psycopg2
+
+from auth import gerar_hash
+from db import DB_CONFIG
+from usuarios import PAPEIS, salvar
+
+# ==========================================================
+# Cria (ou redefine a senha de) um usuário
+#
+#   python criar_usuario.py <usuario> <admin|gerente|fiscal> [nome] [loja_id]
+#
+# loja_id (só gerente) restringe a fila offline àquela loja.
+# ==========================================================
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if len(sys.argv) < 3 or sys.argv[2] not in PAPEIS:
+        logging.error(f"Uso: python criar_usuario.py <usuario> <{'|'.join(PAPEIS)}> [nome] [loja_id]")
+        return 2
+    usuario, papel = sys.argv[1], sys.argv[2]
+    nome = sys.argv[3] if len(sys.argv) > 3 else usuario
+    loja_id = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    if loja_id is not None and papel != "gerente":
+        logging.error("❌ loja_id só vale para gerente")
+        return 2
+
+    senha = getpass.getpass("Senha: ")
+    if not senha or senha != getpass.getpass("Repita a senha: "):
+        logging.error("❌ Senhas vazias ou diferentes")
+        return 1
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        salvar(conn, usuario, nome, gerar_hash(senha), papel, loja_id)
+    finally:
+        conn.close()
+    logging.info(f"✅ Usuário {usuario} ({papel}) salvo")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
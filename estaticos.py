@@ -0,0 +1,239 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+
+import brotli
+from fastapi.staticfiles import StaticFiles
+
+# ==========================================================
+# Pipeline dos arquivos de /static
+# `python estaticos.py` (e o startup, se algo mudou) gera o
+# manifesto: hash do conteúdo de cada arquivo + variantes .br/.gz
+# pré-comprimidas ao lado do original. Em tempo de execução:
+#   - estatico("x.css") -> /static/x.css?v=<hash> (templates)
+#   - ?v= igual ao hash atual -> Cache-Control immutable (1 ano)
+#   - Accept-Encoding br/gzip -> serve a variante pronta
+#   - /sw.js recebe a versão e a lista de precache do manifesto
+# ==========================================================
+
+DIRETORIO = Path(__file__).parent / "static"
+MANIFESTO = DIRETORIO / "manifesto-estaticos.json"
+SERVICE_WORKER = DIRETORIO / "service-worker.js"
+
+# Em desenvolvimento, TEMPLATES_RECARREGAR=1 recalcula o hash a cada uso e não usa as variantes
+RECARREGAR = os.getenv("TEMPLATES_RECARREGAR", "0") == "1"
+
+# Precisam manter a URL (o navegador, o manifest.json ou o service worker pedem por ela)
+URL_FIXA = {"manifest.json", "offline.html", "icons/icon-192.png", "icons/icon-512.png"}
+
+# Não entram no manifesto: gerados por este módulo ou servidos por outra rota (/sw.js)
+IGNORADOS = {MANIFESTO.name, SERVICE_WORKER.name}
+
+# Texto comprime bem; imagens já vêm comprimidas
+COMPRIMIVEIS = {".css", ".js", ".json", ".html", ".svg", ".txt", ".map"}
+CODIFICACOES = {"br": ".br", "gzip": ".gz"}  # ordem = preferência
+
+CACHE_IMUTAVEL = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "no-cache"
+
+
+def _digest(dados: bytes) -> str:
+    return hashlib.sha256(dados).hexdigest()[:12]
+
+
+def _gravar(destino: Path, dados: bytes):
+    """Escrita atômica: vários workers podem construir ao mesmo tempo"""
+    parcial = destino.with_name(f"{destino.name}.{os.getpid()}.parcial")
+    parcial.write_bytes(dados)
+    os.replace(parcial, destino)
+
+
+def _arquivos(diretorio: Path):
+    for caminho in sorted(diretorio.rglob("*")):
+        relativo = caminho.relative_to(diretorio).as_posix()
+        if caminho.is_file() and relativo not in IGNORADOS and caminho.suffix not in (".br", ".gz", ".parcial"):
+            yield relativo, caminho
+
+
+def _comprimir(caminho: Path, dados: bytes) -> list:
+    """Gera as variantes que valem a pena (ao menos 10% menores) e devolve as codificações"""
+    if caminho.suffix not in COMPRIMIVEIS or len(dados) < 1024:
+        return []
+    codificacoes = []
+    for codificacao, comprimido in (
+        ("br", lambda: brotli.compress(dados, quality=11)),
+        ("gzip", lambda: gzip.compress(dados, compresslevel=9, mtime=0)),
+    ):
+        saida = comprimido()
+        if len(saida) < len(dados) * 0.9:
+            _gravar(caminho.with_name(caminho.name + CODIFICACOES[codificacao]), saida)
+            codificacoes.append(codificacao)
+    return codificacoes
+
+
+def construir(diretorio: Path = DIRETORIO, anterior: Optional[dict] = None) -> dict:
+    """Gera o manifesto e as variantes comprimidas. Só recomprime o que mudou desde `anterior`."""
+    anteriores = (anterior or {}).get("arquivos", {})
+    arquivos = {}
+    for relativo, caminho in _arquivos(diretorio):
+        dados = caminho.read_bytes()
+        versao = _digest(dados)
+        antes = anteriores.get(relativo)
+        if antes and antes["hash"] == versao and _variantes_existem(caminho, antes["codificacoes"]):
+            arquivos[relativo] = antes
+        else:
+            arquivos[relativo] = {"hash": versao, "tamanho": len(dados), "codificacoes": _comprimir(caminho, dados)}
+    versao = _digest("\n".join(f"{r}:{a['hash']}" for r, a in arquivos.items()).encode())
+    manifesto = {"versao": versao, "arquivos": arquivos}
+    _gravar(diretorio / MANIFESTO.name, json.dumps(manifesto, indent=2, ensure_ascii=False).encode())
+    return manifesto
+
+
+def _ler(caminho: Path) -> Optional[dict]:
+    try:
+        return json.loads(caminho.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _variantes_existem(caminho: Path, codificacoes: list) -> bool:
+    return all(caminho.with_name(caminho.name + CODIFICACOES[c]).is_file() for c in codificacoes)
+
+
+def _atualizado(manifesto: Optional[dict], diretorio: Path) -> bool:
+    """Mesmos arquivos, mesmos hashes e todas as variantes listadas presentes no disco"""
+    if not manifesto:
+        return False
+    arquivos = manifesto["arquivos"]
+    atuais = dict(_arquivos(diretorio))
+    return atuais.keys() == arquivos.keys() and all(
+        _digest(caminho.read_bytes()) == arquivos[relativo]["hash"]
+        and _variantes_existem(caminho, arquivos[relativo]["codificacoes"])
+        for relativo, caminho in atuais.items()
+    )
+
+
+class Estaticos:
+    """Manifesto carregado em memória: URLs com impressão digital e a versão do precache"""
+
+    def __init__(self, diretorio: Path):
+        self.diretorio = diretorio
+        self._manifesto = None
+        self._sw = None
+        self._lock = threading.Lock()
+
+    def preparar(self) -> dict:
+        """Lê o manifesto; se faltar ou estiver desatualizado, reconstrói (no startup)"""
+        with self._lock:
+            manifesto = _ler(self.diretorio / MANIFESTO.name)
+            if not _atualizado(manifesto, self.diretorio):
+                try:
+                    manifesto = construir(self.diretorio, manifesto)
+                    logging.info(f"✅ Estáticos: manifesto {manifesto['versao']} gerado")
+                except OSError as e:
+                    # Disco só de leitura: segue com os hashes, sem variantes comprimidas
+                    logging.warning(f"⚠️ Estáticos: manifesto não gravado ({e}); servindo sem pré-compressão")
+                    arquivos = {
+                        r: {"hash": _digest(c.read_bytes()), "tamanho": c.stat().st_size, "codificacoes": []}
+                        for r, c in _arquivos(self.diretorio)
+                    }
+                    versao = _digest("\n".join(f"{r}:{a['hash']}" for r, a in arquivos.items()).encode())
+                    manifesto = {"versao": versao, "arquivos": arquivos}
+            self._manifesto, self._sw = manifesto, None
+            return manifesto
+
+    @property
+    def manifesto(self) -> dict:
+        if self._manifesto is None or RECARREGAR:
+            self.preparar()
+        return self._manifesto
+
+    def entrada(self, caminho: str) -> Optional[dict]:
+        return self.manifesto["arquivos"].get(caminho)
+
+    def url(self, caminho: str) -> str:
+        entrada = self.entrada(caminho)
+        if entrada is None:
+            raise KeyError(f"Arquivo estático inexistente: {caminho}")
+        return f"/static/{caminho}?v={entrada['hash']}"
+
+    def precache(self) -> list:
+        """URLs que o service worker baixa na instalação"""
+        return [
+            f"/static/{caminho}" if caminho in URL_FIXA else self.url(caminho)
+            for caminho in self.manifesto["arquivos"]
+        ]
+
+    def service_worker(self) -> str:
+        """service-worker.js com a versão do cache e o precache vindos do manifesto"""
+        if self._sw is None or RECARREGAR:
+            manifesto = self.manifesto
+            self._sw = (
+                "// Gerado a partir de static/manifesto-estaticos.json (estaticos.py): não editar\n"
+                f"const CACHE_VERSION = {json.dumps(manifesto['versao'])};\n"
+                f"const PRECACHE = {json.dumps(self.precache(), indent=2)};\n\n"
+                + SERVICE_WORKER.read_text()
+            )
+        return self._sw
+
+
+registro = Estaticos(DIRETORIO)
+
+
+def _aceitas(scope) -> set:
+    """Codificações do Accept-Encoding (sem as recusadas com q=0)"""
+    for nome, valor in scope.get("headers", []):
+        if nome == b"accept-encoding":
+            aceitas = set()
+            for item in valor.decode("latin-1").split(","):
+                codificacao, _, parametros = item.strip().partition(";")
+                if parametros.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                    aceitas.add(codificacao.strip().lower())
+            return aceitas
+    return set()
+
+
+class ArquivosEstaticos(StaticFiles):
+    """StaticFiles que serve as variantes pré-comprimidas e marca como imutáveis
+    as URLs cuja impressão digital (?v=...) confere com o conteúdo atual"""
+
+    def __init__(self, *args, estaticos: Estaticos = registro, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estaticos = estaticos
+
+    async def get_response(self, path: str, scope):
+        entrada = self.estaticos.entrada(path)
+        codificacao = None
+        if entrada and not RECARREGAR:
+            aceitas = _aceitas(scope)
+            codificacao = next((c for c in entrada["codificacoes"] if c in aceitas), None)
+
+        if codificacao:
+            original, _ = self.lookup_path(path)
+            variante = f"{original}{CODIFICACOES[codificacao]}"
+            resposta = self.file_response(variante, os.stat(variante), scope)
+            if resposta.status_code == 200:
+                resposta.headers["Content-Encoding"] = codificacao
+        else:
+            resposta = await super().get_response(path, scope)
+
+        if entrada is None or resposta.status_code not in (200, 304):
+            return resposta
+        if entrada["codificacoes"]:
+            resposta.headers["Vary"] = "Accept-Encoding"
+        versao = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v", [None])[0]
+        resposta.headers["Cache-Control"] = CACHE_IMUTAVEL if versao == entrada["hash"] else CACHE_REVALIDAR
+        return resposta
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    manifesto = construir(DIRETORIO, _ler(MANIFESTO))
+    comprimidos = sum(1 for a in manifesto["arquivos"].values() if a["codificacoes"])
+    logging.info(f"✅ {len(manifesto['arquivos'])} arquivos, {comprimidos} com variantes br/gzip, versão {manifesto['versao']}")
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import cache
+from db import get_connection, assincrono
+from lojas import registro
+
+# ==========================================================
+# Estatísticas e SLA dos chamados
+# Lê apenas as tabelas agregadas da migração 0008 (mantidas por
+# trigger a cada escrita), nunca a tabela `chamados`.
+# ==========================================================
+
+# Limites das faixas do histograma, em horas (iguais a faixa_conclusao() no banco)
+FAIXAS_HORAS = [1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720]
+
+STATUS = ["aberto", "visualizado", "concluído"]
+
+
+@dataclass(frozen=True)
+class FiltrosEstatisticas:
+    """Recorte do painel; campos None são ignorados"""
+    loja_id: Optional[int] = None
+    prioridade: Optional[str] = None
+    desde: Optional[date] = None
+    ate: Optional[date] = None
+
+    def condicoes(self):
+        condicoes, params = [], []
+        if self.loja_id is not None:
+            condicoes.append("loja_id = %s")
+            params.append(self.loja_id)
+        if self.prioridade:
+            condicoes.append("prioridade = %s")
+            params.append(self.prioridade)
+        if self.desde:
+            condicoes.append("dia >= %s")
+            params.append(self.desde)
+        if self.ate:
+            condicoes.append("dia <= %s")
+            params.append(self.ate)
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        return where, params
+
+
+def percentil(histograma: dict, p: float) -> Optional[float]:
+    """Percentil (em horas) interpolado dentro da faixa do histograma {faixa: quantidade}"""
+    total = sum(histograma.values())
+    if total <= 0:
+        return None
+    alvo = p * total
+    acumulado = 0
+    for faixa in range(len(FAIXAS_HORAS) + 1):
+        quantidade = histograma.get(faixa, 0)
+        if quantidade <= 0:
+            continue
+        if acumulado + quantidade >= alvo:
+            inicio = FAIXAS_HORAS[faixa - 1] if faixa > 0 else 0
+            if faixa == len(FAIXAS_HORAS):
+                # Faixa aberta (30 dias ou mais): o melhor que dá para dizer é o limite inferior
+                return float(inicio)
+            fim = FAIXAS_HORAS[faixa]
+            return inicio + (fim - inicio) * (alvo - acumulado) / quantidade
+        acumulado += quantidade
+    return float(FAIXAS_HORAS[-1])
+
+
+def _sla(histograma: dict, soma_segundos: float) -> dict:
+    quantidade = sum(histograma.values())
+    return {
+        "concluidos": quantidade,
+        "media_horas": round(soma_segundos / quantidade / 3600, 1) if quantidade else None,
+        "p90_horas": round(percentil(histograma, 0.9), 1) if quantidade else None,
+    }
+
+
+@assincrono
+def _resumo(filtros: FiltrosEstatisticas) -> dict:
+    where, params = filtros.condicoes()
+    with get_connection(leitura=True) as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT loja_id, status, sum(quantidade)
+            FROM estatisticas_chamados {where}
+            GROUP BY loja_id, status;
+        """, params)
+        contagens = cur.fetchall()
+        cur.execute(f"""
+            SELECT loja_id, faixa, sum(quantidade), sum(soma_segundos)
+            FROM estatisticas_conclusao {where}
+            GROUP BY loja_id, faixa;
+        """, params)
+        conclusoes = cur.fetchall()
+        cur.execute(f"""
+            SELECT dia, sum(quantidade), sum(quantidade) FILTER (WHERE status = 'concluído')
+            FROM estatisticas_chamados {where}
+            GROUP BY dia ORDER BY dia DESC LIMIT 30;
+        """, params)
+        por_dia = cur.fetchall()
+
+    por_loja = {}
+    total = {s: 0 for s in STATUS}
+    for loja_id, status, quantidade in contagens:
+        loja = por_loja.setdefault(loja_id, {"status": {s: 0 for s in STATUS}, "histograma": {}, "soma": 0.0})
+        loja["status"][status] = loja["status"].get(status, 0) + quantidade
+        total[status] = total.get(status, 0) + quantidade
+
+    histograma_total, soma_total = {}, 0.0
+    for loja_id, faixa, quantidade, soma in conclusoes:
+        loja = por_loja.setdefault(loja_id, {"status": {s: 0 for s in STATUS}, "histograma": {}, "soma": 0.0})
+        loja["histograma"][faixa] = quantidade
+        loja["soma"] += soma
+        histograma_total[faixa] = histograma_total.get(faixa, 0) + quantidade
+        soma_total += soma
+
+    lojas = [
+        {
+            "loja_id": loja_id,
+            "loja": registro.nome(loja_id),
+            "status": dados["status"],
+            "total": sum(dados["status"].values()),
+            "sla": _sla(dados["histograma"], dados["soma"]),
+        }
+        for loja_id, dados in sorted(por_loja.items())
+    ]
+    return {
+        "total": {"status": total, "total": sum(total.values()), "sla": _sla(histograma_total, soma_total)},
+        "lojas": [l for l in lojas if l["total"]],
+        "por_dia": [{"dia": dia, "criados": criados, "concluidos": concluidos or 0} for dia, criados, concluidos in por_dia],
+    }
+
+
+async def resumo(filtros: FiltrosEstatisticas = FiltrosEstatisticas()) -> dict:
+    """Contagens por status e SLA (média e p90 até a conclusão), por loja e no total"""
+    # As agregadas mudam a cada escrita, exatamente quando o cache das listagens é invalidado
+    return await cache.listagens.obter(("estatisticas", filtros), lambda: _resumo(filtros))
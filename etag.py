@@ -0,0 +1,67 @@
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple
+
+from fastapi import Request, Response
+
+# ==========================================================
+# Requisições condicionais (ETag / Last-Modified) das listagens
+# A versão vem de chamados_versao (migração 0006); a release
+# entra no ETag para que um deploy com templates novos não
+# devolva 304 de HTML antigo, e a versão do registro de lojas
+# para que uma loja renomeada não fique com o nome antigo.
+# ==========================================================
+
+RELEASE = os.getenv("HEROKU_RELEASE_VERSION", "dev")
+
+
+class Versao(NamedTuple):
+    numero: int
+    alterado_em: datetime
+    lojas: str = ""  # lojas.registro.versao
+
+
+class NaoModificado(Exception):
+    """O cliente já tem a versão atual; a rota responde 304 sem consultar nem renderizar"""
+
+    def __init__(self, versao: Versao):
+        self.versao = versao
+
+
+def gerar_etag(versao: Versao) -> str:
+    return f'W/"{versao.numero}-{versao.lojas}-{RELEASE}"'
+
+
+def _last_modified(versao: Versao) -> str:
+    return format_datetime(versao.alterado_em.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def nao_modificado(request: Request, versao: Versao) -> bool:
+    """True se o cliente já tem a versão atual (If-None-Match tem prioridade)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = gerar_etag(versao)
+        candidatas = {e.strip() for e in if_none_match.split(",")}
+        return "*" in candidatas or etag in candidatas or etag[2:] in candidatas
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return versao.alterado_em.replace(microsecond=0) <= desde
+    return False
+
+
+def aplicar(response: Response, versao: Versao) -> Response:
+    response.headers["ETag"] = gerar_etag(versao)
+    response.headers["Last-Modified"] = _last_modified(versao)
+    # Pode guardar, mas sempre revalidar antes de usar
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def resposta_304(versao: Versao) -> Response:
+    return aplicar(Response(status_code=304), versao)
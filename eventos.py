@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+
+import psycopg2
+import psycopg2.extensions
+from starlette.concurrency import run_in_threadpool
+
+from db import DB_CONFIG
+from lojas import registro
+
+# ==========================================================
+# Eventos de chamados em tempo real
+# Um único LISTEN chamados_eventos por processo (trigger da
+# migração 0005) repassado a cada painel conectado via SSE.
+# ==========================================================
+
+CANAL_EVENTOS = "chamados_eventos"
+INTERVALO_PING = 15
+TAMANHO_FILA = 100
+
+
+class Difusor:
+    """Escuta o canal do Postgres e distribui os eventos entre os assinantes"""
+
+    def __init__(self, canal: str = CANAL_EVENTOS):
+        self.canal = canal
+        self._assinantes = set()
+        self._conn = None
+        self._loop = None
+        self._reconexao = None
+
+    async def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+        try:
+            await self._conectar()
+        except psycopg2.Error as e:
+            logging.warning(f"⚠️ LISTEN de eventos indisponível: {e}")
+            self._agendar_reconexao()
+
+    async def parar(self):
+        if self._reconexao:
+            self._reconexao.cancel()
+        self._desconectar()
+        for fila in list(self._assinantes):
+            # Fila cheia (painel lento) não pode barrar o encerramento
+            # dos demais: descarta o que sobrou antes do sinal de fim
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait(None)
+
+    async def _conectar(self):
+        def conectar():
+            conn = psycopg2.connect(**DB_CONFIG)
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute(f"LISTEN {self.canal};")
+            return conn
+
+        self._conn = await run_in_threadpool(conectar)
+        self._loop.add_reader(self._conn.fileno(), self._ao_receber)
+        logging.info(f"✅ Escutando {self.canal}")
+
+    def _desconectar(self):
+        if self._conn is not None:
+            try:
+                self._loop.remove_reader(self._conn.fileno())
+            except (ValueError, OSError):
+                pass
+            self._conn.close()
+            self._conn = None
+
+    def _agendar_reconexao(self):
+        async def reconectar():
+            while True:
+                await asyncio.sleep(2)
+                try:
+                    await self._conectar()
+                    # Eventos perdidos durante a queda: painéis devem recarregar
+                    self._publicar({"tipo": "recarregar"})
+                    return
+                except psycopg2.Error as e:
+                    logging.warning(f"⚠️ Reconexão do LISTEN falhou: {e}")
+
+        self._reconexao = asyncio.ensure_future(reconectar())
+
+    def _ao_receber(self):
+        try:
+            self._conn.poll()
+        except psycopg2.Error as e:
+            logging.warning(f"⚠️ LISTEN de eventos caiu: {e}")
+            self._desconectar()
+            self._agendar_reconexao()
+            return
+        while self._conn.notifies:
+            aviso = self._conn.notifies.pop(0)
+            try:
+                evento = json.loads(aviso.payload)
+            except ValueError:
+                continue
+            evento["loja"] = registro.nome(evento.get("loja_id"))
+            self._publicar(evento)
+
+    def _publicar(self, evento: dict):
+        for fila in list(self._assinantes):
+            try:
+                fila.put_nowait(evento)
+            except asyncio.QueueFull:
+                # Painel lento: descarta a fila e pede que ele recarregue
+                while not fila.empty():
+                    fila.get_nowait()
+                fila.put_nowait({"tipo": "recarregar"})
+
+    def assinar(self) -> asyncio.Queue:
+        fila = asyncio.Queue(maxsize=TAMANHO_FILA)
+        self._assinantes.add(fila)
+        return fila
+
+    def cancelar(self, fila: asyncio.Queue):
+        self._assinantes.discard(fila)
+
+    @property
+    def assinantes(self) -> int:
+        return len(self._assinantes)
+
+
+difusor = Difusor()
+
+
+def formatar_sse(evento: dict) -> str:
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento, ensure_ascii=False, default=str)}\n\n"
+
+
+async def fluxo_sse(request, loja_id: int = None):
+    """Gerador do corpo text/event-stream de um painel"""
+    fila = difusor.assinar()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                evento = await asyncio.wait_for(fila.get(), timeout=INTERVALO_PING)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            if evento is None:
+                return
+            if loja_id is not None and evento.get("loja_id") not in (None, loja_id):
+                continue
+            yield formatar_sse(evento)
+    finally:
+        difusor.cancelar(fila)
@@ -0,0 +1,60 @@
+import csv
+import io
+from typing import Iterable, Iterator
+
+import orjson
+
+from modelos import serializar
+
+# ==========================================================
+# Exportação do histórico de chamados (CSV / NDJSON / JSON)
+# Recebe os lotes de chamados_repo.exportar e devolve um pedaço
+# de texto por lote, para o StreamingResponse enviar aos poucos.
+# ==========================================================
+
+CAMPOS = ["id", "loja", "descricao", "prioridade", "status", "solicitado_por", "criado_em", "atualizado_em"]
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def gerar_csv(lotes: Iterable[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=CAMPOS, extrasaction="ignore")
+    # BOM: o Excel abre os acentos corretamente. O cabeçalho sai já no primeiro
+    # pedaço, para que uma exportação sem linhas ainda traga as colunas.
+    buffer.write("﻿")
+    escritor.writeheader()
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    for lote in lotes:
+        escritor.writerows(map(serializar, lote))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def gerar_ndjson(lotes: Iterable[list]) -> Iterator[bytes]:
+    for lote in lotes:
+        yield b"".join(orjson.dumps(serializar(c), option=orjson.OPT_APPEND_NEWLINE) for c in lote)
+
+
+def gerar_json(lotes: Iterable[list]) -> Iterator[bytes]:
+    """Um único array JSON, enviado lote a lote (nunca o resultado inteiro em memória)"""
+    separador = b"["
+    for lote in lotes:
+        if lote:
+            yield separador + b",".join(orjson.dumps(serializar(c)) for c in lote)
+            separador = b","
+    yield b"[]" if separador == b"[" else b"]"
+
+
+GERADORES = {"csv": gerar_csv, "ndjson": gerar_ndjson, "json": gerar_json}
+
+
+def gerar(formato: str, lotes: Iterable[list]) -> Iterator[bytes]:
+    return GERADORES[formato](lotes)
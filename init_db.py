@@ -0,0 +1,78 @@
+import logging
+import sys
+from pathlib import Path
+
+import psycopg2
+
+from db import DB_CONFIG
+
+# ==========================================================
+# Migrações versionadas
+# Cada arquivo migrations/NNNN_nome.sql roda uma única vez, em
+# ordem, dentro da própria transação. Executado no release
+# (Procfile) antes de subir os processos web.
+# ==========================================================
+
+MIGRACOES_DIR = Path(__file__).parent / "migrations"
+
+# Chave do advisory lock: impede dois releases migrando ao mesmo tempo
+LOCK_MIGRACOES = 31072025
+
+
+def migracoes_disponiveis() -> list:
+    return sorted(MIGRACOES_DIR.glob("*.sql"))
+
+
+def migrar(conn) -> list:
+    """Aplica as migrações pendentes e devolve as versões aplicadas"""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao      TEXT PRIMARY KEY,
+            aplicada_em TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """)
+    conn.commit()
+
+    cur.execute("SELECT pg_advisory_lock(%s);", (LOCK_MIGRACOES,))
+    try:
+        cur.execute("SELECT versao FROM schema_migrations;")
+        aplicadas = {v for (v,) in cur.fetchall()}
+        conn.commit()
+
+        novas = []
+        for arquivo in migracoes_disponiveis():
+            versao = arquivo.stem
+            if versao in aplicadas:
+                continue
+            logging.info(f"⏳ Aplicando migração {versao}")
+            try:
+                cur.execute(arquivo.read_text(encoding="utf-8"))
+                cur.execute("INSERT INTO schema_migrations (versao) VALUES (%s);", (versao,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logging.error(f"❌ Falha na migração {versao}")
+                raise
+            novas.append(versao)
+        return novas
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s);", (LOCK_MIGRACOES,))
+        conn.commit()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        novas = migrar(conn)
+    finally:
+        conn.close()
+    if novas:
+        logging.info(f"✅ Migrações aplicadas: {', '.join(novas)}")
+    else:
+        logging.info("✅ Banco já está atualizado")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+
+import psycopg2
+
+from db import get_connection, assincrono, PoolEsgotado
+
+# ==========================================================
+# Registro de lojas
+# Lookup O(1) por id. Começa com a lista fixa e é recarregado
+# da tabela `lojas` no startup e periodicamente, então uma loja
+# nova só precisa de um INSERT.
+# ==========================================================
+
+LOJAS_FIXAS = [
+    {"id": 1, "nome": "LOJA 01"},
+    {"id": 2, "nome": "LOJA 03"},
+    {"id": 3, "nome": "LOJA 06"},
+    {"id": 4, "nome": "LOJA 09"},
+    {"id": 5, "nome": "LOJA 10"},
+    {"id": 6, "nome": "LOJA 11"},
+    {"id": 7, "nome": "LOJA 12"},
+    {"id": 8, "nome": "LOJA 14"},
+]
+
+INTERVALO_RECARGA = float(os.getenv("LOJAS_RECARGA_SEGUNDOS", "300"))
+
+
+class RegistroLojas:
+    def __init__(self, lojas: list):
+        # Hash do conteúdo (entra no ETag das listagens) e quando ele mudou pela última vez
+        self.versao = ""
+        self.alterado_em = datetime.now(timezone.utc)
+        self.definir(lojas)
+
+    def definir(self, lojas: list, inativas: tuple = ()):
+        """Troca o conteúdo de uma vez só (seguro para leituras concorrentes)"""
+        self._por_id = {l["id"]: l["nome"] for l in lojas}
+        self._por_id.update({l["id"]: l["nome"] for l in inativas})
+        self._ativas = [{"id": l["id"], "nome": l["nome"]} for l in lojas]
+        versao = hashlib.sha256(repr((self._ativas, sorted(self._por_id.items()))).encode()).hexdigest()[:8]
+        if versao != self.versao:
+            self.versao, self.alterado_em = versao, datetime.now(timezone.utc)
+
+    def nome(self, loja_id: int, padrao: str = None) -> str:
+        nome = self._por_id.get(loja_id)
+        if nome is None:
+            return padrao or f"Loja {loja_id}"
+        return nome
+
+    def todas(self) -> list:
+        """Lojas ativas, para os formulários"""
+        return self._ativas
+
+
+registro = RegistroLojas(LOJAS_FIXAS)
+
+
+@assincrono
+def recarregar():
+    """Lê a tabela `lojas`; mantém o conteúdo atual se ela não existir ou estiver vazia"""
+    try:
+        with get_connection(leitura=True) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id, nome, ativa FROM lojas ORDER BY id;")
+            linhas = cur.fetchall()
+    except (psycopg2.Error, PoolEsgotado) as e:
+        logging.warning(f"⚠️ Não foi possível carregar lojas do banco: {e}")
+        return
+    if linhas:
+        registro.definir(
+            [{"id": i, "nome": n} for i, n, ativa in linhas if ativa],
+            tuple({"id": i, "nome": n} for i, n, ativa in linhas if not ativa),
+        )
+
+
+async def recarregar_periodicamente():
+    while True:
+        await asyncio.sleep(INTERVALO_RECARGA)
+        try:
+            await recarregar()
+        except Exception:
+            # Uma falha inesperada não pode encerrar a tarefa (os nomes ficariam congelados)
+            logging.exception("❌ Recarga das lojas falhou")
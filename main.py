@@ -1,39 +1,184 @@
-from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
-from auth import criar_token
-from db import get_connection
-
-app = FastAPI()
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import List, Literal, Optional
+from fastapi import FastAPI, Request, Form, HTTPException, Depends, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError
+from starlette.datastructures import URL
+import admissao
+import anexos
+import auth
+from db import init_pool, close_pool, pool_stats, replicacao_stats, MiddlewareConsistencia, PoolEsgotado
+import cache
+import chamados_repo
+import estatisticas
+import estaticos
+import etag
+import eventos
+import exportacao
+import lojas
+import metricas
+import renderizacao
+import sessao
+import usuarios
+from modelos import PaginaChamados, serializar
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pool de conexões vive junto com a aplicação
+    init_pool()
+    estaticos.registro.preparar()
+    renderizacao.precompilar(renderizacao.ambiente)
+    await lojas.recarregar()
+    recarga_lojas = asyncio.create_task(lojas.recarregar_periodicamente())
+    arquivamento = asyncio.create_task(chamados_repo.arquivar_periodicamente())
+    cache.listagens.iniciar()
+    await eventos.difusor.iniciar()
+    yield
+    await eventos.difusor.parar()
+    anexos.miniaturas.encerrar()
+    cache.listagens.parar()
+    arquivamento.cancel()
+    recarga_lojas.cancel()
+    close_pool()
+
+
+# orjson em vez de jsonable_encoder + json da stdlib para as respostas JSON
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+# Read-your-writes com réplicas: cookie com o LSN da última escrita da sessão
+app.add_middleware(MiddlewareConsistencia)
+# Admissão por dentro das métricas: as recusas (429/503) também aparecem nas latências e status
+app.add_middleware(admissao.MiddlewareAdmissao)
+app.add_middleware(metricas.MiddlewareMetricas)
+
+
+@app.exception_handler(PoolEsgotado)
+async def pool_esgotado_handler(request: Request, exc: PoolEsgotado):
+    return JSONResponse(status_code=503, content={"detail": "Servidor ocupado, tente novamente"}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(sessao.NaoAutenticado)
+async def nao_autenticado_handler(request: Request, exc: sessao.NaoAutenticado):
+    # Navegação vai para o login; chamadas de API recebem 401
+    if "text/html" in request.headers.get("accept", ""):
+        return RedirectResponse(url="/login-page", status_code=303)
+    return JSONResponse(status_code=401, content={"detail": "Sessão inválida ou expirada"})
+
+
+@app.exception_handler(anexos.AnexoInvalido)
+async def anexo_invalido_handler(request: Request, exc: anexos.AnexoInvalido):
+    # Formulário de abertura volta com o erro; clientes de API recebem JSON
+    if "text/html" in request.headers.get("accept", ""):
+        return templates.TemplateResponse("chamado_form.html", contexto_formulario(request, exc.mensagem), status_code=exc.status)
+    return JSONResponse(status_code=exc.status, content={"detail": exc.mensagem})
+
+
+@app.exception_handler(sessao.SemPermissao)
+async def sem_permissao_handler(request: Request, exc: sessao.SemPermissao):
+    return JSONResponse(status_code=403, content={"detail": "Acesso não permitido para o seu perfil"})
+
+
+@app.exception_handler(chamados_repo.CursorInvalido)
+async def cursor_invalido_handler(request: Request, exc: chamados_repo.CursorInvalido):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(etag.NaoModificado)
+async def nao_modificado_handler(request: Request, exc: etag.NaoModificado):
+    return etag.resposta_304(exc.versao)
+
+# Dependências de acesso por papel (admin acessa tudo)
+somente_admin = [Depends(sessao.exigir_papel("admin"))]
+papel_fiscal = [Depends(sessao.exigir_papel("fiscal", "admin"))]
+papel_gerente = [Depends(sessao.exigir_papel("gerente", "admin"))]
+logado = [Depends(sessao.exigir_papel())]
+# As mesmas, devolvendo o payload (rotas que também conferem a loja do gerente)
+sessao_gerente = sessao.exigir_papel("gerente", "admin")
+sessao_logada = sessao.exigir_papel()
+
+async def exigir_loja(payload: dict, loja_id: Optional[int] = None, chamado_id: Optional[int] = None):
+    """Gerente com loja só abre e conclui chamados da própria loja (vale também na fila offline)"""
+    loja = usuarios.loja_restrita(payload)
+    if loja is None:
+        return
+    if loja_id is not None and loja_id != loja:
+        raise sessao.SemPermissao()
+    if chamado_id is not None and not await chamados_repo.da_loja(chamado_id, loja):
+        raise sessao.SemPermissao()
 
 # Configuração de templates e arquivos estáticos
-templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+templates = metricas.TemplatesMedidos(env=renderizacao.ambiente)
+app.mount("/static", estaticos.ArquivosEstaticos(directory="static"), name="static")
 
 # ==========================================================
 # SUPORTE A PWA (Manifest + Service Worker)
 # ==========================================================
 
-# Rota para expor o service worker na raiz
+# Service worker na raiz, com a versão e o precache gerados do manifesto de estáticos.
+# no-cache: o navegador sempre revalida, senão uma versão nova demora a ser instalada
 @app.get("/sw.js")
 def sw_alias():
-    return FileResponse("static/service-worker.js", media_type="application/javascript")
+    return PlainTextResponse(
+        estaticos.registro.service_worker(),
+        media_type="application/javascript",
+        headers={"Cache-Control": estaticos.CACHE_REVALIDAR},
+    )
 
 # ==========================================================
-# Lista fixa de lojas
+# Filtros e paginação das listagens
 # ==========================================================
-LOJAS_FIXAS = [
-    {"id": 1, "nome": "LOJA 01"},
-    {"id": 2, "nome": "LOJA 03"},
-    {"id": 3, "nome": "LOJA 06"},
-    {"id": 4, "nome": "LOJA 09"},
-    {"id": 5, "nome": "LOJA 10"},
-    {"id": 6, "nome": "LOJA 11"},
-    {"id": 7, "nome": "LOJA 12"},
-    {"id": 8, "nome": "LOJA 14"},
-]
+def filtros_listagem(
+    loja_id: Optional[str] = None,
+    status: Optional[str] = None,
+    prioridade: Optional[str] = None,
+    desde: Optional[str] = None,
+    ate: Optional[str] = None,
+) -> chamados_repo.Filtros:
+    # Recebe strings porque formulários HTML enviam campos vazios como ""
+    try:
+        return chamados_repo.Filtros(
+            loja_id=int(loja_id) if loja_id else None,
+            status=status or None,
+            prioridade=prioridade or None,
+            desde=date.fromisoformat(desde) if desde else None,
+            ate=date.fromisoformat(ate) if ate else None,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Filtro inválido")
+
+
+def pagina_json(chamados: list, proximo_cursor: Optional[str]) -> ORJSONResponse:
+    """Página de chamados já codificada pelo orjson (dispensa a validação do response_model)"""
+    return ORJSONResponse({"chamados": [serializar(c) for c in chamados], "proximo_cursor": proximo_cursor})
+
+
+async def serializar_com_fotos(linhas: list) -> list:
+    """serializar() de cada chamado + `fotos` (chaves dos anexos), para as telas de listagem"""
+    fotos = await chamados_repo.fotos_por_chamado([c.id for c in linhas])
+    return [dict(serializar(c), fotos=fotos.get(c.id, [])) for c in linhas]
+
+
+def proxima_pagina(url: URL, cursor: Optional[str]) -> Optional[str]:
+    """Link relativo para a próxima página, mantendo os filtros atuais"""
+    if not cursor:
+        return None
+    url = url.include_query_params(cursor=cursor)
+    return f"{url.path}?{url.query}"
+
+
+async def versao_listagens(request: Request) -> etag.Versao:
+    """Versão atual dos chamados e das lojas; interrompe com 304 se o cliente já a tem"""
+    versao = await chamados_repo.versao()
+    # Nomes das lojas aparecem nas listagens e mudam sem escrita em `chamados`
+    versao = versao._replace(
+        lojas=lojas.registro.versao, alterado_em=max(versao.alterado_em, lojas.registro.alterado_em)
+    )
+    if etag.nao_modificado(request, versao):
+        raise etag.NaoModificado(versao)
+    return versao
 
 # ==========================================================
 # Rotas API de teste
@@ -42,6 +187,21 @@ LOJAS_FIXAS = [
 def health():
     return {"status": "ok"}
 
+@app.get("/health/db")
+def health_db():
+    return {"pool": pool_stats(), "cache": cache.listagens.stats(), "admissao": admissao.stats(), "replicacao": replicacao_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(
+        metricas.exportar(
+            pool_stats(), cache.listagens.stats(), auth.tokens.stats(),
+            renderizacao.ambiente.fragmentos.stats(), anexos.miniaturas.stats(), admissao.stats(),
+            replicacao_stats(),
+        ),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
 # ==========================================================
 # Rotas HTML (Login / Root)
 # ==========================================================
@@ -54,38 +214,20 @@ async def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request, "error": None})
 
 @app.post("/login-page", response_class=HTMLResponse)
-async def login_action(request: Request, role: str = Form(...)):
-    try:
-        if role == "ADMIN":
-            return RedirectResponse(url="/admin-code", status_code=302)
-
-        if role == "GERENTE":
-            return RedirectResponse(url="/dashboard-gerente", status_code=302)
-
-        if role == "FISCAL":
-            return RedirectResponse(url="/dashboard-fiscal", status_code=302)
-
-        return RedirectResponse(url="/dashboard", status_code=302)
-
-    except Exception:
-        return templates.TemplateResponse("login.html", {"request": request, "error": "Erro no servidor"})
-
-# ==========================================================
-# Tela de código para Admin
-# ==========================================================
-@app.get("/admin-code", response_class=HTMLResponse)
-async def admin_code_page(request: Request):
-    return templates.TemplateResponse("admin_code.html", {"request": request, "error": None})
-
-@app.post("/admin-code", response_class=HTMLResponse)
-async def admin_code_action(request: Request, code: str = Form(...)):
-    ADMIN_SECRET = "BRUNA123"
-
-    if code == ADMIN_SECRET:
-        token = criar_token({"sub": "ADMIN", "papel": "admin"})
-        return RedirectResponse(url="/dashboard-admin", status_code=302)
-    else:
-        return templates.TemplateResponse("admin_code.html", {"request": request, "error": "Código inválido"})
+async def login_action(request: Request, usuario: Optional[usuarios.Usuario] = Depends(sessao.autenticar)):
+    if usuario is None:
+        return templates.TemplateResponse(
+            "login.html", {"request": request, "error": "Usuário ou senha inválidos"}, status_code=401
+        )
+    resposta = RedirectResponse(url=sessao.DASHBOARDS[usuario.papel], status_code=302)
+    payload = {"sub": usuario.usuario, "nome": usuario.nome, "papel": usuario.papel}
+    if usuario.loja_id is not None:
+        payload["loja_id"] = usuario.loja_id
+    return sessao.iniciar(resposta, payload)
+
+@app.get("/logout")
+async def logout():
+    return sessao.encerrar(RedirectResponse(url="/login-page", status_code=302))
 
 # ==========================================================
 # Dashboard genérico
@@ -105,470 +247,544 @@ class ChamadoCreate(BaseModel):
 
 # Criar um chamado
 @app.post("/chamados/gerente")
-def criar_chamado(chamado: ChamadoCreate):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        INSERT INTO chamados (loja_id, descricao, prioridade, solicitado_por, status, criado_em, atualizado_em)
-        VALUES (%s, %s, %s, %s, 'aberto', NOW(), NOW())
-        RETURNING id;
-    """, (chamado.loja_id, chamado.descricao, chamado.prioridade, chamado.solicitado_por))
-
-    chamado_id = cur.fetchone()[0]
-    conn.commit()
-    conn.close()
-
-    loja_nome = next((l["nome"] for l in LOJAS_FIXAS if l["id"] == chamado.loja_id), "Loja desconhecida")
+async def criar_chamado(chamado: ChamadoCreate, payload: dict = Depends(sessao_gerente)):
+    await exigir_loja(payload, loja_id=chamado.loja_id)
+    criado = await chamados_repo.criar(chamado.loja_id, chamado.descricao, chamado.prioridade, chamado.solicitado_por)
 
     return {
         "message": "Chamado criado com sucesso",
-        "chamado": {
-            "id": chamado_id,
-            "loja": loja_nome,
-            "descricao": chamado.descricao,
-            "prioridade": chamado.prioridade,
-            "status": "aberto",
-            "solicitado_por": chamado.solicitado_por,
-        }
+        "chamado": serializar(criado)
     }
 
 # Listar chamados
-@app.get("/chamados/gerente")
-def listar_chamados():
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por, criado_em, atualizado_em
-        FROM chamados
-        ORDER BY criado_em DESC;
-    """)
-
-    chamados = cur.fetchall()
-    conn.close()
-
-    resultado = [
-        {
-            "id": c[0],
-            "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-            "descricao": c[2],
-            "prioridade": c[3],
-            "status": c[4],
-            "solicitado_por": c[5],
-            "criado_em": c[6],
-            "atualizado_em": c[7],
-        }
-        for c in chamados
-    ]
+@app.get("/chamados/gerente", response_model=PaginaChamados, dependencies=papel_gerente)
+async def listar_chamados(
+    versao: etag.Versao = Depends(versao_listagens),
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    cursor: Optional[str] = None,
+    limite: int = Query(chamados_repo.LIMITE_PADRAO, ge=1, le=chamados_repo.LIMITE_MAXIMO),
+):
+    chamados, proximo_cursor = await chamados_repo.listar_por_data(filtros, cursor, limite)
+    return etag.aplicar(pagina_json(chamados, proximo_cursor), versao)
 
-    return {"chamados": resultado}
+def exigir_transicao(transicao: Optional[chamados_repo.Transicao], destino: str) -> chamados_repo.Transicao:
+    """404 se o chamado não existe, 409 se o status atual não permite ir para `destino`"""
+    if transicao is None:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+    if transicao.resultado == "conflito":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Chamado está {transicao.chamado.status} e não pode passar para {destino}",
+        )
+    return transicao
 
 # Concluir chamado
 @app.put("/chamados/{chamado_id}/concluir")
-def concluir_chamado(chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("SELECT id, loja_id, status FROM chamados WHERE id = %s;", (chamado_id,))
-    chamado = cur.fetchone()
+async def concluir_chamado(chamado_id: int, payload: dict = Depends(sessao_logada)):
+    await exigir_loja(payload, chamado_id=chamado_id)
+    transicao = exigir_transicao(await chamados_repo.concluir(chamado_id), "concluído")
 
-    if not chamado:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Chamado não encontrado")
-
-    if chamado[2] == "concluído":
-        conn.close()
+    if transicao.resultado == "inalterada":
         return {"message": "Chamado já estava concluído"}
 
-    cur.execute("""
-        UPDATE chamados
-        SET status = 'concluído', atualizado_em = NOW()
-        WHERE id = %s;
-    """, (chamado_id,))
-    conn.commit()
-    conn.close()
-
-    loja_nome = next((l["nome"] for l in LOJAS_FIXAS if l["id"] == chamado[1]), f"Loja {chamado[1]}")
-
+    chamado = transicao.chamado
     return {
         "message": "Chamado concluído com sucesso",
         "chamado": {
-            "id": chamado[0],
-            "loja": loja_nome,
-            "status": "concluído"
+            "id": chamado.id,
+            "loja": lojas.registro.nome(chamado.loja_id),
+            "status": chamado.status
         }
     }
 
 # ==========================================================
-# ROTAS DE CHAMADOS (Fiscal)
+# FILA OFFLINE (lote enviado pelo service worker)
 # ==========================================================
+class OperacaoLote(BaseModel):
+    chave: str = Field(..., min_length=1, max_length=64)
+    tipo: Literal["criar", "concluir", "visualizar"]
+    chamado_id: Optional[int] = None
+    loja_id: Optional[int] = None
+    descricao: Optional[str] = None
+    prioridade: Optional[str] = None
+    solicitado_por: Optional[str] = None
+
+class Lote(BaseModel):
+    operacoes: List[OperacaoLote] = Field(..., max_length=chamados_repo.LOTE_MAXIMO)
+
+@app.post("/chamados/lote")
+async def aplicar_lote(lote: Lote, payload: dict = Depends(sessao_logada)):
+    operacoes = [op.model_dump(exclude_none=True) for op in lote.operacoes]
+    resultados = await chamados_repo.aplicar_lote(operacoes, payload)
+    return {"resultados": resultados}
 
-@app.get("/chamados/fiscal")
-def listar_chamados_fiscal():
-    conn = get_connection()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por, criado_em, atualizado_em
-        FROM chamados
-        ORDER BY 
-            CASE 
-                WHEN prioridade = 'alta' THEN 1
-                WHEN prioridade = 'média' THEN 2
-                WHEN prioridade = 'baixa' THEN 3
-                ELSE 4
-            END,
-            criado_em DESC;
-    """)
-
-    chamados = cur.fetchall()
-    conn.close()
-
-    resultado = [
-        {
-            "id": c[0],
-            "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-            "descricao": c[2],
-            "prioridade": c[3],
-            "cor": "vermelho" if c[3].lower() == "alta" else "amarelo" if c[3].lower() == "média" else "verde",
-            "status": c[4],
-            "solicitado_por": c[5],
-            "criado_em": c[6],
-            "atualizado_em": c[7],
-        }
-        for c in chamados
-    ]
-
-    return {"chamados": resultado}
-
-@app.put("/chamados/{chamado_id}/visualizar")
-def visualizar_chamado(chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
+# ==========================================================
+# AÇÕES EM MASSA (admin e fiscal)
+# ==========================================================
+class FiltrosMassa(BaseModel):
+    loja_id: Optional[str] = None
+    status: Optional[str] = None
+    prioridade: Optional[str] = None
+    desde: Optional[str] = None
+    ate: Optional[str] = None
+
+class AcaoMassa(BaseModel):
+    acao: Literal["concluir", "visualizar", "priorizar", "deletar"]
+    ids: Optional[List[int]] = Field(None, max_length=chamados_repo.LIMITE_MAXIMO * 5)
+    filtros: Optional[FiltrosMassa] = None
+    prioridade: Optional[str] = None
+
+async def _acao_em_massa(acao: str, ids=None, filtros=None, prioridade=None) -> list:
+    try:
+        return await chamados_repo.acao_em_massa(acao, ids=ids, filtros=filtros, prioridade=prioridade)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _resumo_massa(resultados: list) -> str:
+    contagem = {}
+    for r in resultados:
+        contagem.setdefault(r["resultado"], []).append(r["id"])
+    partes = [f"{len(contagem.get('aplicado', []))} chamado(s) atualizados ✅"]
+    if contagem.get("inalterado"):
+        partes.append(f"sem mudança: {', '.join(f'#{i}' for i in contagem['inalterado'])}")
+    if contagem.get("conflito"):
+        partes.append(f"em status que não permite a ação: {', '.join(f'#{i}' for i in contagem['conflito'])}")
+    if contagem.get("nao_encontrado"):
+        partes.append(f"não encontrados: {', '.join(f'#{i}' for i in contagem['nao_encontrado'])}")
+    return " • ".join(partes)
+
+@app.post("/chamados/massa")
+async def acao_em_massa(pedido: AcaoMassa, payload: dict = Depends(sessao.exigir_papel("fiscal", "admin"))):
+    # Fiscal só muda status, como na tela dele; priorizar e deletar são do admin
+    if pedido.acao not in chamados_repo.ACOES_STATUS and payload.get("papel") != "admin":
+        raise sessao.SemPermissao()
+    if (pedido.ids is None) == (pedido.filtros is None):
+        raise HTTPException(status_code=400, detail="Informe ids ou filtros")
+    filtros = filtros_listagem(**pedido.filtros.model_dump()) if pedido.filtros else None
+    resultados = await _acao_em_massa(pedido.acao, pedido.ids, filtros, pedido.prioridade)
+    return {"resultados": resultados}
 
-    cur.execute("SELECT id, loja_id, status FROM chamados WHERE id = %s;", (chamado_id,))
-    chamado = cur.fetchone()
+# ==========================================================
+# ROTAS DE CHAMADOS (Fiscal)
+# ==========================================================
 
-    if not chamado:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Chamado não encontrado")
+@app.get("/chamados/fiscal", response_model=PaginaChamados, dependencies=papel_fiscal)
+async def listar_chamados_fiscal(
+    versao: etag.Versao = Depends(versao_listagens),
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    cursor: Optional[str] = None,
+    limite: int = Query(chamados_repo.LIMITE_PADRAO, ge=1, le=chamados_repo.LIMITE_MAXIMO),
+):
+    chamados, proximo_cursor = await chamados_repo.listar_por_prioridade(filtros, cursor, limite)
+    return etag.aplicar(pagina_json(chamados, proximo_cursor), versao)
+
+@app.get("/chamados/busca", response_model=PaginaChamados, dependencies=papel_fiscal)
+async def buscar_chamados(
+    q: str = Query(..., min_length=1, max_length=200),
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    cursor: Optional[str] = None,
+    limite: int = Query(chamados_repo.LIMITE_PADRAO, ge=1, le=chamados_repo.LIMITE_MAXIMO),
+):
+    chamados, proximo_cursor = await chamados_repo.pesquisar(q, filtros, cursor, limite)
+    return pagina_json(chamados, proximo_cursor)
 
-    cur.execute("""
-        UPDATE chamados
-        SET status = 'visualizado', atualizado_em = NOW()
-        WHERE id = %s AND status != 'concluído';
-    """, (chamado_id,))
-    conn.commit()
-    conn.close()
+@app.put("/chamados/{chamado_id}/visualizar", dependencies=papel_fiscal)
+async def visualizar_chamado(chamado_id: int):
+    transicao = exigir_transicao(await chamados_repo.visualizar(chamado_id), "visualizado")
 
-    loja_nome = next((l["nome"] for l in LOJAS_FIXAS if l["id"] == chamado[1]), f"Loja {chamado[1]}")
+    if transicao.resultado == "inalterada":
+        return {"message": "Chamado já estava visualizado"}
 
+    chamado = transicao.chamado
     return {
         "message": "Chamado visualizado com sucesso",
         "chamado": {
-            "id": chamado[0],
-            "loja": loja_nome,
-            "status": "visualizado"
+            "id": chamado.id,
+            "loja": lojas.registro.nome(chamado.loja_id),
+            "status": chamado.status
         }
     }
 
+# ==========================================================
+# EXPORTAÇÃO (faturamento da terceirizada)
+# ==========================================================
+
+@app.get("/chamados/exportar", dependencies=somente_admin)
+async def exportar_chamados(
+    formato: Literal["csv", "ndjson", "json"] = "csv",
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    arquivo: bool = False,
+):
+    # Gerador síncrono: o Starlette o consome no threadpool, um lote por vez
+    # (formato=json: um array JSON único, montado lote a lote).
+    # Chamados arquivados só entram com ?arquivo=true
+    corpo = exportacao.gerar(formato, chamados_repo.exportar(filtros, arquivo))
+    return StreamingResponse(
+        corpo,
+        media_type=exportacao.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="chamados.{formato}"'},
+    )
+
+# ==========================================================
+# ESTATÍSTICAS / SLA (lidas só das tabelas agregadas)
+# ==========================================================
+
+def filtros_estatisticas(
+    loja_id: Optional[str] = None,
+    prioridade: Optional[str] = None,
+    desde: Optional[str] = None,
+    ate: Optional[str] = None,
+) -> estatisticas.FiltrosEstatisticas:
+    try:
+        return estatisticas.FiltrosEstatisticas(
+            loja_id=int(loja_id) if loja_id else None,
+            prioridade=prioridade or None,
+            desde=date.fromisoformat(desde) if desde else None,
+            ate=date.fromisoformat(ate) if ate else None,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Filtro inválido")
+
+@app.get("/estatisticas/chamados", dependencies=somente_admin)
+async def estatisticas_chamados(filtros: estatisticas.FiltrosEstatisticas = Depends(filtros_estatisticas)):
+    return await estatisticas.resumo(filtros)
+
+# ==========================================================
+# EVENTOS AO VIVO (SSE)
+# ==========================================================
+
+@app.get("/eventos/chamados", dependencies=logado)
+async def eventos_chamados(request: Request, loja_id: Optional[int] = None):
+    return StreamingResponse(
+        eventos.fluxo_sse(request, loja_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ==========================================================
+# FOTOS DOS CHAMADOS (originais e miniaturas)
+# A chave é o sha256 do conteúdo: cache de um ano, sem revalidar
+# ==========================================================
+
+def _chave_anexo(chave: str) -> str:
+    if not anexos.CHAVE.fullmatch(chave) or not anexos.armazenamento.existe(anexos.chave_original(chave)):
+        raise HTTPException(status_code=404, detail="Foto não encontrada")
+    return chave
+
+@app.get("/anexos/{chave}", dependencies=logado)
+async def foto_original(chave: str = Depends(_chave_anexo)):
+    return FileResponse(
+        anexos.armazenamento.caminho(anexos.chave_original(chave)),
+        media_type=anexos.TIPOS[chave.rsplit(".", 1)[1]],
+        headers={"Cache-Control": anexos.CACHE_CONTROL},
+    )
+
+@app.get("/anexos/{chave}/miniatura", dependencies=logado)
+async def foto_miniatura(chave: str = Depends(_chave_anexo)):
+    # Normalmente já gerada ao salvar o chamado; senão, gera agora no pool de processos
+    caminho = await anexos.miniaturas.obter(chave)
+    if caminho is None:
+        raise HTTPException(status_code=404, detail="Miniatura indisponível")
+    return FileResponse(
+        caminho,
+        media_type="image/jpeg",
+        headers={"Cache-Control": anexos.CACHE_CONTROL},
+    )
+
 # ==========================================================
 # FRONTEND GERENTE
 # ==========================================================
 
-@app.get("/dashboard-gerente", response_class=HTMLResponse)
+@app.get("/dashboard-gerente", response_class=HTMLResponse, dependencies=papel_gerente)
 async def dashboard_gerente(request: Request):
     return templates.TemplateResponse("dashboard_gerente.html", {"request": request})
 
-@app.get("/gerente/abrir-chamado", response_class=HTMLResponse)
+def contexto_formulario(request: Request, erro: Optional[str] = None) -> dict:
+    # Gerente preso a uma loja só vê a dele (exigir_loja recusa as outras)
+    loja = usuarios.loja_restrita(sessao.sessao_opcional(request) or {})
+    return {
+        "request": request,
+        "lojas": [l for l in lojas.registro.todas() if loja is None or l["id"] == loja],
+        "erro": erro,
+        "max_fotos": anexos.ANEXOS_MAX_POR_CHAMADO,
+        "max_mb": anexos.ANEXO_MAX_BYTES // 2**20,
+    }
+
+@app.get("/gerente/abrir-chamado", response_class=HTMLResponse, dependencies=papel_gerente)
 async def abrir_chamado_form(request: Request):
-    return templates.TemplateResponse("chamado_form.html", {"request": request, "lojas": LOJAS_FIXAS})
+    return templates.TemplateResponse("chamado_form.html", contexto_formulario(request))
 
+class NovoChamado(BaseModel):
+    loja_id: int
+    descricao: str
+    prioridade: str
+    solicitado_por: str
+
+# Sem parâmetros Form: o corpo multipart é lido em streaming por anexos.receber,
+# que grava as fotos conforme chegam e só as publica se o chamado for salvo
 @app.post("/gerente/abrir-chamado", response_class=HTMLResponse)
-async def abrir_chamado_action(request: Request, loja_id: int = Form(...), descricao: str = Form(...), prioridade: str = Form(...), solicitado_por: str = Form(...)):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO chamados (loja_id, descricao, prioridade, solicitado_por, status, criado_em, atualizado_em)
-        VALUES (%s, %s, %s, %s, 'aberto', NOW(), NOW());
-    """, (loja_id, descricao, prioridade, solicitado_por))
-    conn.commit()
-    conn.close()
+async def abrir_chamado_action(request: Request, payload: dict = Depends(sessao_gerente)):
+    async with anexos.receber(request, campo_arquivos="fotos") as formulario:
+        try:
+            dados = NovoChamado.model_validate(formulario.campos)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+        await exigir_loja(payload, loja_id=dados.loja_id)
+        await chamados_repo.criar(
+            dados.loja_id, dados.descricao, dados.prioridade, dados.solicitado_por, fotos=formulario.arquivos
+        )
+    anexos.miniaturas.agendar(formulario.arquivos)
     return RedirectResponse(url="/gerente/listar-chamados", status_code=302)
 
-@app.get("/gerente/listar-chamados", response_class=HTMLResponse)
-async def listar_chamados_gerente(request: Request):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por
-        FROM chamados
-        ORDER BY criado_em DESC;
-    """)
-    chamados = [
-        {
-            "id": c[0],
-            "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-            "descricao": c[2],
-            "prioridade": c[3],
-            "status": c[4],
-            "solicitado_por": c[5],
-        }
-        for c in cur.fetchall()
-    ]
-    conn.close()
-    return templates.TemplateResponse("chamado_list.html", {"request": request, "chamados": chamados})
+@app.get("/gerente/listar-chamados", response_class=HTMLResponse, dependencies=papel_gerente)
+async def listar_chamados_gerente(
+    request: Request,
+    versao: etag.Versao = Depends(versao_listagens),
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    cursor: Optional[str] = None,
+    limite: int = Query(chamados_repo.LIMITE_PADRAO, ge=1, le=chamados_repo.LIMITE_MAXIMO),
+):
+    linhas, proximo_cursor = await chamados_repo.listar_por_data(filtros, cursor, limite)
+    chamados = await serializar_com_fotos(linhas)
+    resposta = templates.TemplateResponse("chamado_list.html", {
+        "request": request,
+        "chamados": chamados,
+        "lojas": lojas.registro.todas(),
+        "filtros": filtros,
+        "proxima_pagina": proxima_pagina(request.url, proximo_cursor),
+    })
+    return etag.aplicar(resposta, versao)
 
 @app.post("/gerente/concluir/{chamado_id}", response_class=HTMLResponse)
-async def concluir_chamado_front(request: Request, chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("UPDATE chamados SET status = 'concluído', atualizado_em = NOW() WHERE id = %s;", (chamado_id,))
-    conn.commit()
-    conn.close()
+async def concluir_chamado_front(request: Request, chamado_id: int, payload: dict = Depends(sessao_gerente)):
+    await exigir_loja(payload, chamado_id=chamado_id)
+    exigir_transicao(await chamados_repo.concluir(chamado_id), "concluído")
     return RedirectResponse(url="/gerente/listar-chamados", status_code=302)
 
 # ==========================================================
 # FRONTEND FISCAL
 # ==========================================================
 
-@app.get("/dashboard-fiscal", response_class=HTMLResponse)
+@app.get("/dashboard-fiscal", response_class=HTMLResponse, dependencies=papel_fiscal)
 async def dashboard_fiscal(request: Request):
     return templates.TemplateResponse("dashboard_fiscal.html", {"request": request})
 
 
-@app.get("/fiscal/listar-chamados", response_class=HTMLResponse)
-async def listar_chamados_fiscal_front(request: Request):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por
-        FROM chamados
-        ORDER BY 
-            CASE 
-                WHEN prioridade = 'alta' THEN 1
-                WHEN prioridade = 'média' THEN 2
-                WHEN prioridade = 'baixa' THEN 3
-                ELSE 4
-            END,
-            criado_em DESC;
-    """)
-    chamados = [
-        {
-            "id": c[0],
-            "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-            "descricao": c[2],
-            "prioridade": c[3].strip().lower() if c[3] else None,  # 🔴 força minúsculo
-            "status": c[4],
-            "solicitado_por": c[5],
-        }
-        for c in cur.fetchall()
-    ]
-    conn.close()
-    return templates.TemplateResponse("fiscal_list.html", {"request": request, "chamados": chamados})
-
+async def _chamados_fiscal(filtros=chamados_repo.Filtros(), cursor=None, limite=chamados_repo.LIMITE_PADRAO):
+    linhas, proximo_cursor = await chamados_repo.listar_por_prioridade(filtros, cursor, limite)
+    chamados = await serializar_com_fotos(linhas)
+    return chamados, proximo_cursor
 
-@app.post("/fiscal/visualizar/{chamado_id}", response_class=HTMLResponse)
-async def visualizar_chamado_front(request: Request, chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE chamados
-        SET status = 'visualizado', atualizado_em = NOW()
-        WHERE id = %s AND status != 'concluído';
-    """, (chamado_id,))
-    conn.commit()
-
-    # Recarregar lista de chamados
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por
-        FROM chamados
-        ORDER BY 
-            CASE 
-                WHEN prioridade = 'alta' THEN 1
-                WHEN prioridade = 'média' THEN 2
-                WHEN prioridade = 'baixa' THEN 3
-                ELSE 4
-            END,
-            criado_em DESC;
-    """)
-    chamados = [
-        {
-            "id": c[0],
-            "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-            "descricao": c[2],
-            "prioridade": c[3].strip().lower() if c[3] else None,  # 🔴 força minúsculo
-            "status": c[4],
-            "solicitado_por": c[5],
-        }
-        for c in cur.fetchall()
-    ]
-    conn.close()
 
-    # Enviar mensagem para o template
+@app.get("/fiscal/listar-chamados", response_class=HTMLResponse, dependencies=papel_fiscal)
+async def listar_chamados_fiscal_front(
+    request: Request,
+    versao: etag.Versao = Depends(versao_listagens),
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    q: Optional[str] = Query(None, max_length=200),
+    cursor: Optional[str] = None,
+    limite: int = Query(chamados_repo.LIMITE_PADRAO, ge=1, le=chamados_repo.LIMITE_MAXIMO),
+):
+    if q and q.strip():
+        # Com termo de busca a lista vem por relevância em vez de prioridade
+        linhas, proximo_cursor = await chamados_repo.pesquisar(q.strip(), filtros, cursor, limite)
+        chamados = await serializar_com_fotos(linhas)
+    else:
+        chamados, proximo_cursor = await _chamados_fiscal(filtros, cursor, limite)
+    resposta = templates.TemplateResponse("fiscal_list.html", {
+        "request": request,
+        "chamados": chamados,
+        "lojas": lojas.registro.todas(),
+        "filtros": filtros,
+        "busca": q or "",
+        "proxima_pagina": proxima_pagina(request.url, proximo_cursor),
+    })
+    return etag.aplicar(resposta, versao)
+
+
+def _quer_fragmento(request: Request) -> bool:
+    """Clientes com JS pedem JSON e recebem só a linha alterada"""
+    return "application/json" in request.headers.get("accept", "")
+
+
+def _mensagem_fiscal(transicao, chamado_id: int, feito: str) -> str:
+    if transicao is None:
+        return f"Chamado #{chamado_id} não encontrado"
+    if transicao.resultado == "conflito":
+        return f"Chamado #{chamado_id} já está {transicao.chamado.status} ⚠️"
+    return f"Chamado #{chamado_id} {feito} com sucesso ✅"
+
+
+async def _fragmento_fiscal(transicao, chamado_id: int, mensagem: str):
+    if transicao is None:
+        return JSONResponse(status_code=404, content={"detail": "Chamado não encontrado"})
+    # Conflito: 409, mas com a linha atualizada para a tela refletir o status real
+    c, = await serializar_com_fotos([transicao.chamado])
+    macros = templates.get_template("_fiscal_chamado.html").module
+    return JSONResponse(status_code=409 if transicao.resultado == "conflito" else 200, content={
+        "id": chamado_id,
+        "status": c["status"],
+        "linha": str(macros.linha(c)),
+        "card": str(macros.card(c)),
+        "mensagem": mensagem,
+    })
+
+
+async def _pagina_fiscal(request: Request, mensagem: str):
+    # Fallback sem JS: página inteira com a primeira página da lista
+    chamados, proximo_cursor = await _chamados_fiscal()
     return templates.TemplateResponse(
         "fiscal_list.html",
         {
             "request": request,
             "chamados": chamados,
-            "mensagem": f"Chamado #{chamado_id} visualizado com sucesso ✅"
+            "lojas": lojas.registro.todas(),
+            "filtros": chamados_repo.Filtros(),
+            "proxima_pagina": proxima_pagina(URL("/fiscal/listar-chamados"), proximo_cursor),
+            "mensagem": mensagem
         }
     )
 
 
-@app.post("/fiscal/concluir/{chamado_id}", response_class=HTMLResponse)
+@app.post("/fiscal/visualizar/{chamado_id}", response_class=HTMLResponse, dependencies=papel_fiscal)
+async def visualizar_chamado_front(request: Request, chamado_id: int):
+    transicao = await chamados_repo.visualizar(chamado_id)
+    mensagem = _mensagem_fiscal(transicao, chamado_id, "visualizado")
+
+    if _quer_fragmento(request):
+        return await _fragmento_fiscal(transicao, chamado_id, mensagem)
+    return await _pagina_fiscal(request, mensagem)
+
+
+@app.post("/fiscal/concluir/{chamado_id}", response_class=HTMLResponse, dependencies=papel_fiscal)
 async def concluir_chamado_fiscal_front(request: Request, chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE chamados
-        SET status = 'concluído', atualizado_em = NOW()
-        WHERE id = %s;
-    """, (chamado_id,))
-    conn.commit()
-
-    # Recarregar lista para mostrar feedback
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por
-        FROM chamados
-        ORDER BY 
-            CASE 
-                WHEN prioridade = 'alta' THEN 1
-                WHEN prioridade = 'média' THEN 2
-                WHEN prioridade = 'baixa' THEN 3
-                ELSE 4
-            END,
-            criado_em DESC;
-    """)
-    chamados = [
-        {
-            "id": c[0],
-            "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-            "descricao": c[2],
-            "prioridade": c[3].strip().lower() if c[3] else None,  # 🔴 força minúsculo
-            "status": c[4],
-            "solicitado_por": c[5],
-        }
-        for c in cur.fetchall()
-    ]
-    conn.close()
+    transicao = await chamados_repo.concluir(chamado_id)
+    mensagem = _mensagem_fiscal(transicao, chamado_id, "concluído")
 
-    return templates.TemplateResponse(
-        "fiscal_list.html",
-        {
-            "request": request,
-            "chamados": chamados,
-            "mensagem": f"Chamado #{chamado_id} concluído com sucesso ✅"
-        }
-    )
+    if _quer_fragmento(request):
+        return await _fragmento_fiscal(transicao, chamado_id, mensagem)
+    return await _pagina_fiscal(request, mensagem)
+
+@app.post("/fiscal/massa", response_class=HTMLResponse, dependencies=papel_fiscal)
+async def acao_em_massa_fiscal(request: Request, acao: Literal["concluir", "visualizar"] = Form(...), ids: List[int] = Form([])):
+    if not ids:
+        return await _pagina_fiscal(request, "Nenhum chamado selecionado")
+    resultados = await _acao_em_massa(acao, ids)
+    return await _pagina_fiscal(request, _resumo_massa(resultados))
 
 # ==========================================================
 # FRONTEND ADMIN
 # ==========================================================
 
-@app.get("/dashboard-admin", response_class=HTMLResponse)
+@app.get("/dashboard-admin", response_class=HTMLResponse, dependencies=somente_admin)
 async def dashboard_admin(request: Request):
-    return templates.TemplateResponse("dashboard_admin.html", {"request": request})
-
-
-@app.get("/admin/listar-chamados", response_class=HTMLResponse)
-async def listar_chamados_admin(request: Request):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por
-        FROM chamados
-        ORDER BY criado_em DESC;
-    """)
-    chamados = [
-        {
-            "id": c[0],
-            "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-            "descricao": c[2],
-            "prioridade": c[3],
-            "status": c[4],
-            "solicitado_por": c[5],
-        }
-        for c in cur.fetchall()
-    ]
-    conn.close()
-    return templates.TemplateResponse("admin_list.html", {"request": request, "chamados": chamados})
+    resumo = await estatisticas.resumo()
+    return templates.TemplateResponse("dashboard_admin.html", {"request": request, "resumo": resumo})
+
+
+@app.get("/admin/listar-chamados", response_class=HTMLResponse, dependencies=somente_admin)
+async def listar_chamados_admin(
+    request: Request,
+    versao: etag.Versao = Depends(versao_listagens),
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    cursor: Optional[str] = None,
+    limite: int = Query(chamados_repo.LIMITE_PADRAO, ge=1, le=chamados_repo.LIMITE_MAXIMO),
+):
+    linhas, proximo_cursor = await chamados_repo.listar_por_data(filtros, cursor, limite)
+    chamados = await serializar_com_fotos(linhas)
+    resposta = templates.TemplateResponse("admin_list.html", {
+        "request": request,
+        "chamados": chamados,
+        "lojas": lojas.registro.todas(),
+        "filtros": filtros,
+        "proxima_pagina": proxima_pagina(request.url, proximo_cursor),
+    })
+    return etag.aplicar(resposta, versao)
+
+
+@app.get("/admin/historico", response_class=HTMLResponse, dependencies=somente_admin)
+async def historico_admin(
+    request: Request,
+    versao: etag.Versao = Depends(versao_listagens),
+    filtros: chamados_repo.Filtros = Depends(filtros_listagem),
+    cursor: Optional[str] = None,
+    limite: int = Query(chamados_repo.LIMITE_PADRAO, ge=1, le=chamados_repo.LIMITE_MAXIMO),
+):
+    # Única listagem que lê também o arquivo; somente leitura
+    linhas, proximo_cursor = await chamados_repo.listar_por_data(filtros, cursor, limite, arquivo=True)
+    resposta = templates.TemplateResponse("admin_list.html", {
+        "request": request,
+        "chamados": await serializar_com_fotos(linhas),
+        "lojas": lojas.registro.todas(),
+        "filtros": filtros,
+        "proxima_pagina": proxima_pagina(request.url, proximo_cursor),
+        "historico": True,
+        "exportar": f"/chamados/exportar?{request.url.remove_query_params('cursor').include_query_params(arquivo='true').query}",
+    })
+    return etag.aplicar(resposta, versao)
+
+
+@app.post("/admin/massa", response_class=HTMLResponse, dependencies=somente_admin)
+async def acao_em_massa_admin(
+    request: Request,
+    acao: Literal["concluir", "visualizar", "priorizar", "deletar"] = Form(...),
+    ids: List[int] = Form([]),
+    prioridade: Optional[str] = Form(None),
+):
+    mensagem = "Nenhum chamado selecionado"
+    if ids:
+        mensagem = _resumo_massa(await _acao_em_massa(acao, ids, prioridade=prioridade))
+    # Mesma tela da listagem, primeira página, com o resumo por chamado
+    linhas, proximo_cursor = await chamados_repo.listar_por_data()
+    return templates.TemplateResponse("admin_list.html", {
+        "request": request,
+        "chamados": await serializar_com_fotos(linhas),
+        "lojas": lojas.registro.todas(),
+        "filtros": chamados_repo.Filtros(),
+        "proxima_pagina": proxima_pagina(URL("/admin/listar-chamados"), proximo_cursor),
+        "mensagem": mensagem,
+    })
 
 
 # --- Tela de edição ---
-@app.get("/admin/editar/{chamado_id}", response_class=HTMLResponse)
+@app.get("/admin/editar/{chamado_id}", response_class=HTMLResponse, dependencies=somente_admin)
 async def editar_chamado_form(request: Request, chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT id, loja_id, descricao, prioridade, status, solicitado_por
-        FROM chamados
-        WHERE id = %s;
-    """, (chamado_id,))
-    c = cur.fetchone()
-    conn.close()
+    c = await chamados_repo.buscar(chamado_id)
 
     if not c:
         raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
-    chamado = {
-        "id": c[0],
-        "loja": next((l["nome"] for l in LOJAS_FIXAS if l["id"] == c[1]), f"Loja {c[1]}"),
-        "descricao": c[2],
-        "prioridade": c[3],
-        "status": c[4],
-        "solicitado_por": c[5],
-    }
+    chamado = serializar(c)
 
     return templates.TemplateResponse("admin_edit.html", {"request": request, "chamado": chamado})
 
 
 # --- Ação de edição ---
-@app.post("/admin/editar/{chamado_id}", response_class=HTMLResponse)
+@app.post("/admin/editar/{chamado_id}", response_class=HTMLResponse, dependencies=somente_admin)
 async def editar_chamado_action(
     request: Request,
     chamado_id: int,
     descricao: str = Form(...),
     prioridade: str = Form(...),
-    status: str = Form(...)
+    status: Literal[chamados_repo.STATUS] = Form(...)
 ):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE chamados
-        SET descricao = %s, prioridade = %s, status = %s, atualizado_em = NOW()
-        WHERE id = %s;
-    """, (descricao, prioridade, status, chamado_id))
-    conn.commit()
-    conn.close()
+    if await chamados_repo.editar(chamado_id, descricao, prioridade, status) is None:
+        raise HTTPException(status_code=404, detail="Chamado não encontrado")
 
     return RedirectResponse(url="/admin/listar-chamados", status_code=302)
 
 
 # --- Concluir chamado ---
-@app.post("/admin/concluir/{chamado_id}", response_class=HTMLResponse)
+@app.post("/admin/concluir/{chamado_id}", response_class=HTMLResponse, dependencies=somente_admin)
 async def concluir_chamado_admin(request: Request, chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        UPDATE chamados
-        SET status = 'concluído', atualizado_em = NOW()
-        WHERE id = %s AND status != 'concluído';
-    """, (chamado_id,))
-    conn.commit()
-    conn.close()
+    exigir_transicao(await chamados_repo.concluir(chamado_id), "concluído")
 
     return RedirectResponse(url="/admin/listar-chamados", status_code=302)
 
 
 # --- Excluir chamado ---
-@app.post("/admin/deletar/{chamado_id}", response_class=HTMLResponse)
+@app.post("/admin/deletar/{chamado_id}", response_class=HTMLResponse, dependencies=somente_admin)
 async def deletar_chamado_admin(request: Request, chamado_id: int):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM chamados WHERE id = %s;", (chamado_id,))
-    conn.commit()
-    conn.close()
+    await chamados_repo.deletar(chamado_id)
 
     return RedirectResponse(url="/admin/listar-chamados", status_code=302)
@@ -0,0 +1,244 @@
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi.templating import Jinja2Templates
+
+# ==========================================================
+# Métricas da aplicação (formato texto do Prometheus)
+# Registro em memória, por processo: cada worker expõe os
+# próprios números em /metrics. Custo por requisição: alguns
+# incrementos sob lock, sem alocação por consulta.
+# ==========================================================
+
+# Loga requisições acima deste tempo (ms); 0 desliga
+LOG_LENTAS_MS = float(os.getenv("LOG_REQUISICAO_LENTA_MS", "0"))
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Conexões longas (SSE) e a própria coleta não entram nos histogramas
+ROTAS_IGNORADAS = {"/metrics", "/eventos/chamados"}
+
+log = logging.getLogger("infracheck.lentas")
+
+
+def _rotulos(nomes: tuple, valores: tuple) -> str:
+    if not nomes:
+        return ""
+    pares = []
+    for nome, valor in zip(nomes, valores):
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pares.append(f'{nome}="{valor}"')
+    return "{" + ",".join(pares) + "}"
+
+
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = ()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores, quantidade: float = 1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def exportar(self) -> list:
+        with self._lock:
+            itens = list(self._valores.items())
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        linhas += [f"{self.nome}{_rotulos(self.rotulos, v)} {total}" for v, total in itens]
+        return linhas
+
+
+class Medidor:
+    """Gauge: valor que sobe e desce"""
+
+    def __init__(self, nome: str, ajuda: str):
+        self.nome, self.ajuda = nome, ajuda
+        self.valor = 0
+        self._lock = threading.Lock()
+
+    def somar(self, delta: float):
+        with self._lock:
+            self.valor += delta
+
+    def exportar(self) -> list:
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} gauge", f"{self.nome} {self.valor}"]
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: tuple = (), buckets: tuple = BUCKETS_SEGUNDOS):
+        self.nome, self.ajuda, self.rotulos, self.buckets = nome, ajuda, rotulos, buckets
+        # rótulos -> [contagem por bucket (+Inf no fim), soma]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *valores):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def exportar(self) -> list:
+        with self._lock:
+            series = [(v, list(contagens), soma) for v, (contagens, soma) in self._series.items()]
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        for valores, contagens, soma in series:
+            acumulado = 0
+            for limite, quantidade in zip(self.buckets + (float("inf"),), contagens):
+                acumulado += quantidade
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                linhas.append(f"{self.nome}_bucket{_rotulos(self.rotulos + ('le',), valores + (le,))} {acumulado}")
+            linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, valores)} {soma}")
+            linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, valores)} {acumulado}")
+        return linhas
+
+
+REQUISICOES = Histograma("infracheck_requisicao_segundos", "Latência das requisições por rota", ("metodo", "rota"))
+RESPOSTAS = Contador("infracheck_respostas_total", "Respostas por rota e status HTTP", ("metodo", "rota", "status"))
+EM_ANDAMENTO = Medidor("infracheck_requisicoes_em_andamento", "Requisições sendo atendidas agora")
+DB_CONSULTAS = Contador("infracheck_db_consultas_total", "Comandos SQL executados por rota", ("rota",))
+DB_LINHAS = Contador("infracheck_db_linhas_total", "Linhas lidas do banco por rota", ("rota",))
+DB_TEMPO = Histograma("infracheck_db_tempo_requisicao_segundos", "Tempo no banco por requisição", ("rota",))
+DB_AQUISICAO = Histograma("infracheck_db_aquisicao_segundos", "Espera para obter conexão do pool")
+RENDER = Histograma("infracheck_template_render_segundos", "Renderização de templates", ("template",))
+ADMISSAO_ESPERA = Histograma(
+    "infracheck_admissao_espera_segundos", "Tempo na fila de admissão (só quem esperou)", ("classe",)
+)
+ADMISSAO_RECUSADAS = Contador(
+    "infracheck_admissao_recusadas_total", "Requisições recusadas pelo controle de admissão", ("classe", "motivo")
+)
+
+METRICAS = [
+    REQUISICOES, RESPOSTAS, EM_ANDAMENTO, DB_CONSULTAS, DB_LINHAS, DB_TEMPO, DB_AQUISICAO, RENDER,
+    ADMISSAO_ESPERA, ADMISSAO_RECUSADAS,
+]
+
+
+class Requisicao:
+    """Acumuladores da requisição atual (preenchidos também pelas threads do banco)"""
+    __slots__ = ("consultas", "linhas", "tempo_db", "aquisicao", "render")
+
+    def __init__(self):
+        self.consultas = 0
+        self.linhas = 0
+        self.tempo_db = 0.0
+        self.aquisicao = 0.0
+        self.render = 0.0
+
+
+# O run_in_threadpool copia o contexto, então as threads do psycopg2 enxergam o mesmo objeto
+_atual: ContextVar[Optional[Requisicao]] = ContextVar("metricas_requisicao", default=None)
+
+
+def registrar_consulta(duracao: float):
+    req = _atual.get()
+    if req is not None:
+        req.consultas += 1
+        req.tempo_db += duracao
+
+
+def registrar_linhas(quantidade: int):
+    req = _atual.get()
+    if req is not None:
+        req.linhas += quantidade
+
+
+def registrar_aquisicao(espera: float):
+    DB_AQUISICAO.observar(espera)
+    req = _atual.get()
+    if req is not None:
+        req.aquisicao += espera
+
+
+class TemplatesMedidos(Jinja2Templates):
+    """Jinja2Templates que mede a renderização de cada TemplateResponse"""
+
+    def TemplateResponse(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        resposta = super().TemplateResponse(*args, **kwargs)
+        duracao = time.perf_counter() - inicio
+        RENDER.observar(duracao, resposta.template.name)
+        req = _atual.get()
+        if req is not None:
+            req.render += duracao
+        return resposta
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI puro: latência, status, requisições em andamento e custo no banco por rota"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in ROTAS_IGNORADAS:
+            return await self.app(scope, receive, send)
+
+        req = Requisicao()
+        token = _atual.set(req)
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        EM_ANDAMENTO.somar(1)
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracao = time.perf_counter() - inicio
+            EM_ANDAMENTO.somar(-1)
+            _atual.reset(token)
+            # Rótulo pelo padrão da rota (/admin/editar/{chamado_id}), nunca pela URL crua
+            rota = getattr(scope.get("route"), "path", None) or "desconhecida"
+            metodo = scope["method"]
+            REQUISICOES.observar(duracao, metodo, rota)
+            RESPOSTAS.inc(metodo, rota, status)
+            if req.consultas:
+                DB_CONSULTAS.inc(rota, quantidade=req.consultas)
+                DB_LINHAS.inc(rota, quantidade=req.linhas)
+                DB_TEMPO.observar(req.tempo_db, rota)
+            if LOG_LENTAS_MS and duracao * 1000 >= LOG_LENTAS_MS:
+                log.warning(
+                    f"🐢 {metodo} {scope['path']} ({rota}) {status} em {duracao * 1000:.0f} ms | "
+                    f"banco {req.tempo_db * 1000:.0f} ms em {req.consultas} consultas, {req.linhas} linhas | "
+                    f"pool {req.aquisicao * 1000:.0f} ms | render {req.render * 1000:.0f} ms"
+                )
+
+
+def _medidores(prefixo: str, valores: dict) -> list:
+    linhas = []
+    for chave, valor in valores.items():
+        if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+            continue
+        nome = f"{prefixo}_{chave}"
+        linhas += [f"# TYPE {nome} gauge", f"{nome} {valor}"]
+    return linhas
+
+
+def exportar(
+    pool: dict, cache: dict, tokens: dict, fragmentos: dict, miniaturas: dict, admissao: dict, replicacao: dict
+) -> str:
+    """Texto para o /metrics (Prometheus exposition format 0.0.4)"""
+    linhas = []
+    for metrica in METRICAS:
+        linhas += metrica.exportar()
+    linhas += _medidores("infracheck_pool", pool)
+    linhas += _medidores("infracheck_cache", cache)
+    linhas += _medidores("infracheck_tokens", tokens)
+    linhas += _medidores("infracheck_fragmentos", fragmentos)
+    linhas += _medidores("infracheck_miniaturas", miniaturas)
+    linhas += _medidores("infracheck_admissao", admissao)
+    linhas += _medidores("infracheck_replicacao", replicacao)
+    return "\n".join(linhas) + "\n"
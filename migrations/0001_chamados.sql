@@ -0,0 +1,11 @@
+-- Tabela principal de chamados (IF NOT EXISTS: bancos antigos já a possuem)
+CREATE TABLE IF NOT EXISTS chamados (
+    id              SERIAL PRIMARY KEY,
+    loja_id         INTEGER     NOT NULL,
+    descricao       TEXT        NOT NULL,
+    prioridade      TEXT        NOT NULL,
+    status          TEXT        NOT NULL DEFAULT 'aberto',
+    solicitado_por  TEXT        NOT NULL,
+    criado_em       TIMESTAMP   NOT NULL DEFAULT NOW(),
+    atualizado_em   TIMESTAMP   NOT NULL DEFAULT NOW()
+);
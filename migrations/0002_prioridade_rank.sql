@@ -0,0 +1,11 @@
+-- Rank da prioridade materializado, para a ordenação do fiscal usar índice
+-- (mesmo mapeamento de chamados_repo.RANK_PRIORIDADE)
+ALTER TABLE chamados
+    ADD COLUMN IF NOT EXISTS prioridade_rank SMALLINT GENERATED ALWAYS AS (
+        CASE
+            WHEN prioridade = 'alta' THEN 1
+            WHEN prioridade = 'média' THEN 2
+            WHEN prioridade = 'baixa' THEN 3
+            ELSE 4
+        END
+    ) STORED;
@@ -0,0 +1,24 @@
+-- Índices no formato exato das consultas de chamados_repo
+
+-- Listagens por data (gerente, admin, /chamados/gerente) + cursor (criado_em, id)
+CREATE INDEX IF NOT EXISTS chamados_criado_em_idx
+    ON chamados (criado_em DESC, id DESC);
+
+-- Listagem do fiscal + cursor (prioridade_rank, criado_em, id)
+CREATE INDEX IF NOT EXISTS chamados_prioridade_idx
+    ON chamados (prioridade_rank, criado_em DESC, id DESC);
+
+-- Filtro por loja nas duas ordenações
+CREATE INDEX IF NOT EXISTS chamados_loja_criado_em_idx
+    ON chamados (loja_id, criado_em DESC, id DESC);
+CREATE INDEX IF NOT EXISTS chamados_loja_prioridade_idx
+    ON chamados (loja_id, prioridade_rank, criado_em DESC, id DESC);
+
+-- Filtro por status na listagem por data
+CREATE INDEX IF NOT EXISTS chamados_status_criado_em_idx
+    ON chamados (status, criado_em DESC, id DESC);
+
+-- Fila do fiscal: só chamados pendentes (aberto/visualizado), a maioria do uso
+CREATE INDEX IF NOT EXISTS chamados_pendentes_prioridade_idx
+    ON chamados (prioridade_rank, criado_em DESC, id DESC)
+    WHERE status <> 'concluído';
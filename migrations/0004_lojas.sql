@@ -0,0 +1,18 @@
+-- Cadastro de lojas: novas lojas entram por INSERT, sem deploy
+CREATE TABLE IF NOT EXISTS lojas (
+    id      INTEGER PRIMARY KEY,
+    nome    TEXT    NOT NULL,
+    ativa   BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+-- Mesma lista que lojas.LOJAS_FIXAS
+INSERT INTO lojas (id, nome) VALUES
+    (1, 'LOJA 01'),
+    (2, 'LOJA 03'),
+    (3, 'LOJA 06'),
+    (4, 'LOJA 09'),
+    (5, 'LOJA 10'),
+    (6, 'LOJA 11'),
+    (7, 'LOJA 12'),
+    (8, 'LOJA 14')
+ON CONFLICT (id) DO NOTHING;
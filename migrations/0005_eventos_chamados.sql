@@ -0,0 +1,50 @@
+-- Publica cada mudança em `chamados` no canal chamados_eventos.
+-- Um único LISTEN por processo repassa os eventos aos painéis (SSE).
+CREATE OR REPLACE FUNCTION notificar_chamado() RETURNS trigger AS $$
+DECLARE
+    tipo    TEXT;
+    linha   chamados;
+    payload TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        tipo := 'criado';
+        linha := NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        tipo := 'removido';
+        linha := OLD;
+    ELSIF NEW.status IS DISTINCT FROM OLD.status AND NEW.status = 'concluído' THEN
+        tipo := 'concluido';
+        linha := NEW;
+    ELSIF NEW.status IS DISTINCT FROM OLD.status AND NEW.status = 'visualizado' THEN
+        tipo := 'visualizado';
+        linha := NEW;
+    ELSE
+        tipo := 'editado';
+        linha := NEW;
+    END IF;
+
+    payload := json_build_object(
+        'tipo', tipo,
+        'id', linha.id,
+        'loja_id', linha.loja_id,
+        'descricao', linha.descricao,
+        'prioridade', linha.prioridade,
+        'status', linha.status,
+        'solicitado_por', linha.solicitado_por,
+        'atualizado_em', linha.atualizado_em
+    )::text;
+
+    -- NOTIFY aceita até 8000 bytes: descrições enormes vão só com a chave
+    IF octet_length(payload) > 7900 THEN
+        payload := json_build_object('tipo', tipo, 'id', linha.id, 'loja_id', linha.loja_id, 'status', linha.status)::text;
+    END IF;
+
+    PERFORM pg_notify('chamados_eventos', payload);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chamados_eventos_trg ON chamados;
+CREATE TRIGGER chamados_eventos_trg
+    AFTER INSERT OR UPDATE OR DELETE ON chamados
+    FOR EACH ROW EXECUTE FUNCTION notificar_chamado();
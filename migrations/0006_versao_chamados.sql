@@ -0,0 +1,21 @@
+-- Carimbo de versão de `chamados` para ETag / Last-Modified.
+-- Um contador de linha única, incrementado uma vez por comando (não por linha).
+CREATE TABLE IF NOT EXISTS chamados_versao (
+    id          BOOLEAN     PRIMARY KEY DEFAULT TRUE CHECK (id),
+    versao      BIGINT      NOT NULL DEFAULT 1,
+    alterado_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO chamados_versao (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION incrementar_versao_chamados() RETURNS trigger AS $$
+BEGIN
+    UPDATE chamados_versao SET versao = versao + 1, alterado_em = NOW() WHERE id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chamados_versao_trg ON chamados;
+CREATE TRIGGER chamados_versao_trg
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON chamados
+    FOR EACH STATEMENT EXECUTE FUNCTION incrementar_versao_chamados();
@@ -0,0 +1,10 @@
+-- Chaves de idempotência das operações enviadas em lote pela fila offline
+-- do service worker. Reenvios da mesma chave devolvem o resultado guardado.
+CREATE TABLE IF NOT EXISTS operacoes_idempotentes (
+    chave         TEXT        PRIMARY KEY,
+    resultado     JSONB,
+    processada_em TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS operacoes_idempotentes_processada_em_idx
+    ON operacoes_idempotentes (processada_em);
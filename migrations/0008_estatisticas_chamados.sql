@@ -0,0 +1,143 @@
+-- Estatísticas pré-calculadas dos chamados, mantidas por triggers.
+-- O painel do admin lê só estas tabelas, nunca `chamados`.
+--   estatisticas_chamados -> quantidade por loja, dia de abertura, status e prioridade
+--   estatisticas_conclusao -> histograma do tempo até a conclusão (média e p90)
+
+-- Momento da conclusão (atualizado_em muda em qualquer edição posterior)
+ALTER TABLE chamados ADD COLUMN IF NOT EXISTS concluido_em TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION marcar_conclusao() RETURNS trigger AS $$
+BEGIN
+    IF NEW.status IS DISTINCT FROM 'concluído' THEN
+        NEW.concluido_em := NULL;
+    ELSIF TG_OP = 'INSERT' THEN
+        NEW.concluido_em := COALESCE(NEW.concluido_em, NEW.atualizado_em, NOW());
+    ELSIF OLD.status IS DISTINCT FROM 'concluído' THEN
+        NEW.concluido_em := NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chamados_conclusao_trg ON chamados;
+CREATE TRIGGER chamados_conclusao_trg
+    BEFORE INSERT OR UPDATE ON chamados
+    FOR EACH ROW EXECUTE FUNCTION marcar_conclusao();
+
+-- Preenche os já concluídos sem disparar um evento SSE por linha
+ALTER TABLE chamados DISABLE TRIGGER chamados_eventos_trg;
+UPDATE chamados SET concluido_em = atualizado_em WHERE status = 'concluído' AND concluido_em IS NULL;
+ALTER TABLE chamados ENABLE TRIGGER chamados_eventos_trg;
+
+CREATE TABLE IF NOT EXISTS estatisticas_chamados (
+    loja_id    INTEGER NOT NULL,
+    dia        DATE    NOT NULL,
+    status     TEXT    NOT NULL,
+    prioridade TEXT    NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (loja_id, dia, status, prioridade)
+);
+
+-- Faixas do histograma em horas (espelhadas em estatisticas.FAIXAS_HORAS):
+-- faixa 0 = menos de 1h, faixa i = [limite i, limite i+1), faixa 12 = 30 dias ou mais
+CREATE OR REPLACE FUNCTION faixa_conclusao(segundos DOUBLE PRECISION) RETURNS SMALLINT AS $$
+    SELECT width_bucket(segundos / 3600, ARRAY[1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720]::DOUBLE PRECISION[])::SMALLINT;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE TABLE IF NOT EXISTS estatisticas_conclusao (
+    loja_id       INTEGER          NOT NULL,
+    dia           DATE             NOT NULL,
+    prioridade    TEXT             NOT NULL,
+    faixa         SMALLINT         NOT NULL,
+    quantidade    INTEGER          NOT NULL DEFAULT 0,
+    soma_segundos DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (loja_id, dia, prioridade, faixa)
+);
+
+CREATE INDEX IF NOT EXISTS estatisticas_chamados_dia_idx ON estatisticas_chamados (dia);
+CREATE INDEX IF NOT EXISTS estatisticas_conclusao_dia_idx ON estatisticas_conclusao (dia);
+
+-- Contribuição de uma linha de `chamados` para as estatísticas (sinal +1 entra, -1 sai)
+DO $$ BEGIN
+    CREATE TYPE delta_chamado AS (
+        loja_id    INTEGER,
+        dia        DATE,
+        status     TEXT,
+        prioridade TEXT,
+        segundos   DOUBLE PRECISION,
+        sinal      INTEGER
+    );
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION delta_de(c chamados, sinal INTEGER) RETURNS delta_chamado AS $$
+    SELECT ROW(
+        c.loja_id,
+        c.criado_em::date,
+        c.status,
+        COALESCE(lower(trim(c.prioridade)), ''),
+        CASE WHEN c.status = 'concluído' THEN EXTRACT(EPOCH FROM c.concluido_em - c.criado_em) END,
+        sinal
+    )::delta_chamado;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION aplicar_estatisticas(mudancas delta_chamado[]) RETURNS void AS $$
+BEGIN
+    -- Agrupa antes do UPSERT: um comando em massa vira uma escrita por chave
+    INSERT INTO estatisticas_chamados AS e (loja_id, dia, status, prioridade, quantidade)
+    SELECT loja_id, dia, status, prioridade, sum(sinal)
+    FROM unnest(mudancas)
+    GROUP BY loja_id, dia, status, prioridade
+    HAVING sum(sinal) <> 0
+    ON CONFLICT (loja_id, dia, status, prioridade)
+    DO UPDATE SET quantidade = e.quantidade + EXCLUDED.quantidade;
+
+    INSERT INTO estatisticas_conclusao AS e (loja_id, dia, prioridade, faixa, quantidade, soma_segundos)
+    SELECT loja_id, dia, prioridade, faixa_conclusao(segundos), sum(sinal), sum(sinal * segundos)
+    FROM unnest(mudancas)
+    WHERE segundos IS NOT NULL
+    GROUP BY loja_id, dia, prioridade, faixa_conclusao(segundos)
+    HAVING sum(sinal) <> 0
+    ON CONFLICT (loja_id, dia, prioridade, faixa)
+    DO UPDATE SET quantidade = e.quantidade + EXCLUDED.quantidade,
+                  soma_segundos = e.soma_segundos + EXCLUDED.soma_segundos;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Uma execução por comando, lendo as tabelas de transição (antigos/novos)
+CREATE OR REPLACE FUNCTION contabilizar_chamados() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM aplicar_estatisticas(ARRAY(SELECT delta_de(n, 1) FROM novos n));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM aplicar_estatisticas(ARRAY(SELECT delta_de(a, -1) FROM antigos a));
+    ELSE
+        PERFORM aplicar_estatisticas(ARRAY(
+            SELECT delta_de(a, -1) FROM antigos a
+            UNION ALL
+            SELECT delta_de(n, 1) FROM novos n
+        ));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tabelas de transição exigem um trigger por evento
+DROP TRIGGER IF EXISTS chamados_estatisticas_ins ON chamados;
+CREATE TRIGGER chamados_estatisticas_ins
+    AFTER INSERT ON chamados REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION contabilizar_chamados();
+
+DROP TRIGGER IF EXISTS chamados_estatisticas_upd ON chamados;
+CREATE TRIGGER chamados_estatisticas_upd
+    AFTER UPDATE ON chamados REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION contabilizar_chamados();
+
+DROP TRIGGER IF EXISTS chamados_estatisticas_del ON chamados;
+CREATE TRIGGER chamados_estatisticas_del
+    AFTER DELETE ON chamados REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT EXECUTE FUNCTION contabilizar_chamados();
+
+-- Carga inicial a partir do que já existe (os triggers acima já valem para o que vier depois)
+TRUNCATE estatisticas_chamados, estatisticas_conclusao;
+SELECT aplicar_estatisticas(ARRAY(SELECT delta_de(c, 1) FROM chamados c));
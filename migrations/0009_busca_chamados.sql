@@ -0,0 +1,27 @@
+-- Busca textual em descricao + solicitado_por (config em português, sem acentos).
+-- O unaccent é extensão contrib: se o servidor não a tiver, a configuração
+-- fica só com o stemmer português e a busca continua funcionando.
+DO $$
+BEGIN
+    BEGIN
+        CREATE EXTENSION IF NOT EXISTS unaccent;
+    EXCEPTION WHEN OTHERS THEN
+        RAISE NOTICE 'unaccent indisponível (%), busca seguirá sensível a acentos', SQLERRM;
+    END;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portugues_busca') THEN
+        CREATE TEXT SEARCH CONFIGURATION portugues_busca (COPY = portuguese);
+        IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'unaccent') THEN
+            ALTER TEXT SEARCH CONFIGURATION portugues_busca
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END IF;
+END $$;
+
+-- Descrição pesa mais que o nome de quem pediu
+ALTER TABLE chamados ADD COLUMN IF NOT EXISTS busca TSVECTOR GENERATED ALWAYS AS (
+    setweight(to_tsvector('portugues_busca', coalesce(descricao, '')), 'A') ||
+    setweight(to_tsvector('portugues_busca', coalesce(solicitado_por, '')), 'B')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS chamados_busca_idx ON chamados USING GIN (busca);
@@ -0,0 +1,10 @@
+-- Usuários com login próprio (senha em bcrypt). Criados com: python criar_usuario.py
+CREATE TABLE IF NOT EXISTS usuarios (
+    id         SERIAL      PRIMARY KEY,
+    usuario    TEXT        NOT NULL UNIQUE,
+    nome       TEXT        NOT NULL,
+    senha_hash TEXT        NOT NULL,
+    papel      TEXT        NOT NULL CHECK (papel IN ('admin', 'gerente', 'fiscal')),
+    ativo      BOOLEAN     NOT NULL DEFAULT TRUE,
+    criado_em  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,78 @@
+-- Arquivo de chamados concluídos há muito tempo (dados "frios").
+-- `chamados` guarda só o conjunto de trabalho; as listagens padrão leem
+-- apenas ela. Histórico e exportação pedem o arquivo explicitamente.
+CREATE TABLE IF NOT EXISTS chamados_arquivo (
+    id              INTEGER     PRIMARY KEY,
+    loja_id         INTEGER     NOT NULL,
+    descricao       TEXT        NOT NULL,
+    prioridade      TEXT        NOT NULL,
+    status          TEXT        NOT NULL,
+    solicitado_por  TEXT        NOT NULL,
+    criado_em       TIMESTAMP   NOT NULL,
+    atualizado_em   TIMESTAMP   NOT NULL,
+    concluido_em    TIMESTAMP   NOT NULL,
+    prioridade_rank SMALLINT    NOT NULL,
+    arquivado_em    TIMESTAMP   NOT NULL DEFAULT NOW()
+);
+
+-- Mesmas ordenações das listagens (histórico por data e exportação)
+CREATE INDEX IF NOT EXISTS chamados_arquivo_criado_em_idx
+    ON chamados_arquivo (criado_em DESC, id DESC);
+CREATE INDEX IF NOT EXISTS chamados_arquivo_loja_criado_em_idx
+    ON chamados_arquivo (loja_id, criado_em DESC, id DESC);
+
+-- Candidatos ao arquivamento, dos mais antigos para os mais novos
+CREATE INDEX IF NOT EXISTS chamados_concluidos_idx
+    ON chamados (concluido_em)
+    WHERE status = 'concluído';
+
+-- Mover para o arquivo não é excluir: as estatísticas continuam contando o
+-- chamado e os painéis não recebem um evento 'removido' por linha.
+-- arquivar_chamados() liga esta variável só dentro da própria transação.
+DROP TRIGGER IF EXISTS chamados_estatisticas_del ON chamados;
+CREATE TRIGGER chamados_estatisticas_del
+    AFTER DELETE ON chamados REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT
+    WHEN (current_setting('infracheck.arquivando', true) IS DISTINCT FROM 'on')
+    EXECUTE FUNCTION contabilizar_chamados();
+
+DROP TRIGGER IF EXISTS chamados_eventos_trg ON chamados;
+CREATE TRIGGER chamados_eventos_trg
+    AFTER INSERT OR UPDATE OR DELETE ON chamados
+    FOR EACH ROW
+    WHEN (current_setting('infracheck.arquivando', true) IS DISTINCT FROM 'on')
+    EXECUTE FUNCTION notificar_chamado();
+
+-- Move até `lote` chamados concluídos há mais de `dias` dias e devolve quantos.
+-- SKIP LOCKED: vários workers podem rodar o job ao mesmo tempo sem conflito.
+CREATE OR REPLACE FUNCTION arquivar_chamados(dias INTEGER, lote INTEGER) RETURNS INTEGER AS $$
+DECLARE
+    limite  TIMESTAMP := NOW() - make_interval(days => dias);
+    movidos INTEGER;
+BEGIN
+    -- Sem candidatos, nada de DELETE (que incrementaria a versão das listagens à toa)
+    IF NOT EXISTS (SELECT 1 FROM chamados WHERE status = 'concluído' AND concluido_em < limite) THEN
+        RETURN 0;
+    END IF;
+
+    PERFORM set_config('infracheck.arquivando', 'on', true);
+    WITH removidos AS (
+        DELETE FROM chamados
+        WHERE id IN (
+            SELECT id FROM chamados
+            WHERE status = 'concluído' AND concluido_em < limite
+            ORDER BY concluido_em
+            LIMIT lote
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, loja_id, descricao, prioridade, status, solicitado_por,
+                  criado_em, atualizado_em, concluido_em, prioridade_rank
+    )
+    INSERT INTO chamados_arquivo (id, loja_id, descricao, prioridade, status, solicitado_por,
+                                  criado_em, atualizado_em, concluido_em, prioridade_rank)
+    SELECT * FROM removidos;
+    GET DIAGNOSTICS movidos = ROW_COUNT;
+    PERFORM set_config('infracheck.arquivando', 'off', true);
+    RETURN movidos;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,31 @@
+-- Fotos anexadas aos chamados. O arquivo fica no armazenamento (anexos.py);
+-- aqui só a chave (sha256 + extensão) e os metadados.
+-- Sem FK para `chamados`: o arquivamento (0011) move o chamado para
+-- `chamados_arquivo` mantendo o id, e as fotos continuam valendo no histórico.
+CREATE TABLE IF NOT EXISTS anexos (
+    id            SERIAL    PRIMARY KEY,
+    chamado_id    INTEGER   NOT NULL,
+    chave         TEXT      NOT NULL,
+    tipo          TEXT      NOT NULL,
+    tamanho       INTEGER   NOT NULL,
+    nome_original TEXT      NOT NULL,
+    criado_em     TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Fotos de uma página de chamados de uma vez (chamado_id = ANY(...))
+CREATE INDEX IF NOT EXISTS anexos_chamado_idx ON anexos (chamado_id, id);
+
+-- Excluir um chamado de verdade leva as fotos junto; arquivar não
+CREATE OR REPLACE FUNCTION remover_anexos() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM anexos WHERE chamado_id IN (SELECT id FROM antigos);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS chamados_anexos_del ON chamados;
+CREATE TRIGGER chamados_anexos_del
+    AFTER DELETE ON chamados REFERENCING OLD TABLE AS antigos
+    FOR EACH STATEMENT
+    WHEN (current_setting('infracheck.arquivando', true) IS DISTINCT FROM 'on')
+    EXECUTE FUNCTION remover_anexos();
@@ -0,0 +1,3 @@
+-- Loja do gerente: limita o que ele pode fazer pela fila offline.
+-- NULL = sem loja fixa (admin, fiscal e gerentes antigos).
+ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS loja_id INTEGER REFERENCES lojas(id);
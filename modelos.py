@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+from lojas import registro
+
+# ==========================================================
+# Registro de chamado + serialização única usada pelas rotas
+# ==========================================================
+
+CORES_PRIORIDADE = {"alta": "vermelho", "média": "amarelo"}
+
+
+class Chamado(NamedTuple):
+    """Uma linha de `chamados`, na ordem de chamados_repo.COLUNAS"""
+    id: int
+    loja_id: int
+    descricao: str
+    prioridade: str
+    status: str
+    solicitado_por: str
+    criado_em: datetime
+    atualizado_em: datetime
+
+
+def normalizar_prioridade(prioridade: Optional[str]) -> Optional[str]:
+    return prioridade.strip().lower() if prioridade else None  # 🔴 força minúsculo
+
+
+def serializar(c: Chamado) -> dict:
+    """Formato de saída de um chamado, igual para HTML e JSON"""
+    prioridade = normalizar_prioridade(c.prioridade)
+    return {
+        "id": c.id,
+        "loja": registro.nome(c.loja_id),
+        "descricao": c.descricao,
+        "prioridade": prioridade,
+        "cor": CORES_PRIORIDADE.get(prioridade, "verde"),
+        "status": c.status,
+        "solicitado_por": c.solicitado_por,
+        "criado_em": c.criado_em,
+        "atualizado_em": c.atualizado_em,
+    }
+
+
+# --- Esquemas de resposta (OpenAPI). As rotas de listagem devolvem o
+# ORJSONResponse pronto, sem revalidar cada linha contra estes modelos.
+class ChamadoSaida(BaseModel):
+    """Mesmo formato de serializar()"""
+    id: int
+    loja: str
+    descricao: str
+    prioridade: Optional[str]
+    cor: str
+    status: str
+    solicitado_por: str
+    criado_em: datetime
+    atualizado_em: datetime
+
+
+class PaginaChamados(BaseModel):
+    chamados: List[ChamadoSaida]
+    proximo_cursor: Optional[str] = None
@@ -0,0 +1,133 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
+from jinja2.ext import Extension
+
+import estaticos
+
+# ==========================================================
+# Camada de renderização dos templates
+# Um único Environment Jinja, compilado no startup e com cache
+# de bytecode em disco (os outros workers e os reinícios não
+# recompilam). Partes que só dependem de poucos valores (head,
+# linhas de chamado por id + atualizado_em) ficam num cache de
+# fragmentos já renderizados, via {% fragmento chave %}.
+# ==========================================================
+
+DIRETORIO_TEMPLATES = "templates"
+
+# Bytecode compilado pelo Jinja; o nome inclui o checksum do template, então deploys não colidem
+DIRETORIO_BYTECODE = os.getenv("JINJA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "infracheck-jinja"))
+
+# Em desenvolvimento, TEMPLATES_RECARREGAR=1 volta a checar o arquivo a cada render
+RECARREGAR = os.getenv("TEMPLATES_RECARREGAR", "0") == "1"
+
+# Fragmentos renderizados guardados (LRU); 0 desliga o cache
+FRAGMENTOS_MAX_ITENS = int(os.getenv("FRAGMENTOS_MAX_ITENS", "10000"))
+
+
+class CacheFragmentos:
+    """LRU de HTML já renderizado, por chave (template, valores do {% fragmento %})"""
+
+    def __init__(self, max_itens: int):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            html = self._itens.get(chave)
+            if html is None:
+                self.falhas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return html
+
+    def gravar(self, chave, html):
+        if self.max_itens <= 0:
+            return
+        with self._lock:
+            self._itens[chave] = html
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"itens": len(self._itens), "max_itens": self.max_itens, "acertos": self.acertos, "falhas": self.falhas}
+
+
+class ExtensaoFragmentos(Extension):
+    """{% fragmento "nome", valor1, valor2 %} ... {% endfragmento %}
+
+    O corpo só é renderizado se a chave (template + valores) não estiver no cache.
+    A chave precisa conter tudo de que o corpo depende."""
+
+    tags = {"fragmento"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragmentos=CacheFragmentos(0))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        chave = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            chave.append(parser.parse_expression())
+        corpo = parser.parse_statements(("name:endfragmento",), drop_needle=True)
+        chamada = self.call_method("_renderizar", [nodes.Tuple(chave, "load")])
+        return nodes.CallBlock(chamada, [], [], corpo).set_lineno(lineno)
+
+    def _renderizar(self, chave, caller):
+        cache = self.environment.fragmentos
+        html = cache.obter(chave)
+        if html is None:
+            html = caller()
+            cache.gravar(chave, html)
+        return html
+
+
+def criar_ambiente(
+    max_fragmentos: int = FRAGMENTOS_MAX_ITENS, diretorio_bytecode: Optional[str] = DIRETORIO_BYTECODE
+) -> Environment:
+    """Environment dos templates; diretorio_bytecode=None desliga o cache de bytecode"""
+    bytecode = None
+    if diretorio_bytecode:
+        os.makedirs(diretorio_bytecode, exist_ok=True)
+        bytecode = FileSystemBytecodeCache(diretorio_bytecode)
+    ambiente = Environment(
+        loader=FileSystemLoader(DIRETORIO_TEMPLATES),
+        autoescape=True,
+        auto_reload=RECARREGAR,
+        bytecode_cache=bytecode,
+        extensions=[ExtensaoFragmentos],
+    )
+    ambiente.fragmentos = CacheFragmentos(max_fragmentos)
+    ambiente.globals["estatico"] = estaticos.registro.url
+    return ambiente
+
+
+def precompilar(ambiente: Environment) -> int:
+    """Carrega todos os templates (do bytecode em disco, ou compilando) antes da 1ª requisição"""
+    inicio = time.perf_counter()
+    nomes = ambiente.list_templates(extensions=["html"])
+    for nome in nomes:
+        ambiente.get_template(nome)
+    logging.info(f"✅ {len(nomes)} templates carregados em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    return len(nomes)
+
+
+ambiente = criar_ambiente()
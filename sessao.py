@@ -0,0 +1,82 @@
+import os
+from typing import Optional
+
+from fastapi import Form, Request
+
+import auth
+import usuarios
+
+# ==========================================================
+# Sessão dos usuários
+# O JWT vai num cookie HttpOnly (ou no header Authorization);
+# a validação passa pelo cache de tokens do auth.py e o bcrypt
+# do login roda no pool dedicado, nunca no event loop.
+# ==========================================================
+
+COOKIE_SESSAO = "sessao"
+COOKIE_SEGURO = os.getenv("COOKIE_SEGURO", "0") == "1"
+
+# Página inicial de cada papel depois do login
+DASHBOARDS = {"admin": "/dashboard-admin", "gerente": "/dashboard-gerente", "fiscal": "/dashboard-fiscal"}
+
+
+class NaoAutenticado(Exception):
+    """Sem sessão válida"""
+
+
+class SemPermissao(Exception):
+    """Sessão válida, mas o papel não tem acesso à rota"""
+
+
+def _token(request: Request) -> Optional[str]:
+    cabecalho = request.headers.get("authorization", "")
+    if cabecalho.lower().startswith("bearer "):
+        return cabecalho[7:].strip()
+    return request.cookies.get(COOKIE_SESSAO)
+
+
+def sessao_opcional(request: Request) -> Optional[dict]:
+    """Payload do token da requisição, ou None se ausente, inválido ou expirado"""
+    token = _token(request)
+    return auth.validar_token(token) if token else None
+
+
+def sessao_atual(request: Request) -> dict:
+    """Payload do token da requisição; NaoAutenticado se ausente, inválido ou expirado"""
+    payload = sessao_opcional(request)
+    if not payload:
+        raise NaoAutenticado()
+    return payload
+
+
+def exigir_papel(*papeis: str):
+    """Dependência: exige sessão e, se `papeis` for informado, um desses papéis"""
+    def verificar(request: Request) -> dict:
+        payload = sessao_atual(request)
+        if papeis and payload.get("papel") not in papeis:
+            raise SemPermissao()
+        return payload
+    return verificar
+
+
+async def autenticar(usuario: str = Form(...), senha: str = Form(...)) -> Optional[usuarios.Usuario]:
+    """Dependência do login: o usuário se a senha confere, senão None"""
+    encontrado = await usuarios.buscar_ativo(usuario.strip())
+    ok = await auth.verificar_senha_async(senha, encontrado.senha_hash if encontrado else None)
+    return encontrado if ok else None
+
+
+def iniciar(resposta, payload: dict):
+    """Grava o cookie de sessão com um token novo para `payload`"""
+    token = auth.criar_token(payload)
+    resposta.set_cookie(
+        COOKIE_SESSAO, token,
+        max_age=auth.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        httponly=True, samesite="lax", secure=COOKIE_SEGURO,
+    )
+    return resposta
+
+
+def encerrar(resposta):
+    resposta.delete_cookie(COOKIE_SESSAO)
+    return resposta
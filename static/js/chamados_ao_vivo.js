@@ -0,0 +1,67 @@
+// static/js/chamados_ao_vivo.js
+// Atualiza as listas de chamados no lugar a partir de /eventos/chamados (SSE).
+(() => {
+  if (!("EventSource" in window)) return;
+
+  const BADGES = {
+    "aberto": '<span class="badge bg-primary">Aberto</span>',
+    "visualizado": '<span class="badge bg-warning text-dark">Visualizado</span>',
+    "concluído": '<span class="badge bg-success">Concluído</span>',
+  };
+  const CLASSES_PRIORIDADE = { "alta": "prioridade-alta", "média": "prioridade-media", "baixa": "prioridade-baixa" };
+
+  const escapar = (texto) => {
+    const div = document.createElement("div");
+    div.textContent = texto ?? "";
+    return div.innerHTML;
+  };
+
+  const elementos = (id) => document.querySelectorAll(`[data-chamado-id="${id}"]`);
+
+  const badge = (status) => BADGES[status] || `<span class="badge bg-secondary">${escapar(status)}</span>`;
+
+  function atualizar(ev) {
+    elementos(ev.id).forEach((el) => {
+      el.querySelectorAll(".js-status").forEach((s) => (s.innerHTML = badge(ev.status)));
+      if (ev.descricao !== undefined) {
+        el.querySelectorAll(".js-descricao").forEach((d) => (d.textContent = ev.descricao));
+      }
+      if (ev.prioridade !== undefined) {
+        const prioridade = (ev.prioridade || "").trim().toLowerCase();
+        el.querySelectorAll(".js-prioridade").forEach((p) => (p.textContent = prioridade));
+        if (el.tagName === "TR" && el.className.includes("prioridade-")) {
+          el.className = CLASSES_PRIORIDADE[prioridade] || "";
+        }
+      }
+      if (ev.status === "concluído") {
+        el.querySelectorAll(".js-acoes").forEach((a) => {
+          a.innerHTML = '<span class="text-success fw-bold">✅ Concluído</span>';
+        });
+      }
+    });
+  }
+
+  function remover(ev) {
+    elementos(ev.id).forEach((el) => el.remove());
+  }
+
+  let novos = 0;
+  function avisar(texto) {
+    const aviso = document.getElementById("aviso-novos");
+    if (!aviso) return;
+    aviso.querySelector(".js-aviso-texto").textContent = texto;
+    aviso.classList.remove("d-none");
+  }
+
+  const fonte = new EventSource("/eventos/chamados");
+  ["visualizado", "concluido", "editado"].forEach((tipo) =>
+    fonte.addEventListener(tipo, (e) => atualizar(JSON.parse(e.data)))
+  );
+  fonte.addEventListener("removido", (e) => remover(JSON.parse(e.data)));
+  fonte.addEventListener("criado", (e) => {
+    const ev = JSON.parse(e.data);
+    novos += 1;
+    avisar(novos === 1 ? `Novo chamado #${ev.id} (${ev.loja}).` : `${novos} chamados novos.`);
+  });
+  fonte.addEventListener("recarregar", () => avisar("A lista pode estar desatualizada."));
+})();
@@ -0,0 +1,52 @@
+// static/js/fiscal_acoes.js
+// Visualizar/Concluir sem recarregar a lista: o servidor devolve só o chamado alterado.
+// Sem JS (ou se o fetch falhar) o formulário segue o POST normal e a página inteira volta.
+(() => {
+  const ACAO = /\/fiscal\/(visualizar|concluir)\/\d+$/;
+
+  const elemento = (html) => {
+    const t = document.createElement("template");
+    t.innerHTML = html.trim();
+    return t.content.firstElementChild;
+  };
+
+  function avisar(mensagem) {
+    const msg = document.getElementById("mensagem-acao");
+    if (msg) {
+      msg.textContent = mensagem;
+      msg.classList.remove("d-none");
+    }
+  }
+
+  function aplicar(dados) {
+    // Offline: o service worker guardou a ação na fila, a linha fica como está
+    if (!dados.enfileirada) {
+      document.querySelectorAll(`[data-chamado-id="${dados.id}"]`).forEach((el) => {
+        el.replaceWith(elemento(el.tagName === "TR" ? dados.linha : dados.card));
+      });
+    }
+    avisar(dados.mensagem);
+  }
+
+  document.addEventListener("submit", async (e) => {
+    const form = e.target;
+    if (!ACAO.test(form.action)) return;
+    e.preventDefault();
+    form.querySelectorAll("button").forEach((b) => (b.disabled = true));
+    try {
+      const resp = await fetch(form.action, { method: "POST", headers: { Accept: "application/json" } });
+      // 429/503: servidor recusou por sobrecarga; reenviar o formulário só pioraria
+      if (resp.status === 429 || resp.status === 503) {
+        const { detail } = await resp.json();
+        avisar(`${detail} (${resp.headers.get("Retry-After") || 1}s)`);
+        form.querySelectorAll("button").forEach((b) => (b.disabled = false));
+        return;
+      }
+      // 409: o chamado mudou de status antes; a resposta traz a linha como está
+      if (!resp.ok && resp.status !== 409) throw new Error(resp.status);
+      aplicar(await resp.json());
+    } catch (err) {
+      form.submit();
+    }
+  });
+})();
@@ -1,14 +1,7 @@
 // static/service-worker.js
-const CACHE_VERSION = "v1.0.0";
+// CACHE_VERSION e PRECACHE vêm do manifesto de estáticos (ver estaticos.py e a rota /sw.js)
 const CACHE_NAME = `infracheck-cache-${CACHE_VERSION}`;
-const APP_SHELL = [
-  "/",
-  "/static/style.css",
-  "/static/manifest.json",
-  "/static/icons/icon-192.png",
-  "/static/icons/icon-512.png",
-  "/static/offline.html"
-];
+const APP_SHELL = ["/", ...PRECACHE];
 
 self.addEventListener("install", (event) => {
   event.waitUntil(caches.open(CACHE_NAME).then((cache) => cache.addAll(APP_SHELL)));
@@ -24,12 +17,168 @@ self.addEventListener("activate", (event) => {
   self.clients.claim();
 });
 
-// HTML -> network-first | estáticos -> cache-first
+// Listagens que respondem com ETag / Last-Modified
+const LISTAGENS = [
+  "/chamados/gerente",
+  "/chamados/fiscal",
+  "/gerente/listar-chamados",
+  "/fiscal/listar-chamados",
+  "/admin/listar-chamados"
+];
+
+// Revalida a cópia guardada: 304 -> usa o cache, 200 -> atualiza o cache
+async function revalidar(req) {
+  const cache = await caches.open(CACHE_NAME);
+  const cached = await cache.match(req);
+  const headers = new Headers(req.headers);
+  if (cached) {
+    const etag = cached.headers.get("ETag");
+    const lastModified = cached.headers.get("Last-Modified");
+    if (etag) headers.set("If-None-Match", etag);
+    if (lastModified) headers.set("If-Modified-Since", lastModified);
+  }
+
+  try {
+    const res = await fetch(req.url, { headers, credentials: "same-origin", cache: "no-store" });
+    if (res.status === 304 && cached) return cached;
+    // Sessão expirada: o fetch segue o redirect para o login, que não pode virar a listagem offline
+    const redirecionada = res.redirected || res.url !== req.url;
+    if (res.ok && !redirecionada) cache.put(req, res.clone());
+    return res;
+  } catch (e) {
+    if (cached) return cached;
+    if (req.headers.get("accept")?.includes("text/html")) return caches.match("/static/offline.html");
+    throw e;
+  }
+}
+
+// ==========================================================
+// Fila offline (IndexedDB + Background Sync)
+// Ações feitas sem rede viram operações com chave de idempotência e
+// são enviadas juntas em POST /chamados/lote quando a conexão volta.
+// ==========================================================
+const DB_FILA = "infracheck-fila";
+const STORE_FILA = "operacoes";
+const TAG_SYNC = "enviar-fila";
+
+// Formulários que podem ser enfileirados -> tipo da operação no lote
+const ACOES_OFFLINE = [
+  [/^\/gerente\/abrir-chamado$/, "criar"],
+  [/^\/(?:gerente|fiscal)\/concluir\/(\d+)$/, "concluir"],
+  [/^\/fiscal\/visualizar\/(\d+)$/, "visualizar"]
+];
+
+function abrirFila() {
+  return new Promise((resolve, reject) => {
+    const pedido = indexedDB.open(DB_FILA, 1);
+    pedido.onupgradeneeded = () => pedido.result.createObjectStore(STORE_FILA, { keyPath: "chave" });
+    pedido.onsuccess = () => resolve(pedido.result);
+    pedido.onerror = () => reject(pedido.error);
+  });
+}
+
+async function naFila(modo, operar) {
+  const db = await abrirFila();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(STORE_FILA, modo);
+    const pedido = operar(tx.objectStore(STORE_FILA));
+    tx.oncomplete = () => resolve(pedido?.result);
+    tx.onerror = () => reject(tx.error);
+  });
+}
+
+async function operacaoOffline(req, pathname) {
+  for (const [padrao, tipo] of ACOES_OFFLINE) {
+    const m = pathname.match(padrao);
+    if (!m) continue;
+    const operacao = { chave: crypto.randomUUID(), tipo };
+    if (tipo === "criar") {
+      // O lote é JSON: fotos anexadas não entram na fila, o chamado é criado sem elas
+      const form = await req.formData();
+      operacao.loja_id = Number(form.get("loja_id"));
+      for (const campo of ["descricao", "prioridade", "solicitado_por"]) operacao[campo] = form.get(campo);
+    } else {
+      operacao.chamado_id = Number(m[1]);
+    }
+    return operacao;
+  }
+  return null;
+}
+
+async function enviarFila() {
+  const operacoes = await naFila("readonly", (store) => store.getAll());
+  if (!operacoes?.length) return;
+
+  const res = await fetch("/chamados/lote", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    credentials: "same-origin",
+    body: JSON.stringify({ operacoes })
+  });
+  // Falha de rede ou 5xx: o Background Sync tenta de novo mais tarde
+  if (!res.ok) throw new Error(`Lote recusado: ${res.status}`);
+
+  const { resultados } = await res.json();
+  // Aplicadas, duplicadas ou recusadas pelo servidor não voltam para a fila
+  await naFila("readwrite", (store) => resultados.forEach((r) => store.delete(r.chave)));
+}
+
+async function agendarEnvio() {
+  if ("sync" in self.registration) {
+    await self.registration.sync.register(TAG_SYNC);
+  }
+}
+
+// Tenta a rede; sem conexão, guarda a operação e responde que ela foi enfileirada
+async function postOuFila(req, pathname) {
+  const copia = req.clone();
+  try {
+    return await fetch(req);
+  } catch (e) {
+    const operacao = await operacaoOffline(copia, pathname);
+    if (!operacao) throw e;
+    await naFila("readwrite", (store) => store.put(operacao));
+    await agendarEnvio();
+
+    const mensagem = "Sem conexão: a ação foi salva e será enviada quando a rede voltar ⏳";
+    if (req.headers.get("accept")?.includes("application/json")) {
+      return new Response(JSON.stringify({ enfileirada: true, mensagem }), {
+        status: 202,
+        headers: { "Content-Type": "application/json" }
+      });
+    }
+    return new Response(
+      `<!DOCTYPE html><meta charset="utf-8"><p>${mensagem}</p><p><a href="javascript:history.back()">Voltar</a></p>`,
+      { status: 202, headers: { "Content-Type": "text/html; charset=utf-8" } }
+    );
+  }
+}
+
+self.addEventListener("sync", (event) => {
+  if (event.tag === TAG_SYNC) event.waitUntil(enviarFila());
+});
+
+// Navegadores sem Background Sync: a página avisa quando volta a ficar online
+self.addEventListener("message", (event) => {
+  if (event.data === TAG_SYNC) event.waitUntil(enviarFila().catch(() => {}));
+});
+
+// POST -> rede ou fila offline | Listagens -> revalidação condicional | HTML -> network-first | estáticos -> cache-first
 self.addEventListener("fetch", (event) => {
   const req = event.request;
+  const url = new URL(req.url);
+
+  if (req.method === "POST" && url.origin === self.location.origin) {
+    event.respondWith(postOuFila(req, url.pathname));
+    return;
+  }
+  if (req.method !== "GET") return;
+
   const isHTML = req.headers.get("accept")?.includes("text/html");
 
-  if (isHTML) {
+  if (url.origin === self.location.origin && LISTAGENS.includes(url.pathname)) {
+    event.respondWith(revalidar(req));
+  } else if (isHTML) {
     event.respondWith(
       fetch(req)
         .then((res) => {
@@ -39,6 +188,24 @@ self.addEventListener("fetch", (event) => {
         })
         .catch(async () => (await caches.match(req)) || caches.match("/static/offline.html"))
     );
+  } else if (
+    url.origin === self.location.origin &&
+    ((url.pathname.startsWith("/static/") && url.searchParams.has("v")) || url.pathname.startsWith("/anexos/"))
+  ) {
+    // URLs com impressão digital (?v=hash) e fotos (nome = sha256) nunca mudam: a primeira cópia vale para sempre
+    event.respondWith(
+      caches.match(req).then(
+        (cached) =>
+          cached ||
+          fetch(req).then((res) => {
+            if (res.ok) {
+              const copy = res.clone();
+              caches.open(CACHE_NAME).then((cache) => cache.put(req, copy));
+            }
+            return res;
+          })
+      )
+    );
   } else {
     event.respondWith(caches.match(req).then((cached) => cached || fetch(req)));
   }
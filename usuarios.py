@@ -0,0 +1,50 @@
+from typing import NamedTuple, Optional
+
+from db import get_connection, assincrono
+
+# ==========================================================
+# Usuários (tabela `usuarios`, migração 0010)
+# ==========================================================
+
+PAPEIS = ("admin", "gerente", "fiscal")
+
+
+class Usuario(NamedTuple):
+    id: int
+    usuario: str
+    nome: str
+    senha_hash: str
+    papel: str
+    loja_id: Optional[int]
+
+
+def loja_restrita(sessao: dict) -> Optional[int]:
+    """Loja a que a sessão está presa (gerente com loja_id), ou None se pode agir em todas"""
+    return sessao.get("loja_id") if sessao.get("papel") == "gerente" else None
+
+
+@assincrono
+def buscar_ativo(usuario: str) -> Optional[Usuario]:
+    """Usuário ativo pelo login, ou None"""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, usuario, nome, senha_hash, papel, loja_id
+            FROM usuarios
+            WHERE usuario = %s AND ativo;
+        """, (usuario,))
+        linha = cur.fetchone()
+    return Usuario._make(linha) if linha else None
+
+
+def salvar(conn, usuario: str, nome: str, senha_hash: str, papel: str, loja_id: Optional[int] = None):
+    """Cria o usuário ou troca senha/papel/nome/loja de um existente (reativando-o)"""
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO usuarios (usuario, nome, senha_hash, papel, loja_id)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (usuario) DO UPDATE
+        SET nome = EXCLUDED.nome, senha_hash = EXCLUDED.senha_hash, papel = EXCLUDED.papel,
+            loja_id = EXCLUDED.loja_id, ativo = TRUE;
+    """, (usuario, nome, senha_hash, papel, loja_id))
+    conn.commit()
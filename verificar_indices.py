@@ -0,0 +1,136 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import psycopg2
+
+import chamados_repo
+from chamados_repo import Filtros, LIMITE_PADRAO
+from init_db import migrar
+
+# ==========================================================
+# Verificação dos planos das listagens
+# Popula `chamados` com muitas linhas DENTRO de uma transação
+# (parte delas vai para o arquivo),
+# roda EXPLAIN em cada consulta de listagem do repositório e
+# falha se alguma cair em Seq Scan. Tudo é desfeito no final.
+#
+# Nunca usa o banco da app (DB_CONFIG): por padrão sobe um
+# cluster descartável (benchmarks/carga.py); --dsn aponta para
+# um banco de teste já existente.
+#
+#   python verificar_indices.py [linhas] [--pg-bin DIR | --dsn DSN]
+# ==========================================================
+
+LINHAS_PADRAO = 200_000
+
+
+def _consultas():
+    ontem = (datetime.now() - timedelta(days=1)).isoformat()
+    cursor_data = chamados_repo._codificar_cursor([ontem, 10**9])
+    cursor_prioridade = chamados_repo._codificar_cursor([2, ontem, 10**9])
+    return {
+        "data": chamados_repo.sql_listar_por_data(Filtros(), None, LIMITE_PADRAO),
+        "data + cursor": chamados_repo.sql_listar_por_data(Filtros(), cursor_data, LIMITE_PADRAO),
+        "data + loja": chamados_repo.sql_listar_por_data(Filtros(loja_id=3), cursor_data, LIMITE_PADRAO),
+        "data + status": chamados_repo.sql_listar_por_data(Filtros(status="aberto"), None, LIMITE_PADRAO),
+        "prioridade": chamados_repo.sql_listar_por_prioridade(Filtros(), None, LIMITE_PADRAO),
+        "prioridade + cursor": chamados_repo.sql_listar_por_prioridade(Filtros(), cursor_prioridade, LIMITE_PADRAO),
+        "prioridade + loja": chamados_repo.sql_listar_por_prioridade(Filtros(loja_id=3), cursor_prioridade, LIMITE_PADRAO),
+        "prioridade + pendentes": chamados_repo.sql_listar_por_prioridade(Filtros(status="aberto"), None, LIMITE_PADRAO),
+        "busca": chamados_repo.sql_pesquisar("vazamento", Filtros(), None, LIMITE_PADRAO),
+        "busca + loja": chamados_repo.sql_pesquisar("vazamento copa", Filtros(loja_id=3), None, LIMITE_PADRAO),
+        "histórico": chamados_repo.sql_listar_por_data(Filtros(), None, LIMITE_PADRAO, arquivo=True),
+        "histórico + loja": chamados_repo.sql_listar_por_data(Filtros(loja_id=3), cursor_data, LIMITE_PADRAO, arquivo=True),
+    }
+
+
+# Dias após a conclusão usados para mover parte da carga para o arquivo
+DIAS_ARQUIVO = 30
+
+
+def _seq_scans(plano: dict) -> list:
+    """Nós Seq Scan sobre `chamados` ou `chamados_arquivo` em qualquer ponto do plano"""
+    encontrados = []
+    if plano.get("Node Type") == "Seq Scan" and plano.get("Relation Name") in ("chamados", "chamados_arquivo"):
+        encontrados.append(plano)
+    for filho in plano.get("Plans", []):
+        encontrados += _seq_scans(filho)
+    return encontrados
+
+
+def popular(cur, linhas: int):
+    cur.execute("""
+        INSERT INTO chamados (loja_id, descricao, prioridade, solicitado_por, status, criado_em, atualizado_em)
+        SELECT
+            1 + i %% 8,
+            CASE WHEN i %% 100 = 0 THEN 'Vazamento na copa'
+                 ELSE (ARRAY['Ar condicionado não gela', 'Lâmpada queimada', 'Chamado de carga'])[1 + i %% 3]
+            END || ' ' || i,
+            (ARRAY['alta', 'média', 'baixa'])[1 + i %% 3],
+            'verificar_indices',
+            (ARRAY['aberto', 'visualizado', 'concluído', 'concluído', 'concluído'])[1 + i %% 5],
+            NOW() - (i || ' minutes')::interval,
+            NOW() - (i || ' minutes')::interval
+        FROM generate_series(1, %s) AS i;
+    """, (linhas,))
+    cur.execute("ANALYZE chamados;")
+
+
+def verificar(conn, linhas: int = LINHAS_PADRAO) -> list:
+    """Devolve os nomes das consultas que fizeram Seq Scan"""
+    migrar(conn)
+    cur = conn.cursor()
+    falhas = []
+    try:
+        popular(cur, linhas)
+        cur.execute("SELECT arquivar_chamados(%s, %s);", (DIAS_ARQUIVO, linhas))
+        cur.execute("ANALYZE chamados; ANALYZE chamados_arquivo;")
+        for nome, (sql, params) in _consultas().items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plano = cur.fetchone()[0]
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            if _seq_scans(plano[0]["Plan"]):
+                falhas.append(nome)
+                logging.error(f"❌ {nome}: Seq Scan")
+            else:
+                logging.info(f"✅ {nome}")
+    finally:
+        conn.rollback()
+    return falhas
+
+
+def _verificar_em(config: dict, linhas: int) -> list:
+    conn = psycopg2.connect(**config)
+    try:
+        return verificar(conn, linhas)
+    finally:
+        conn.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Falha se alguma listagem cair em Seq Scan")
+    parser.add_argument("linhas", type=int, nargs="?", default=LINHAS_PADRAO)
+    parser.add_argument("--pg-bin", default=os.getenv("PG_BIN"), help="pasta com initdb e pg_ctl (cluster descartável)")
+    parser.add_argument("--dsn", help="banco de TESTE a usar no lugar do cluster descartável")
+    args = parser.parse_args()
+
+    if args.dsn:
+        falhas = _verificar_em({"dsn": args.dsn}, args.linhas)
+    else:
+        sys.path.insert(0, str(Path(__file__).parent / "benchmarks"))
+        from carga import postgres_descartavel
+
+        with postgres_descartavel(args.pg_bin) as config:
+            falhas = _verificar_em(config, args.linhas)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())